@@ -0,0 +1,100 @@
+"""Click-to-response latency of a callback step with serial and pipelined calls.
+
+Telegram is simulated with a random round trip per call; "spinner" is when
+answerCallbackQuery has completed, "visible" is when the next step has been
+shown.
+
+PYTHONPATH=. python -m benchmarks.bench_click_latency
+"""
+
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.dispatcher import Dispatcher
+from bot.domain.order_state import OrderState
+from bot.handlers.pizza_size import PizzaSizeHandler
+
+ROUND_TRIP = 0.02
+STORAGE_LATENCY = 0.002
+
+
+class SlowTelegram:
+    def __init__(self) -> None:
+        self.events: dict[str, float] = {}
+        self._random = random.Random(1)
+        self._lock = threading.Lock()
+
+    def _call(self, event: str) -> dict:
+        with self._lock:
+            delay = ROUND_TRIP * (0.5 + self._random.expovariate(2.0))
+        time.sleep(delay)
+        self.events[event] = time.perf_counter()
+        return {}
+
+    def answer_callback_query(self, callback_query_id: str, **kwargs) -> dict:
+        return self._call("spinner")
+
+    def delete_message(self, chat_id: int, message_id: int) -> dict:
+        return self._call("deleted")
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+        return self._call("visible")
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict:
+        return self._call("visible")
+
+
+class SlowStorage:
+    def get_user(self, telegram_id: int) -> dict:
+        time.sleep(STORAGE_LATENCY)
+        return {"state": OrderState.WAIT_FOR_PIZZA_SIZE.value, "order_json": {}}
+
+    def transition(self, telegram_id, state, order_patch=None, reset=False) -> None:
+        time.sleep(STORAGE_LATENCY)
+
+
+def click(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": {"id": 42},
+            "message": {"message_id": update_id, "chat": {"id": 42}},
+            "data": "size_medium",
+        },
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main() -> None:
+    clicks = 200
+    executor = ThreadPoolExecutor(max_workers=4)
+    for label, side_effects in (("serial", None), ("pipelined", executor)):
+        telegram = SlowTelegram()
+        dispatcher = Dispatcher(SlowStorage(), telegram, side_effects=side_effects)
+        dispatcher.add_handlers(PizzaSizeHandler())
+        latencies: dict[str, list[float]] = {"spinner": [], "visible": []}
+        for update_id in range(clicks):
+            started = time.perf_counter()
+            dispatcher.dispatch(click(update_id))
+            for event, values in latencies.items():
+                values.append((telegram.events[event] - started) * 1000)
+        print(f"{label}:")
+        for event, values in latencies.items():
+            print(
+                f"  {event:8} p50 {statistics.median(values):6.1f} ms, "
+                f"p99 {percentile(values, 0.99):6.1f} ms"
+            )
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
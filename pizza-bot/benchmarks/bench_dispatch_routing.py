@@ -0,0 +1,70 @@
+"""Dispatch cost with a linear can_handle scan versus the route index.
+
+PYTHONPATH=. python -m benchmarks.bench_dispatch_routing
+"""
+
+import timeit
+
+from bot.dispatcher import Dispatcher
+from bot.domain.order_state import OrderState
+from bot.handlers.handler import Handler, HandlerStatus, Route
+
+
+class PrefixHandler(Handler):
+    def __init__(self, prefix: str, state: OrderState, indexed: bool) -> None:
+        self.prefix = prefix
+        self.state = state
+        if indexed:
+            self.routes = (Route("callback_query", state, prefix),)
+
+    def can_handle(self, update, state, order_json, storage, messenger) -> bool:
+        if "callback_query" not in update or state != self.state:
+            return False
+        return update["callback_query"]["data"].startswith(self.prefix)
+
+    def handle(self, update, state, order_json, storage, messenger) -> HandlerStatus:
+        return HandlerStatus.STOP
+
+
+STATES = list(OrderState)
+
+
+class MemoryStorage:
+    def __init__(self, state: OrderState) -> None:
+        self.state = state
+
+    def get_user(self, telegram_id: int) -> dict:
+        return {"state": self.state.value, "order_json": {}}
+
+
+def make_dispatcher(handler_count: int, indexed: bool) -> Dispatcher:
+    # The user is in the state of the last registered handler.
+    storage = MemoryStorage(STATES[(handler_count - 1) % len(STATES)])
+    dispatcher = Dispatcher(storage, None)
+    dispatcher.add_handlers(
+        *(
+            PrefixHandler(f"action{index}_", STATES[index % len(STATES)], indexed)
+            for index in range(handler_count)
+        )
+    )
+    return dispatcher
+
+
+def main() -> None:
+    number = 20000
+    for handler_count in (10, 100):
+        # The last registered handler matches, the worst case for a linear scan.
+        last = handler_count - 1
+        update = {
+            "update_id": 1,
+            "callback_query": {"from": {"id": 42}, "data": f"action{last}_x"},
+        }
+        print(f"{handler_count} handlers:")
+        for label, indexed in (("linear", False), ("indexed", True)):
+            dispatcher = make_dispatcher(handler_count, indexed)
+            seconds = timeit.timeit(lambda: dispatcher.dispatch(update), number=number)
+            print(f"  {label:8} {seconds / number * 1e6:7.2f} us/dispatch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""End-to-end throughput, dispatch latency and allocations per update.
+
+N virtual users click through /start -> pizza -> size -> drink -> approve
+against the real handlers, a recording messenger and one storage backend:
+memory, sqlite (a temporary file) or postgres (the POSTGRES_* environment,
+skipped when POSTGRES_HOST is not set). Users advance in lockstep, so every
+step interleaves all chats like a busy bot does.
+
+Results are printed as JSON; compare two runs with benchmarks.compare_results.
+
+PYTHONPATH=. python -m benchmarks.bench_end_to_end --users 1000 --output new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from bot.dispatcher import Dispatcher
+from bot.domain.order_state import OrderState
+from bot.domain.storage import Storage
+from bot.event_buffer import EventBuffer
+from bot.handlers import get_handlers
+from bot.infrastructure.messenger_instrumented import InstrumentedMessenger
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_cached import CachedStorage
+from bot.infrastructure.storage_instrumented import InstrumentedStorage
+from bot.infrastructure.storage_memory import StorageMemory
+from bot.metrics import Metrics
+
+BACKENDS = ("memory", "sqlite", "postgres")
+STEPS = ("/start", "pizza_margherita", "size_medium", "drink_water", "order_approve")
+# Far above real Telegram ids so a shared Postgres keeps its own users intact.
+FIRST_TELEGRAM_ID = 9_000_000_000
+
+
+def flow_updates(users: int) -> Iterator[dict]:
+    update_id = 0
+    for step in STEPS:
+        for user in range(users):
+            update_id += 1
+            telegram_id = FIRST_TELEGRAM_ID + user
+            chat = {"id": telegram_id, "type": "private"}
+            sender = {"id": telegram_id, "is_bot": False, "first_name": "Bench"}
+            if step == "/start":
+                yield {
+                    "update_id": update_id,
+                    "message": {
+                        "message_id": 1,
+                        "from": sender,
+                        "chat": chat,
+                        "date": 0,
+                        "text": "/start",
+                    },
+                }
+            else:
+                yield {
+                    "update_id": update_id,
+                    "callback_query": {
+                        "id": str(update_id),
+                        "from": sender,
+                        "message": {"message_id": 2, "chat": chat, "date": 0},
+                        "data": step,
+                    },
+                }
+
+
+@contextmanager
+def open_storage(backend: str) -> Iterator[Storage]:
+    if backend == "memory":
+        yield StorageMemory(max_events=0)
+    elif backend == "sqlite":
+        from bot.infrastructure.storage_sqlite import StorageSqlite
+
+        with tempfile.TemporaryDirectory() as directory:
+            previous = os.environ.get("SQLITE_DATABASE_PATH")
+            os.environ["SQLITE_DATABASE_PATH"] = os.path.join(directory, "bench.db")
+            try:
+                storage = StorageSqlite()
+                storage.migrate()
+                yield storage
+            finally:
+                if previous is None:
+                    del os.environ["SQLITE_DATABASE_PATH"]
+                else:
+                    os.environ["SQLITE_DATABASE_PATH"] = previous
+    elif backend == "postgres":
+        from bot.infrastructure.storage_postgres import StoragePostgres
+
+        storage = StoragePostgres()
+        storage.migrate()
+        try:
+            yield storage
+        finally:
+            storage.close()
+    else:
+        raise ValueError(f"unknown backend: {backend}")
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(
+    backend: str,
+    users: int,
+    cache: bool = True,
+    event_buffer: bool = True,
+    trace_allocations: bool = False,
+    metrics: bool = False,
+) -> dict:
+    """Dispatch the whole flow once against a freshly opened backend."""
+    with open_storage(backend) as storage:
+        registry = Metrics() if metrics else None
+        if registry is not None:
+            storage = InstrumentedStorage(storage, registry)
+        if cache:
+            storage = CachedStorage(storage)
+        buffer = EventBuffer(storage) if event_buffer else None
+        recorder = MessengerRecording(max_calls=0)
+        messenger = recorder
+        if registry is not None:
+            messenger = InstrumentedMessenger(recorder, registry)
+        dispatcher = Dispatcher(storage, messenger, metrics=registry)
+        dispatcher.add_handlers(*get_handlers(buffer))
+
+        latencies = []
+        allocated = 0
+        if trace_allocations:
+            tracemalloc.start()
+            retained_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        for update in flow_updates(users):
+            if trace_allocations:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            update_started = time.perf_counter()
+            dispatcher.dispatch(update)
+            latencies.append(time.perf_counter() - update_started)
+            if trace_allocations:
+                allocated += tracemalloc.get_traced_memory()[1] - before
+        if buffer is not None:
+            buffer.close()
+        elapsed = time.perf_counter() - started
+        if trace_allocations:
+            retained = tracemalloc.get_traced_memory()[0] - retained_before
+            tracemalloc.stop()
+
+        finished = sum(
+            1
+            for user in range(users)
+            if (storage.get_user(FIRST_TELEGRAM_ID + user) or {}).get("state")
+            == OrderState.ORDER_FINISHED
+        )
+
+    result = {
+        "updates": len(latencies),
+        "orders_finished": finished,
+        "seconds": round(elapsed, 4),
+        "updates_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 4),
+            "p95": round(percentile(latencies, 0.95) * 1000, 4),
+            "p99": round(percentile(latencies, 0.99) * 1000, 4),
+            "max": round(max(latencies) * 1000, 4),
+        },
+        "telegram_calls": dict(recorder.counts),
+    }
+    if trace_allocations:
+        result["peak_bytes_per_update"] = round(allocated / len(latencies), 1)
+        result["retained_bytes_per_update"] = round(retained / len(latencies), 1)
+    return result
+
+
+def benchmark(backend: str, users: int, **options) -> dict:
+    if backend == "postgres" and not os.getenv("POSTGRES_HOST"):
+        return {"backend": backend, "skipped": "POSTGRES_HOST is not set"}
+    # tracemalloc slows every allocation, so timings come from a separate pass.
+    timed = run(backend, users, **options)
+    traced = run(backend, users, trace_allocations=True, **options)
+    return {
+        "backend": backend,
+        **timed,
+        "peak_bytes_per_update": traced["peak_bytes_per_update"],
+        "retained_bytes_per_update": traced["retained_bytes_per_update"],
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks.bench_end_to_end")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument(
+        "--backend", action="append", choices=BACKENDS, help="default: all"
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-event-buffer", action="store_true")
+    parser.add_argument(
+        "--metrics", action="store_true", help="record metrics, to measure overhead"
+    )
+    parser.add_argument("--output", help="also write the JSON to this file")
+    args = parser.parse_args(argv)
+
+    options = {
+        "cache": not args.no_cache,
+        "event_buffer": not args.no_event_buffer,
+        "metrics": args.metrics,
+    }
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "users": args.users,
+        **options,
+        "results": [
+            benchmark(backend, args.users, **options)
+            for backend in args.backend or BACKENDS
+        ],
+    }
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(encoded + "\n")
+    sys.stdout.write(encoded + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Per-call latency of urllib.request versus the keep-alive HttpTransport.
+
+Runs against a local fake Telegram server:
+
+    PYTHONPATH=. python -m benchmarks.bench_http_transport --calls 500
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bot.infrastructure.http_transport import HttpTransport
+
+RESPONSE = json.dumps({"ok": True, "result": {"message_id": 1}}).encode("utf-8")
+REQUEST = json.dumps({"chat_id": 1, "text": "Please choose some drinks"}).encode(
+    "utf-8"
+)
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def call_urllib(url: str) -> None:
+    request = urllib.request.Request(
+        method="POST",
+        url=url,
+        data=REQUEST,
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def measure(name: str, call, calls: int) -> dict:
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "client": name,
+        "calls": calls,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegramHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/bot123/sendMessage"
+
+    transport = HttpTransport()
+    results = [
+        measure("urllib", lambda: call_urllib(url), args.calls),
+        measure("keep-alive", lambda: transport.post(url, REQUEST), args.calls),
+    ]
+    server.shutdown()
+
+    for result in results:
+        print(
+            f"{result['client']:>10}: mean {result['mean_ms']:.3f} ms, "
+            f"p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms"
+        )
+    print(f"speedup (mean): {results[0]['mean_ms'] / results[1]['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
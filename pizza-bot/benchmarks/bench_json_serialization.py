@@ -0,0 +1,75 @@
+"""Row size and encode/decode throughput: indent=2 text versus compact JSON.
+
+PYTHONPATH=. python -m benchmarks.bench_json_serialization
+"""
+
+import json
+import timeit
+
+from bot.infrastructure.json_codec import dumps_compact
+
+ORDER = {
+    "pizza_name": "Quattro Stagioni",
+    "pizza_size": "Extra Large (40cm)",
+    "drink": "Orange Juice",
+}
+
+UPDATE = {
+    "update_id": 123456789,
+    "callback_query": {
+        "id": "4382bfdwdsb323b2d9",
+        "from": {
+            "id": 12345,
+            "is_bot": False,
+            "first_name": "Анастасия",
+            "username": "testuser",
+            "language_code": "ru",
+        },
+        "message": {
+            "message_id": 10,
+            "from": {"id": 7000000000, "is_bot": True, "first_name": "Pizza bot"},
+            "chat": {"id": 12345, "first_name": "Анастасия", "type": "private"},
+            "date": 1640995200,
+            "text": "Please choose some drinks",
+        },
+        "chat_instance": "-1234567890123456789",
+        "data": "drink_orange_juice",
+    },
+}
+
+
+def dumps_pretty(value: object) -> str:
+    return json.dumps(value, ensure_ascii=False, indent=2)
+
+
+def main() -> None:
+    number = 20000
+    for name, value in (("order_json", ORDER), ("telegram_events.payload", UPDATE)):
+        pretty = dumps_pretty(value)
+        compact = dumps_compact(value)
+        pretty_size = len(pretty.encode("utf-8"))
+        compact_size = len(compact.encode("utf-8"))
+        print(f"{name}:")
+        print(
+            f"  size: indent=2 {pretty_size} B, compact {compact_size} B "
+            f"({1 - compact_size / pretty_size:.0%} smaller)"
+        )
+        for label, dumps, text in (
+            ("indent=2", dumps_pretty, pretty),
+            ("compact", dumps_compact, compact),
+        ):
+            encode = timeit.timeit(lambda: dumps(value), number=number)
+            decode = timeit.timeit(lambda: json.loads(text), number=number)
+            print(
+                f"  {label:>8}: encode {number / encode:,.0f}/s, "
+                f"decode {number / decode:,.0f}/s"
+            )
+
+    # What Dispatcher.dispatch saves per update when Storage hands out a dict.
+    pretty_order = dumps_pretty(ORDER)
+    decode = timeit.timeit(lambda: json.loads(pretty_order), number=number)
+    print(f"dispatcher decode avoided: {decode / number * 1e6:.2f} us per update")
+
+
+if __name__ == "__main__":
+    main()
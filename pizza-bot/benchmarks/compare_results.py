@@ -0,0 +1,59 @@
+"""Compare two bench_end_to_end JSON reports backend by backend.
+
+PYTHONPATH=. python -m benchmarks.compare_results old.json new.json
+"""
+
+import json
+import sys
+
+# (label, path into a result, True when larger is better)
+METRICS = (
+    ("updates/s", ("updates_per_second",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+    ("peak B/update", ("peak_bytes_per_update",), False),
+    ("retained B/update", ("retained_bytes_per_update",), False),
+)
+
+
+def lookup(result: dict, path: tuple[str, ...]) -> float | None:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    lines = [f"{old.get('commit')} -> {new.get('commit')}"]
+    old_results = {result["backend"]: result for result in old["results"]}
+    for result in new["results"]:
+        backend = result["backend"]
+        previous = old_results.get(backend)
+        if previous is None or "skipped" in result or "skipped" in previous:
+            lines.append(f"{backend}: not comparable")
+            continue
+        lines.append(f"{backend}:")
+        for label, path, higher_is_better in METRICS:
+            before, after = lookup(previous, path), lookup(result, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = change < 0 if higher_is_better else change > 0
+            marker = "  worse" if worse and abs(change) >= 5 else ""
+            lines.append(
+                f"  {label:18} {before:12.3f} -> {after:12.3f} ({change:+6.1f}%){marker}"
+            )
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    old_path, new_path = argv if argv is not None else sys.argv[1:]
+    with open(old_path) as old_file, open(new_path) as new_file:
+        lines = compare(json.load(old_file), json.load(new_file))
+    print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
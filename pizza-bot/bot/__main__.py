@@ -1,25 +1,265 @@
+import asyncio
+import os
+import signal
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from bot.async_dispatcher import AsyncDispatcher
 from bot.dispatcher import Dispatcher
+from bot.event_archive import EventMaintenance
+from bot.event_buffer import EventBuffer
 from bot.handlers import get_handlers
-from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
+from bot.infrastructure.messenger_async import AsyncMessenger
+from bot.infrastructure.messenger_instrumented import InstrumentedMessenger
+from bot.infrastructure.messenger_rate_limited import RateLimitedMessenger
 from bot.infrastructure.messenger_telegram import MessengerTelegram
+from bot.infrastructure.storage_cached import CachedStorage
+from bot.infrastructure.storage_instrumented import InstrumentedStorage
+from bot.metrics import Metrics, serve_metrics
+from bot.profiling import DispatchProfiler
+from bot.tracing import JsonLinesSpanExporter, Tracer
+from bot.update_checkpoint import UpdateCheckpoint
 
 # from bot.infrastructure.storage_sqlite import StorageSqlite
-from bot.infrastructure.storage_postgres import StoragePostgres
+from bot.infrastructure.storage_postgres import (
+    MAINTENANCE_LOCK_ID,
+    POLLER_LOCK_ID,
+    StoragePostgres,
+)
 import bot.long_polling
 
 
+def create_tracer(
+    suffix: str = "",
+) -> tuple[Tracer | None, JsonLinesSpanExporter | None]:
+    if not os.getenv("TRACE_FILE"):
+        return None, None
+    span_exporter = JsonLinesSpanExporter(os.getenv("TRACE_FILE") + suffix)
+    return Tracer(span_exporter), span_exporter
+
+
+def create_storage(
+    backend: Storage, metrics: Metrics, tracer: Tracer | None, cache: bool = True
+) -> Storage:
+    storage = InstrumentedStorage(backend, metrics, tracer)
+    if cache and int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")) > 0:
+        storage = CachedStorage(
+            storage,
+            max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+            ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+            max_bytes=int(os.getenv("USER_CACHE_MAX_BYTES", "16777216")),
+        )
+    return storage
+
+
+def create_messenger(
+    metrics: Metrics, tracer: Tracer | None, processes: int = 1
+) -> RateLimitedMessenger:
+    # Telegram's global limit is per bot, so worker processes split it.
+    return RateLimitedMessenger(
+        InstrumentedMessenger(MessengerTelegram(), metrics, tracer),
+        global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "28")) / processes,
+        global_burst=max(float(os.getenv("TELEGRAM_GLOBAL_BURST", "5")) / processes, 1),
+        chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", "1")),
+        chat_burst=float(os.getenv("TELEGRAM_CHAT_BURST", "3")),
+        senders=int(os.getenv("TELEGRAM_SENDERS", "8")),
+    )
+
+
+def create_event_buffer(storage: Storage) -> EventBuffer:
+    return EventBuffer(
+        storage,
+        capacity=int(os.getenv("EVENT_BUFFER_CAPACITY", "10000")),
+        batch_size=int(os.getenv("EVENT_BUFFER_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("EVENT_BUFFER_FLUSH_INTERVAL", "1")),
+    )
+
+
+def create_side_effects() -> ThreadPoolExecutor:
+    # Callback answers and deletes run here instead of on the click's path.
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("BOT_SIDE_EFFECT_WORKERS", "4")),
+        thread_name_prefix="side-effects",
+    )
+
+
+def start_metrics_server(metrics: Metrics, offset: int = 0):
+    port = int(os.getenv("METRICS_PORT", "9100") or "0")
+    if not port:
+        return None
+    return serve_metrics(metrics, os.getenv("METRICS_HOST", "127.0.0.1"), port + offset)
+
+
+def build_worker(index: int, workers: int) -> tuple[Dispatcher, Callable[[], None]]:
+    """Dispatcher of one BOT_RUNTIME=processes worker, built inside it.
+
+    Worker i serves its metrics on METRICS_PORT + 1 + i and writes spans
+    to TRACE_FILE.i.
+    """
+    metrics = Metrics()
+    metrics_server = start_metrics_server(metrics, offset=1 + index)
+    tracer, span_exporter = create_tracer(f".{index}")
+    backend = StoragePostgres()
+    storage = create_storage(backend, metrics, tracer)
+    messenger = create_messenger(metrics, tracer, processes=workers)
+    event_buffer = create_event_buffer(storage)
+    side_effects = create_side_effects()
+    dispatcher = Dispatcher(
+        storage, messenger, side_effects=side_effects, metrics=metrics, tracer=tracer
+    )
+    dispatcher.add_handlers(*get_handlers(event_buffer))
+
+    def close() -> None:
+        event_buffer.close()
+        side_effects.shutdown(wait=True)
+        messenger.close()
+        backend.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if span_exporter is not None:
+            span_exporter.close()
+
+    return dispatcher, close
+
+
 def main() -> None:
+    # docker stop sends SIGTERM; treat it like Ctrl+C so buffers get flushed.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    backend: Storage | None = None
+    event_buffer = None
+    messenger = None
+    side_effects = None
+    metrics_server = None
+    profiler = None
+    span_exporter = None
+    event_maintenance = None
     try:
+        metrics = Metrics()
+        metrics_server = start_metrics_server(metrics)
+        tracer, span_exporter = create_tracer()
+        # BOT_RUNTIME=sync keeps the original one-update-at-a-time loop.
+        runtime = os.getenv("BOT_RUNTIME", "sync")
+
         # storage: Storage = StorageSqlite()
-        storage: Storage = StoragePostgres()
-        messenger: Messenger = MessengerTelegram()
+        backend = StoragePostgres()
+        # A no-op check unless a deploy brought new migrations.
+        applied = backend.migrate()
+        if applied:
+            print(f"applied migrations: {applied}")
+        # Creates the coming days' event partitions; with EVENT_RETENTION_DAYS
+        # also archives and drops the expired ones.
+        retention_days = int(os.getenv("EVENT_RETENTION_DAYS", "0"))
+        event_maintenance = EventMaintenance(
+            backend,
+            os.getenv("EVENT_ARCHIVE_DIR", "archive"),
+            retention=timedelta(days=retention_days) if retention_days else None,
+            interval=float(os.getenv("EVENT_MAINTENANCE_INTERVAL", "3600")),
+            # Every instance runs this; the lock keeps rounds from overlapping.
+            lock=backend.advisory_lock(MAINTENANCE_LOCK_ID),
+        )
+        # With BOT_RUNTIME=queue a user's next update may run on another
+        # instance, so a cached user row could be stale.
+        storage = create_storage(backend, metrics, tracer, cache=runtime != "queue")
+        checkpoint = UpdateCheckpoint(
+            storage,
+            save_interval=float(os.getenv("UPDATE_CHECKPOINT_INTERVAL", "5")),
+        )
+
+        if runtime == "processes":
+            # This process only polls; workers build their own dispatchers.
+            bot.long_polling.start_long_polling_multiprocess(
+                InstrumentedMessenger(MessengerTelegram(), metrics),
+                build_worker,
+                workers=int(os.getenv("BOT_PROCESS_WORKERS", "4")),
+                queue_depth=int(os.getenv("BOT_PROCESS_QUEUE_DEPTH", "100")),
+                checkpoint=checkpoint,
+                metrics=metrics,
+            )
+            return
+
+        messenger = create_messenger(metrics, tracer)
+        event_buffer = create_event_buffer(storage)
+        side_effects = create_side_effects()
+        # PROFILE_DISPATCH_EVERY=N samples every Nth dispatch from the start;
+        # SIGUSR1 switches sampling on and off at runtime.
+        profile_every = int(os.getenv("PROFILE_DISPATCH_EVERY", "0"))
+        profiler = DispatchProfiler(
+            os.getenv("PROFILE_DISPATCH_DIR", "profiles"),
+            every=profile_every or 100,
+            window=float(os.getenv("PROFILE_DISPATCH_WINDOW", "60")),
+            enabled=profile_every > 0,
+        )
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle())
+        dispatcher = Dispatcher(
+            storage,
+            messenger,
+            side_effects=side_effects,
+            metrics=metrics,
+            profiler=profiler,
+            tracer=tracer,
+        )
+        dispatcher.add_handlers(*get_handlers(event_buffer))
 
-        dispatcher = Dispatcher(storage, messenger)
-        dispatcher.add_handlers(*get_handlers())
-        bot.long_polling.start_long_polling(dispatcher, messenger)
+        if runtime == "async":
+            async_dispatcher = AsyncDispatcher(
+                dispatcher, max_workers=int(os.getenv("BOT_ASYNC_WORKERS", "8"))
+            )
+            asyncio.run(
+                bot.long_polling.start_long_polling_async(
+                    async_dispatcher,
+                    AsyncMessenger(messenger),
+                    checkpoint=checkpoint,
+                    metrics=metrics,
+                )
+            )
+        elif runtime == "queue":
+            bot.long_polling.start_long_polling_queue(
+                dispatcher,
+                messenger,
+                storage,
+                backend.advisory_lock(POLLER_LOCK_ID),
+                workers=int(os.getenv("BOT_QUEUE_WORKERS", "4")),
+                claim_batch=int(os.getenv("BOT_QUEUE_CLAIM_BATCH", "10")),
+                lease=float(os.getenv("BOT_QUEUE_LEASE", "60")),
+                leader_retry=float(os.getenv("BOT_QUEUE_LEADER_RETRY", "5")),
+                metrics=metrics,
+            )
+        elif runtime == "threads":
+            bot.long_polling.start_long_polling_threaded(
+                dispatcher,
+                messenger,
+                workers=int(os.getenv("BOT_THREAD_WORKERS", "4")),
+                queue_depth=int(os.getenv("BOT_THREAD_QUEUE_DEPTH", "100")),
+                checkpoint=checkpoint,
+                metrics=metrics,
+            )
+        else:
+            bot.long_polling.start_long_polling(
+                dispatcher, messenger, checkpoint=checkpoint, metrics=metrics
+            )
     except KeyboardInterrupt:
         print("\nBye!")
+    finally:
+        if event_buffer is not None:
+            event_buffer.close()
+        if event_maintenance is not None:
+            event_maintenance.close()
+        if side_effects is not None:
+            side_effects.shutdown(wait=True)
+        if messenger is not None:
+            messenger.close()
+        # Last user of the pool: the buffer and maintenance are flushed above.
+        if backend is not None:
+            backend.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if profiler is not None:
+            profiler.flush()
+        if span_exporter is not None:
+            span_exporter.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""Administrative database commands.
+
+python -m bot.admin migrate
+python -m bot.admin recreate-database --yes
+python -m bot.admin archive-events --retention-days 30 --output-dir archive
+
+Add --sqlite to run against SQLITE_DATABASE_PATH instead of Postgres.
+"""
+
+import argparse
+from datetime import timedelta
+
+from bot.domain.storage import Storage
+from bot.event_archive import archive_expired_events
+
+
+def get_storage(sqlite: bool) -> Storage:
+    if sqlite:
+        from bot.infrastructure.storage_sqlite import StorageSqlite
+
+        return StorageSqlite()
+    from bot.infrastructure.storage_postgres import StoragePostgres
+
+    return StoragePostgres()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bot.admin")
+    parser.add_argument(
+        "--sqlite", action="store_true", help="use SQLite instead of Postgres"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="apply pending schema migrations")
+    recreate = commands.add_parser(
+        "recreate-database",
+        help="drop every table and recreate the schema; all data is lost",
+    )
+    recreate.add_argument("--yes", action="store_true", help="confirm data loss")
+    archive = commands.add_parser(
+        "archive-events",
+        help="write expired telegram_events partitions to gzipped NDJSON "
+        "files and drop them",
+    )
+    archive.add_argument("--retention-days", type=int, required=True)
+    archive.add_argument("--output-dir", default="archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "recreate-database" and not args.yes:
+        parser.error("recreate-database drops all sessions and events; pass --yes")
+    if args.command == "archive-events" and args.retention_days < 1:
+        parser.error("--retention-days must be at least 1")
+
+    storage = get_storage(args.sqlite)
+    if args.command == "migrate":
+        applied = storage.migrate()
+        print(f"applied migrations: {applied}" if applied else "schema is up to date")
+    elif args.command == "archive-events":
+        lock = None
+        if not args.sqlite:
+            from bot.infrastructure.storage_postgres import MAINTENANCE_LOCK_ID
+
+            # Running bots archive under the same lock.
+            lock = storage.advisory_lock(MAINTENANCE_LOCK_ID)
+            if not lock.try_acquire():
+                parser.exit(1, "event maintenance is running; try again later\n")
+        try:
+            # SQLite only rolls over yesterday's events here or in the running bot.
+            storage.rotate_events()
+            archived = archive_expired_events(
+                storage, args.output_dir, timedelta(days=args.retention_days)
+            )
+        finally:
+            if lock is not None:
+                lock.release()
+        for path, count in archived:
+            print(f"archived {count} events to {path}")
+        if not archived:
+            print("no expired partitions")
+    else:
+        storage.recreate_database()
+        print("database recreated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.dispatcher import Dispatcher, get_telegram_id
+
+
+class AsyncDispatcher:
+    """Runs Dispatcher.dispatch concurrently for different users.
+
+    Updates that share a telegram_id are chained, so one user's clicks are
+    handled strictly in arrival order while other users proceed in parallel.
+    Handlers and storage drivers are blocking, so dispatch itself runs on a
+    bounded thread pool.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, max_workers: int = 8) -> None:
+        self._dispatcher = dispatcher
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="dispatch"
+        )
+        self._tails: dict[object, asyncio.Future] = {}
+
+    async def dispatch(self, update: dict) -> None:
+        key = self._ordering_key(update)
+        previous = self._tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._tails[key] = done
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._dispatcher.dispatch, update
+            )
+        finally:
+            done.set_result(None)
+            if self._tails.get(key) is done:
+                del self._tails[key]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _ordering_key(self, update: dict) -> object:
+        telegram_id = get_telegram_id(update)
+        if telegram_id is None:
+            return ("update", update.get("update_id"))
+        return telegram_id
@@ -1,54 +1,253 @@
 import json
-from bot.handlers.handler import Handler, HandlerStatus
+import threading
+import time
+import traceback
+from concurrent.futures import Executor
+
+from bot.handlers.handler import Handler, HandlerStatus, Route
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
+from bot.infrastructure.messenger_pipelined import PipelinedMessenger
+from bot.metrics import Metrics
+from bot.profiling import DispatchProfiler
+from bot.tracing import Tracer, start_span
+
+
+def get_telegram_id(update: dict) -> int | None:
+    if "message" in update:
+        return update["message"]["from"]["id"]
+    elif "callback_query" in update:
+        return update["callback_query"]["from"]["id"]
+    return None
+
+
+def get_update_kind(update: dict) -> str | None:
+    return next((key for key in update if key != "update_id"), None)
+
+
+class UserContext:
+    """User row of one update, read from Storage only when first needed."""
+
+    def __init__(self, storage: Storage, telegram_id: int | None) -> None:
+        self._storage = storage
+        self._telegram_id = telegram_id
+        self._user: dict | None = None
+        self._order: dict | None = None
+        self.loaded = False
+
+    @property
+    def state(self) -> str | None:
+        user = self._load()
+        return user.get("state") if user else None
+
+    @property
+    def order(self) -> dict:
+        if self._order is None:
+            user = self._load()
+            # Storage hands out the already decoded order; text is still accepted.
+            order = user.get("order_json") if user else None
+            if isinstance(order, str):
+                order = json.loads(order)
+            self._order = order if order is not None else {}
+        return self._order
+
+    def _load(self) -> dict | None:
+        if not self.loaded:
+            self.loaded = True
+            if self._telegram_id:
+                self._user = self._storage.get_user(self._telegram_id)
+        return self._user
 
 
 class Dispatcher:
-    def __init__(self, storage: Storage, messenger: Messenger) -> None:
+    def __init__(
+        self,
+        storage: Storage,
+        messenger: Messenger,
+        side_effects: Executor | None = None,
+        metrics: Metrics | None = None,
+        profiler: DispatchProfiler | None = None,
+        tracer: Tracer | None = None,
+    ) -> None:
         self._handlers: list[Handler] = []
         self._storage: Storage = storage
         self._messenger: Messenger = messenger
+        # With an executor, callback answers and deletes run in the background.
+        self._side_effects = side_effects
+        self._metrics = metrics
+        self._profiler = profiler
+        self._tracer = tracer
+        # Routing index built by add_handlers: (kind, key type, key) -> routes.
+        self._unrouted: list[tuple[int, Handler]] = []
+        self._routes: dict[tuple, list[tuple[int, Handler, Route]]] = {}
+        self._prefix_lengths: list[int] = []
+        self._stats_lock = threading.Lock()
+        self._dispatched = 0
+        self._user_reads = 0
+        self._user_reads_avoided = 0
+        self._side_effect_errors = 0
 
     def unused_method(self) -> None:
         return None
 
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "dispatched": self._dispatched,
+                "user_reads": self._user_reads,
+                "user_reads_avoided": self._user_reads_avoided,
+                "side_effect_errors": self._side_effect_errors,
+            }
+
     def add_handlers(self, *handlers: Handler) -> None:
         for handler in handlers:
+            position = len(self._handlers)
             self._handlers.append(handler)
+            if not handler.routes:
+                self._unrouted.append((position, handler))
+            for route in handler.routes:
+                if route.command is not None:
+                    key = (route.kind, "command", route.command)
+                elif route.callback_prefix is not None:
+                    key = (route.kind, "callback", route.callback_prefix)
+                    if len(route.callback_prefix) not in self._prefix_lengths:
+                        self._prefix_lengths.append(len(route.callback_prefix))
+                        self._prefix_lengths.sort()
+                else:
+                    key = (route.kind, None, None)
+                self._routes.setdefault(key, []).append((position, handler, route))
+
+    def _route(self, update: dict) -> list[tuple[Handler, list[Route | None]]]:
+        """Handlers whose routes match the update, in registration order."""
+        matches: dict[int, tuple[Handler, list[Route | None]]] = {
+            position: (handler, [None]) for position, handler in self._unrouted
+        }
+
+        def collect(key: tuple) -> None:
+            for position, handler, route in self._routes.get(key, ()):
+                matches.setdefault(position, (handler, []))[1].append(route)
+
+        kind = get_update_kind(update)
+        text = update["message"].get("text") if "message" in update else None
+        data = (
+            update["callback_query"].get("data") if "callback_query" in update else None
+        )
+        for route_kind in (kind, None) if kind is not None else (None,):
+            collect((route_kind, None, None))
+            if text is not None:
+                collect((route_kind, "command", text))
+            if data is not None:
+                for length in self._prefix_lengths:
+                    if length > len(data):
+                        break
+                    collect((route_kind, "callback", data[:length]))
+
+        return [matches[position] for position in sorted(matches)]
 
     def _get_telegram_id_from_update(self, update: dict) -> int | None:
-        if "message" in update:
-            return update["message"]["from"]["id"]
-        elif "callback_query" in update:
-            return update["callback_query"]["from"]["id"]
-        return None
+        return get_telegram_id(update)
 
     def dispatch(self, update: dict) -> None:
         telegram_id = self._get_telegram_id_from_update(update)
-        user = self._storage.get_user(telegram_id) if telegram_id else None
-
-        user_state = user.get("state") if user else None
-
-        user_data = user["order_json"] if user else "{}"
-        if user_data is None:
-            user_data = "{}"
-        order_data = json.loads(user_data)
-
-        for handler in self._handlers:
-            if handler.can_handle(
-                update,
-                user_state,
-                order_data,
-                self._storage,
-                self._messenger,
-            ):
-                status = handler.handle(
+        user = UserContext(self._storage, telegram_id)
+        messenger = self._messenger
+        if self._side_effects is not None:
+            messenger = PipelinedMessenger(self._messenger, self._side_effects)
+        errors: list[BaseException] = []
+        started = time.perf_counter()
+        root_span = start_span(
+            self._tracer,
+            "dispatch",
+            _span_attributes(update, telegram_id) if self._tracer else None,
+        )
+        with root_span as root:
+            try:
+                if self._profiler is not None and self._profiler.should_sample():
+                    with self._profiler.sample():
+                        self._dispatch(update, user, messenger)
+                else:
+                    self._dispatch(update, user, messenger)
+            finally:
+                if self._metrics is not None:
+                    self._metrics.dispatch_seconds.observe(
+                        time.perf_counter() - started
+                    )
+                    self._metrics.updates.inc(get_update_kind(update) or "unknown")
+                if isinstance(messenger, PipelinedMessenger):
+                    errors = messenger.wait()
+                    for error in errors:
+                        traceback.print_exception(error)
+                if root is not None and user.loaded:
+                    root.set_attribute("bot.state", user.state)
+                with self._stats_lock:
+                    self._dispatched += 1
+                    self._side_effect_errors += len(errors)
+                    if user.loaded:
+                        self._user_reads += 1
+                    elif telegram_id:
+                        self._user_reads_avoided += 1
+
+    def _dispatch(self, update: dict, user: UserContext, messenger: Messenger) -> None:
+        handlers = self._route(update)
+
+        # Stop the client's spinner before any storage or handler work.
+        if "callback_query" in update:
+            messenger.answer_callback_query(update["callback_query"]["id"])
+
+        for handler, routes in handlers:
+            # Only read the user when every matched route is bound to a state.
+            states = [
+                route.state
+                for route in routes
+                if route is not None and route.state is not None
+            ]
+            if len(states) == len(routes) and user.state not in states:
+                continue
+
+            if handler.needs_user:
+                user_state, order_data = user.state, user.order
+            else:
+                user_state, order_data = None, {}
+
+            with self._handler_span(handler, "can_handle", user_state):
+                can_handle = handler.can_handle(
                     update,
                     user_state,
                     order_data,
                     self._storage,
-                    self._messenger,
+                    messenger,
                 )
+            if can_handle:
+                handler_started = time.perf_counter()
+                with self._handler_span(handler, "handle", user_state):
+                    status = handler.handle(
+                        update,
+                        user_state,
+                        order_data,
+                        self._storage,
+                        messenger,
+                    )
+                if self._metrics is not None:
+                    self._metrics.handler_seconds.observe(
+                        time.perf_counter() - handler_started, type(handler).__name__
+                    )
                 if status == HandlerStatus.STOP:
                     break
+
+    def _handler_span(self, handler: Handler, method: str, state: str | None):
+        name = type(handler).__name__
+        return start_span(
+            self._tracer,
+            f"{name}.{method}",
+            {"bot.handler": name, "bot.state": state} if self._tracer else None,
+        )
+
+
+def _span_attributes(update: dict, telegram_id: int | None) -> dict:
+    callback_query = update.get("callback_query")
+    return {
+        "bot.update_id": update.get("update_id"),
+        "bot.update_kind": get_update_kind(update),
+        "bot.telegram_id": telegram_id,
+        "bot.callback_data": callback_query.get("data") if callback_query else None,
+    }
@@ -1,6 +1,48 @@
+import json
 from abc import ABC, abstractmethod
 
 
+class PreEncodedJson:
+    """A JSON value encoded once and spliced into request bodies as is."""
+
+    __slots__ = ("encoded", "value")
+
+    def __init__(self, value: object) -> None:
+        self.value = value
+        self.encoded = json.dumps(
+            value, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PreEncodedJson):
+            return self.encoded == other.encoded
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.encoded)
+
+    def __repr__(self) -> str:
+        return f"PreEncodedJson({self.encoded.decode('utf-8')})"
+
+
+class MessengerError(Exception):
+    """The messenger API rejected a request (Telegram answered ok=false)."""
+
+    def __init__(
+        self,
+        method: str,
+        error_code: int | None,
+        description: str,
+        retry_after: float | None = None,
+    ) -> None:
+        super().__init__(f"{method} failed with {error_code}: {description}")
+        self.method = method
+        self.error_code = error_code
+        self.description = description
+        # Set on 429 Too Many Requests: seconds to wait before retrying.
+        self.retry_after = retry_after
+
+
 class Messenger(ABC):
     @abstractmethod
     def send_message(self, chat_id: int, text: str, **kwargs) -> dict: ...
@@ -13,3 +55,13 @@ class Messenger(ABC):
 
     @abstractmethod
     def delete_message(self, chat_id: int, message_id: int) -> dict: ...
+
+    @abstractmethod
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict: ...
+
+    @abstractmethod
+    def edit_message_reply_markup(
+        self, chat_id: int, message_id: int, **kwargs
+    ) -> dict: ...
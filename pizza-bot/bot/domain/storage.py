@@ -1,36 +1,96 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 from bot.domain.order_state import OrderState
 
 
 class Storage(ABC):
+    """Blocking storage contract used by the dispatcher and handlers.
+
+    AsyncDispatcher runs the whole blocking Dispatcher.dispatch, storage
+    calls included, on its thread pool. Code running on the event loop
+    itself awaits the same operations through
+    bot.infrastructure.storage_async.AsyncStorage.
+    """
+
     @abstractmethod
-    async def recreate_database(self) -> None:
-        pass
+    def recreate_database(self) -> None:
+        """Drop every table and build the schema again. Admin use only."""
+
+    @abstractmethod
+    def migrate(self) -> list[int]:
+        """Apply pending schema migrations and return their versions.
+
+        Cheap when the schema is current, so it can run on every start.
+        """
 
     @abstractmethod
-    async def ensure_user_exists(self, telegram_id: int) -> None:
+    def ensure_user_exists(self, telegram_id: int) -> None:
         pass
 
     @abstractmethod
-    async def clear_user_state_order(self, telegram_id: int) -> None:
+    def clear_user_state_order(self, telegram_id: int) -> None:
         pass
 
     @abstractmethod
-    async def update_user_state(self, telegram_id: int, state: OrderState) -> None:
+    def update_user_state(self, telegram_id: int, state: OrderState) -> None:
         pass
 
     @abstractmethod
-    async def persist_updates(self, updates: list) -> None:
+    def transition(
+        self,
+        telegram_id: int,
+        state: OrderState,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
+        """Set the state and update the order in a single write.
+
+        With reset the order is replaced by order_patch (cleared when None),
+        otherwise order_patch is merged into the stored order.
+        """
+
+    @abstractmethod
+    def persist_updates(self, updates: list) -> None:
         pass
 
     @abstractmethod
-    async def get_user(self, telegram_id: int | None) -> dict | None:
+    def iter_events(
+        self, after_id: int = 0, batch_size: int = 500
+    ) -> Iterator[tuple[int, dict]]:
+        """Stream (id, update) from the event log in id order, after_id excluded.
+
+        Rows are fetched batch_size at a time, so the log never has to fit
+        in memory.
+        """
+
+    @abstractmethod
+    def get_user(self, telegram_id: int | None) -> dict | None:
         pass
 
     @abstractmethod
-    async def update_user_order(self, telegram_id: int, order: dict) -> None:
+    def update_user_order(self, telegram_id: int, order: dict) -> None:
         pass
 
     @abstractmethod
-    async def get_user_order(self, telegram_id: int | None) -> dict | None:
+    def get_user_order(self, telegram_id: int | None) -> dict | None:
         pass
+
+    @abstractmethod
+    def load_update_offset(self) -> int:
+        """The getUpdates offset saved by save_update_offset, 0 if none."""
+
+    @abstractmethod
+    def save_update_offset(self, offset: int) -> None:
+        """Checkpoint the offset and forget processed update_ids below it.
+
+        Telegram never delivers updates below a confirmed offset again, so
+        their dedupe rows are no longer needed.
+        """
+
+    @abstractmethod
+    def claim_updates(self, update_ids: list[int]) -> set[int]:
+        """Record update_ids as processed; return those not recorded before."""
+
+    @abstractmethod
+    def processed_updates(self, update_ids: list[int]) -> set[int]:
+        """Those of update_ids already recorded by claim_updates."""
@@ -0,0 +1,123 @@
+"""Retention for the telegram_events log.
+
+python -m bot.admin archive-events --retention-days 30 --output-dir archive
+
+The log is split by the UTC day a row was received: daily partitions in
+Postgres, tables rolled over once a day in SQLite. Expired ones are streamed
+to <output-dir>/<partition>.ndjson.gz, one {"id", "received_at", "update"}
+object per line, and dropped only once the file is complete and synced, so
+removing old events never needs a DELETE or a vacuum.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+
+from bot.infrastructure.postgres_pool import CONNECTION_ERRORS
+
+
+def write_archive(events: Iterable[tuple[int, datetime, dict]], path: str) -> int:
+    """Write (id, received_at, update) rows to a gzipped NDJSON file."""
+    partial = f"{path}.partial"
+    count = 0
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(os.path.basename(path), "wb", fileobj=raw) as archive:
+            for event_id, received_at, update in events:
+                line = json.dumps(
+                    {
+                        "id": event_id,
+                        "received_at": received_at.isoformat(),
+                        "update": update,
+                    },
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+                archive.write(line.encode("utf-8") + b"\n")
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    # A crash mid-write leaves a .partial file and the partition in place.
+    os.replace(partial, path)
+    return count
+
+
+def archive_expired_events(
+    storage,
+    output_dir: str,
+    retention: timedelta,
+    now: datetime | None = None,
+    batch_size: int = 500,
+) -> list[tuple[str, int]]:
+    """Archive and drop partitions older than retention; returns (path, events)."""
+    cutoff = (now or datetime.now(UTC)) - retention
+    os.makedirs(output_dir, exist_ok=True)
+    archived = []
+    for name in storage.expired_event_partitions(cutoff):
+        path = os.path.join(output_dir, f"{name}.ndjson.gz")
+        count = write_archive(storage.iter_partition_events(name, batch_size), path)
+        storage.drop_event_partition(name)
+        archived.append((path, count))
+    return archived
+
+
+class EventMaintenance:
+    """Keeps the telegram_events partitions in shape from a background thread.
+
+    Every interval seconds it creates the coming days' partitions (or rolls
+    the SQLite table over) and, when retention is set, archives and drops
+    the expired ones. With several instances on one database, lock is an
+    advisory lock only one of them gets per round; the others skip it.
+    """
+
+    def __init__(
+        self,
+        storage,
+        output_dir: str,
+        retention: timedelta | None = None,
+        interval: float = 3600.0,
+        lock=None,
+    ) -> None:
+        self._storage = storage
+        self._output_dir = output_dir
+        self._retention = retention
+        self._interval = interval
+        self._lock = lock
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="event-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def run_once(self) -> list[tuple[str, int]]:
+        if self._lock is not None and not self._lock.try_acquire():
+            return []
+        try:
+            self._storage.rotate_events()
+            if self._retention is None:
+                return []
+            return archive_expired_events(
+                self._storage, self._output_dir, self._retention
+            )
+        finally:
+            if self._lock is not None:
+                self._lock.release()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                for path, count in self.run_once():
+                    print(f"\narchived {count} events to {path}")
+            except (*CONNECTION_ERRORS, sqlite3.Error) as error:
+                # The database or the archive directory is unavailable; the
+                # partitions stay in place and the next round tries again.
+                print(f"\nevent maintenance failed: {error!r}")
+            if self._stopped.wait(self._interval):
+                return
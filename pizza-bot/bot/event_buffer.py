@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import traceback
+from collections import deque
+
+from bot.domain.storage import Storage
+from bot.infrastructure.postgres_pool import CONNECTION_ERRORS
+
+
+class EventBuffer:
+    """In-memory ring buffer of raw updates written to Storage in batches.
+
+    append() never blocks on the database: a background thread drains the
+    buffer with one persist_updates() call per batch, either when batch_size
+    updates are waiting or every flush_interval seconds. When the buffer is
+    full the oldest updates are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        capacity: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._storage = storage
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._buffer: deque[dict] = deque(maxlen=capacity)
+        self._wakeup = threading.Condition()
+        self._closed = False
+
+        self._dropped = 0
+        self._flushed = 0
+        self._batches = 0
+        self._failures = 0
+
+        self._flusher = threading.Thread(
+            target=self._run, name="event-buffer-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def append(self, update: dict) -> None:
+        with self._wakeup:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append(update)
+            if len(self._buffer) >= self._batch_size:
+                self._wakeup.notify()
+
+    def close(self) -> None:
+        """Stop the flusher and write out everything still buffered."""
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        while self._flush_batch():
+            pass
+
+    def stats(self) -> dict:
+        with self._wakeup:
+            return {
+                "buffered": len(self._buffer),
+                "dropped": self._dropped,
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "failures": self._failures,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                if not self._closed and len(self._buffer) < self._batch_size:
+                    self._wakeup.wait(self._flush_interval)
+                if self._closed:
+                    return
+            while self._flush_batch() == self._batch_size:
+                pass
+
+    def _flush_batch(self) -> int:
+        with self._wakeup:
+            count = min(len(self._buffer), self._batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+        if not batch:
+            return 0
+
+        try:
+            self._storage.persist_updates(batch)
+        except (*CONNECTION_ERRORS, sqlite3.Error):
+            traceback.print_exc()
+            with self._wakeup:
+                self._failures += 1
+                # Put the batch back in front; on overflow the newest are lost.
+                overflow = len(self._buffer) + len(batch) - self._buffer.maxlen
+                self._dropped += max(overflow, 0)
+                self._buffer.extendleft(reversed(batch))
+            return 0
+
+        with self._wakeup:
+            self._flushed += len(batch)
+            self._batches += 1
+        return len(batch)
@@ -6,11 +6,12 @@ from bot.handlers.pizza_selection import PizzaSelectionHandler
 from bot.handlers.pizza_size import PizzaSizeHandler
 from bot.handlers.pizza_drinks import PizzaDrinksHandler
 from bot.handlers.order_approve import OrderApprovalHandler
+from bot.event_buffer import EventBuffer
 
 
-def get_handlers() -> list[Handler]:
+def get_handlers(event_buffer: EventBuffer | None = None) -> list[Handler]:
     return [
-        UpdateDatabaseLogger(),
+        UpdateDatabaseLogger(event_buffer),
         EnsureUserExists(),
         MessageStart(),
         PizzaSelectionHandler(),
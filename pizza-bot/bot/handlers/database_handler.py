@@ -1,10 +1,17 @@
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
-from bot.handlers.handler import Handler, HandlerStatus
+from bot.handlers.handler import Handler, HandlerStatus, Route
 from bot.domain.order_state import OrderState
+from bot.event_buffer import EventBuffer
 
 
 class UpdateDatabaseLogger(Handler):
+    routes = (Route(),)
+    needs_user = False
+
+    def __init__(self, event_buffer: EventBuffer | None = None) -> None:
+        self._event_buffer = event_buffer
+
     def can_handle(
         self,
         update: dict,
@@ -23,5 +30,8 @@ class UpdateDatabaseLogger(Handler):
         storage: Storage,
         messenger: Messenger,
     ) -> HandlerStatus:
-        storage.persist_updates(update)
+        if self._event_buffer is not None:
+            self._event_buffer.append(update)
+        else:
+            storage.persist_updates([update])
         return HandlerStatus.CONTINUE
@@ -1,10 +1,22 @@
+import threading
+from collections import OrderedDict
+
 from bot.domain.messenger import Messenger
-from bot.handlers.handler import Handler, HandlerStatus
+from bot.handlers.handler import Handler, HandlerStatus, Route
 from bot.domain.storage import Storage
 from bot.domain.order_state import OrderState
 
 
 class EnsureUserExists(Handler):
+    routes = (Route(kind="message"),)
+    needs_user = False
+
+    def __init__(self, known_users_capacity: int = 100000) -> None:
+        # Recently seen telegram_ids; these users are known to exist already.
+        self._known_users: OrderedDict[int, None] = OrderedDict()
+        self._known_users_capacity = known_users_capacity
+        self._lock = threading.Lock()
+
     def can_handle(
         self,
         update: dict,
@@ -25,6 +37,16 @@ class EnsureUserExists(Handler):
     ) -> HandlerStatus:
         telegram_id = update["message"]["from"]["id"]
 
+        with self._lock:
+            if telegram_id in self._known_users:
+                self._known_users.move_to_end(telegram_id)
+                return HandlerStatus.CONTINUE
+
         storage.ensure_user_exists(telegram_id)
 
+        with self._lock:
+            self._known_users[telegram_id] = None
+            if len(self._known_users) > self._known_users_capacity:
+                self._known_users.popitem(last=False)
+
         return HandlerStatus.CONTINUE
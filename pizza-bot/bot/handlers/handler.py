@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from enum import Enum
 
 from bot.domain.messenger import Messenger
@@ -11,7 +12,27 @@ class HandlerStatus(Enum):
     STOP = 2
 
 
+@dataclass(frozen=True)
+class Route:
+    """Routing key a handler declares so the Dispatcher can index it.
+
+    None means "any". A route only narrows down which handlers are asked;
+    can_handle still has the final word.
+    """
+
+    kind: str | None = None
+    state: OrderState | None = None
+    callback_prefix: str | None = None
+    command: str | None = None
+
+
 class Handler(ABC):
+    # Handlers without routes are asked about every update.
+    routes: tuple[Route, ...] = ()
+    # Handlers that never look at state/order_json get None and {} instead,
+    # so the Dispatcher can skip reading the user from Storage.
+    needs_user: bool = True
+
     @abstractmethod
     def can_handle(
         self,
@@ -0,0 +1,25 @@
+from bot.domain.messenger import Messenger, MessengerError
+
+
+def replace_message(
+    messenger: Messenger, chat_id: int, message_id: int, text: str, **kwargs
+) -> None:
+    """Show the next step in place of the message whose button was clicked.
+
+    Editing costs one API call instead of delete+send. When Telegram refuses
+    the edit (message too old or gone, content not modified) the old message
+    is deleted if possible and the step is sent as a new message.
+    """
+    try:
+        messenger.edit_message_text(
+            chat_id=chat_id, message_id=message_id, text=text, **kwargs
+        )
+        return
+    except MessengerError:
+        pass
+
+    try:
+        messenger.delete_message(chat_id=chat_id, message_id=message_id)
+    except MessengerError:
+        pass
+    messenger.send_message(chat_id=chat_id, text=text, **kwargs)
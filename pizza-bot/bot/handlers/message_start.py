@@ -1,13 +1,14 @@
-import json
-
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
-from bot.handlers.handler import Handler, HandlerStatus
-from bot.keyboards.order_keyboards import pizza_keyboard
+from bot.handlers.handler import Handler, HandlerStatus, Route
+from bot.keyboards.order_keyboards import pizza_keyboard, remove_keyboard
 from bot.domain.order_state import OrderState
 
 
 class MessageStart(Handler):
+    routes = (Route(kind="message", command="/start"),)
+    needs_user = False
+
     def can_handle(
         self,
         update: dict,
@@ -32,13 +33,12 @@ class MessageStart(Handler):
     ) -> HandlerStatus:
         telegram_id = update["message"]["from"]["id"]
 
-        storage.clear_user_state_order(telegram_id)
-        storage.update_user_state(telegram_id, OrderState.WAIT_FOR_PIZZA_NAME)
+        storage.transition(telegram_id, OrderState.WAIT_FOR_PIZZA_NAME, reset=True)
 
         messenger.send_message(
             chat_id=update["message"]["chat"]["id"],
             text="🍕 Welcome to Pizza shop!😋",
-            reply_markup=json.dumps({"remove_keyboard": True}),
+            reply_markup=remove_keyboard(),
         )
 
         messenger.send_message(
@@ -1,11 +1,25 @@
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
-from bot.handlers.handler import Handler, HandlerStatus
+from bot.handlers.handler import Handler, HandlerStatus, Route
+from bot.handlers.message_edit import replace_message
 from bot.keyboards.order_keyboards import pizza_keyboard
 from bot.domain.order_state import OrderState
 
 
 class OrderApprovalHandler(Handler):
+    routes = (
+        Route(
+            kind="callback_query",
+            state=OrderState.WAIT_FOR_ORDER_APPROVE,
+            callback_prefix="order_approve",
+        ),
+        Route(
+            kind="callback_query",
+            state=OrderState.WAIT_FOR_ORDER_APPROVE,
+            callback_prefix="order_restart",
+        ),
+    )
+
     def can_handle(
         self,
         update: dict,
@@ -34,14 +48,8 @@ class OrderApprovalHandler(Handler):
         telegram_id = update["callback_query"]["from"]["id"]
         callback_data = update["callback_query"]["data"]
 
-        messenger.answer_callback_query(update["callback_query"]["id"])
-        messenger.delete_message(
-            chat_id=update["callback_query"]["message"]["chat"]["id"],
-            message_id=update["callback_query"]["message"]["message_id"],
-        )
-
         if callback_data == "order_approve":
-            storage.update_user_state(telegram_id, OrderState.ORDER_FINISHED)
+            storage.transition(telegram_id, OrderState.ORDER_FINISHED)
 
             pizza_name = order_json.get("pizza_name", "Unknown")
             pizza_size = order_json.get("pizza_size", "Unknown")
@@ -57,19 +65,21 @@ Thank you for your order! Your pizza will be ready soon.
 
 Send /start to place another order."""
 
-            messenger.send_message(
+            replace_message(
+                messenger,
                 chat_id=update["callback_query"]["message"]["chat"]["id"],
+                message_id=update["callback_query"]["message"]["message_id"],
                 text=order_confirmation,
                 parse_mode="Markdown",
             )
 
         elif callback_data == "order_restart":
-            storage.clear_user_state_order(telegram_id)
-
-            storage.update_user_state(telegram_id, OrderState.WAIT_FOR_PIZZA_NAME)
+            storage.transition(telegram_id, OrderState.WAIT_FOR_PIZZA_NAME, reset=True)
 
-            messenger.send_message(
+            replace_message(
+                messenger,
                 chat_id=update["callback_query"]["message"]["chat"]["id"],
+                message_id=update["callback_query"]["message"]["message_id"],
                 text="Please choose pizza type",
                 reply_markup=pizza_keyboard(),
             )
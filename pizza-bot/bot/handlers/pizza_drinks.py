@@ -1,11 +1,20 @@
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
-from bot.handlers.handler import Handler, HandlerStatus
+from bot.handlers.handler import Handler, HandlerStatus, Route
+from bot.handlers.message_edit import replace_message
 from bot.keyboards.order_keyboards import check_order_keyboard
 from bot.domain.order_state import OrderState
 
 
 class PizzaDrinksHandler(Handler):
+    routes = (
+        Route(
+            kind="callback_query",
+            state=OrderState.WAIT_FOR_DRINKS,
+            callback_prefix="drink_",
+        ),
+    )
+
     def can_handle(
         self,
         update: dict,
@@ -47,13 +56,8 @@ class PizzaDrinksHandler(Handler):
 
         order_json["drink"] = selected_drink
 
-        storage.update_user_order(telegram_id, order_json)
-        storage.update_user_state(telegram_id, OrderState.WAIT_FOR_ORDER_APPROVE)
-        messenger.answer_callback_query(update["callback_query"]["id"])
-
-        messenger.delete_message(
-            chat_id=update["callback_query"]["message"]["chat"]["id"],
-            message_id=update["callback_query"]["message"]["message_id"],
+        storage.transition(
+            telegram_id, OrderState.WAIT_FOR_ORDER_APPROVE, {"drink": selected_drink}
         )
 
         pizza_name = order_json.get("pizza_name", "Unknown")
@@ -68,8 +72,10 @@ class PizzaDrinksHandler(Handler):
 
 Is everything correct?"""
 
-        messenger.send_message(
+        replace_message(
+            messenger,
             chat_id=update["callback_query"]["message"]["chat"]["id"],
+            message_id=update["callback_query"]["message"]["message_id"],
             text=order_summary,
             parse_mode="Markdown",
             reply_markup=check_order_keyboard(),
@@ -1,11 +1,20 @@
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
-from bot.handlers.handler import Handler, HandlerStatus
+from bot.handlers.handler import Handler, HandlerStatus, Route
+from bot.handlers.message_edit import replace_message
 from bot.keyboards.order_keyboards import size_keyboard
 from bot.domain.order_state import OrderState
 
 
 class PizzaSelectionHandler(Handler):
+    routes = (
+        Route(
+            kind="callback_query",
+            state=OrderState.WAIT_FOR_PIZZA_NAME,
+            callback_prefix="pizza_",
+        ),
+    )
+
     def can_handle(
         self,
         update: dict,
@@ -36,15 +45,16 @@ class PizzaSelectionHandler(Handler):
         chat_id = update["callback_query"]["message"]["chat"]["id"]
 
         pizza_name = callback_data.replace("pizza_", "").replace("_", " ").title()
-        storage.update_user_order(telegram_id, {"pizza_name": pizza_name})
-        storage.update_user_state(telegram_id, OrderState.WAIT_FOR_PIZZA_SIZE)
-        messenger.answer_callback_query(update["callback_query"]["id"])
-        messenger.delete_message(
-            chat_id=chat_id,
-            message_id=update["callback_query"]["message"]["message_id"],
+        storage.transition(
+            telegram_id,
+            OrderState.WAIT_FOR_PIZZA_SIZE,
+            {"pizza_name": pizza_name},
+            reset=True,
         )
-        messenger.send_message(
+        replace_message(
+            messenger,
             chat_id=chat_id,
+            message_id=update["callback_query"]["message"]["message_id"],
             text="📐Please, select pizza size:",
             reply_markup=size_keyboard(),
         )
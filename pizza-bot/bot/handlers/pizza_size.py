@@ -1,11 +1,20 @@
 from bot.domain.messenger import Messenger
 from bot.domain.storage import Storage
-from bot.handlers.handler import Handler, HandlerStatus
+from bot.handlers.handler import Handler, HandlerStatus, Route
+from bot.handlers.message_edit import replace_message
 from bot.keyboards.order_keyboards import drinks_keyboard
 from bot.domain.order_state import OrderState
 
 
 class PizzaSizeHandler(Handler):
+    routes = (
+        Route(
+            kind="callback_query",
+            state=OrderState.WAIT_FOR_PIZZA_SIZE,
+            callback_prefix="size_",
+        ),
+    )
+
     def can_handle(
         self,
         update: dict,
@@ -43,18 +52,14 @@ class PizzaSizeHandler(Handler):
 
         pizza_size = size_mapping.get(callback_data)
         order_json["pizza_size"] = pizza_size
-        storage.update_user_order(telegram_id, order_json)
-        storage.update_user_state(telegram_id, OrderState.WAIT_FOR_DRINKS)
-
-        messenger.answer_callback_query(update["callback_query"]["id"])
-
-        messenger.delete_message(
-            chat_id=update["callback_query"]["message"]["chat"]["id"],
-            message_id=update["callback_query"]["message"]["message_id"],
+        storage.transition(
+            telegram_id, OrderState.WAIT_FOR_DRINKS, {"pizza_size": pizza_size}
         )
 
-        messenger.send_message(
+        replace_message(
+            messenger,
             chat_id=update["callback_query"]["message"]["chat"]["id"],
+            message_id=update["callback_query"]["message"]["message_id"],
             text="Please choose some drinks",
             reply_markup=drinks_keyboard(),
         )
@@ -0,0 +1,148 @@
+import http.client
+import select
+import socket
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+# Errors that mean a pooled connection was closed by the server while idle.
+# If one is raised while the request is still being written, the server never
+# got it and it is resent once. Once the request has been sent the server may
+# have acted on it, so only idempotent requests are resent.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+
+class HttpTransport:
+    """HTTP/1.1 keep-alive client that reuses connections per host."""
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_idle_per_host: int = 4,
+    ) -> None:
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._max_idle_per_host = max_idle_per_host
+        self._idle: dict[tuple[str, str, int], deque] = {}
+        self._lock = threading.Lock()
+        self._connections_opened = 0
+
+    @property
+    def read_timeout(self) -> float:
+        return self._read_timeout
+
+    @property
+    def connections_opened(self) -> int:
+        return self._connections_opened
+
+    def post(
+        self,
+        url: str,
+        body: bytes,
+        headers: dict[str, str] | None = None,
+        read_timeout: float | None = None,
+        idempotent: bool = False,
+    ) -> tuple[int, bytes]:
+        parts = urlsplit(url)
+        key = (
+            parts.scheme,
+            parts.hostname or "",
+            parts.port or (443 if parts.scheme == "https" else 80),
+        )
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        request_headers = {"Content-Type": "application/json"}
+        if headers:
+            request_headers.update(headers)
+
+        timeout = self._read_timeout if read_timeout is None else read_timeout
+
+        connection, reused = self._checkout(key)
+        while True:
+            sent = False
+            try:
+                connection.sock.settimeout(timeout)
+                connection.request("POST", path, body=body, headers=request_headers)
+                sent = True
+                return self._receive(connection, key)
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused or (sent and not idempotent):
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+            connection, reused = self._open(key), False
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [c for connections in self._idle.values() for c in connections]
+            self._idle.clear()
+        for connection in idle:
+            connection.close()
+
+    def _receive(
+        self, connection: http.client.HTTPConnection, key: tuple[str, str, int]
+    ) -> tuple[int, bytes]:
+        response = connection.getresponse()
+        data = response.read()
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+        return response.status, data
+
+    def _checkout(
+        self, key: tuple[str, str, int]
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        while True:
+            with self._lock:
+                connections = self._idle.get(key)
+                if not connections:
+                    break
+                connection = connections.pop()
+            if not _is_dropped(connection):
+                return connection, True
+            connection.close()
+        return self._open(key), False
+
+    def _checkin(
+        self, key: tuple[str, str, int], connection: http.client.HTTPConnection
+    ) -> None:
+        with self._lock:
+            connections = self._idle.setdefault(key, deque())
+            if len(connections) < self._max_idle_per_host:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def _open(self, key: tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(
+                host, port, timeout=self._connect_timeout
+            )
+        else:
+            connection = http.client.HTTPConnection(
+                host, port, timeout=self._connect_timeout
+            )
+        connection.connect()
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self._connections_opened += 1
+        return connection
+
+
+def _is_dropped(connection: http.client.HTTPConnection) -> bool:
+    # An idle keep-alive socket has nothing to read unless the server closed it.
+    readable, _, _ = select.select([connection.sock], [], [], 0)
+    return bool(readable)
@@ -0,0 +1,42 @@
+import json
+from json.encoder import encode_basestring
+
+from bot.domain.messenger import PreEncodedJson
+
+
+def dumps_compact(value: object) -> str:
+    """Serialize without indentation or spaces after separators."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_request_body(fields: dict) -> bytes:
+    """Encode API call parameters as a JSON object.
+
+    PreEncodedJson values (cached keyboards) are copied into the body
+    byte for byte instead of being serialized again.
+    """
+    plain = {}
+    spliced = []
+    for key, value in fields.items():
+        if isinstance(value, PreEncodedJson):
+            spliced.append(
+                encode_basestring(key).encode("utf-8") + b":" + value.encoded
+            )
+        else:
+            plain[key] = value
+    body = dumps_compact(plain).encode("utf-8")
+    if not spliced:
+        return body
+    if plain:
+        spliced.insert(0, body[1:-1])
+    return b"{" + b",".join(spliced) + b"}"
+
+
+def decode_order(value: object) -> dict | None:
+    """Decode order_json read from either a JSONB or a legacy TEXT column."""
+    if value is None or isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return None
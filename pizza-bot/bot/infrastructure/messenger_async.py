@@ -0,0 +1,33 @@
+import asyncio
+import functools
+from concurrent.futures import Executor
+
+from bot.domain.messenger import Messenger
+
+
+class AsyncMessenger:
+    """Awaitable view of a blocking Messenger.
+
+    Each Messenger method is exposed as a coroutine that runs the HTTP call on
+    an executor thread, so a 30 second getUpdates long poll does not block the
+    event loop.
+    """
+
+    def __init__(self, messenger: Messenger, executor: Executor | None = None) -> None:
+        self._messenger = messenger
+        self._executor = executor
+
+    @property
+    def sync(self) -> Messenger:
+        return self._messenger
+
+    def __getattr__(self, name: str):
+        method = getattr(self._messenger, name)
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(method, *args, **kwargs)
+            )
+
+        return call
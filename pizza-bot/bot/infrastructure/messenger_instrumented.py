@@ -0,0 +1,55 @@
+import time
+
+from bot.domain.messenger import Messenger, MessengerError
+from bot.metrics import Metrics
+from bot.tracing import Tracer, start_span
+
+_TIMED_METHODS = Messenger.__abstractmethods__
+
+
+class InstrumentedMessenger:
+    """Messenger proxy recording Bot API call latency by method and status.
+
+    Status is "ok", the error_code of a MessengerError, or "error" when the
+    request failed before Telegram answered. Calls are observed in
+    Metrics.telegram_seconds and traced as telegram.<method> spans. Wrap the
+    transport below RateLimitedMessenger so queueing time is not counted.
+    """
+
+    def __init__(
+        self,
+        messenger: Messenger,
+        metrics: Metrics | None = None,
+        tracer: Tracer | None = None,
+    ) -> None:
+        self._messenger = messenger
+        self._metrics = metrics
+        self._tracer = tracer
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._messenger, name)
+        if name not in _TIMED_METHODS:
+            return attribute
+        histogram = self._metrics.telegram_seconds if self._metrics else None
+        tracer = self._tracer
+        span_name = f"telegram.{name}"
+
+        def call(*args, **kwargs):
+            status = "error"
+            started = time.perf_counter()
+            with start_span(tracer, span_name) as span:
+                try:
+                    result = attribute(*args, **kwargs)
+                    status = "ok"
+                    return result
+                except MessengerError as error:
+                    status = str(error.error_code)
+                    raise
+                finally:
+                    if histogram is not None:
+                        histogram.observe(time.perf_counter() - started, name, status)
+                    if span is not None:
+                        span.set_attribute("telegram.status", status)
+
+        setattr(self, name, call)
+        return call
@@ -0,0 +1,71 @@
+import contextvars
+from concurrent.futures import Executor, Future
+
+from bot.domain.messenger import Messenger, MessengerError
+
+
+class PipelinedMessenger(Messenger):
+    """Per-update view of a Messenger that does not wait for side effects.
+
+    answer_callback_query and delete_message return an empty result right away
+    and run in the background, on the wrapped messenger's own submit() queue
+    when it has one and on the executor otherwise. Everything else stays
+    blocking because handlers may use the result. wait() blocks until the
+    background calls are done and returns their errors, so they are reported,
+    not lost. Like replace_message, it passes over Telegram refusing one of
+    them (message already gone, query too old): the step goes on either way.
+    """
+
+    def __init__(self, messenger: Messenger, executor: Executor) -> None:
+        self._messenger = messenger
+        self._executor = executor
+        self._futures: list[Future] = []
+
+    def __getattr__(self, name: str):
+        return getattr(self._messenger, name)
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+        return self._messenger.send_message(chat_id, text, **kwargs)
+
+    def get_updates(self, **kwargs) -> dict:
+        return self._messenger.get_updates(**kwargs)
+
+    def answer_callback_query(self, callback_query_id: str, **kwargs) -> dict:
+        self._background("answer_callback_query", callback_query_id, **kwargs)
+        return {}
+
+    def delete_message(self, chat_id: int, message_id: int) -> dict:
+        self._background("delete_message", chat_id, message_id)
+        return {}
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict:
+        return self._messenger.edit_message_text(chat_id, message_id, text, **kwargs)
+
+    def edit_message_reply_markup(
+        self, chat_id: int, message_id: int, **kwargs
+    ) -> dict:
+        return self._messenger.edit_message_reply_markup(chat_id, message_id, **kwargs)
+
+    def wait(self) -> list[BaseException]:
+        errors = [future.exception() for future in self._futures]
+        self._futures.clear()
+        return [
+            error
+            for error in errors
+            if error is not None and not isinstance(error, MessengerError)
+        ]
+
+    def _background(self, method: str, *args, **kwargs) -> None:
+        submit = getattr(self._messenger, "submit", None)
+        if submit is not None:
+            future = submit(method, *args, **kwargs)
+        else:
+            future = self._executor.submit(
+                contextvars.copy_context().run,
+                getattr(self._messenger, method),
+                *args,
+                **kwargs,
+            )
+        self._futures.append(future)
@@ -0,0 +1,361 @@
+import contextvars
+import functools
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from bot.domain.messenger import Messenger, MessengerError
+
+# Lower value goes first.
+PRIORITY_CALLBACK = 0
+PRIORITY_MESSAGE = 1
+
+# method -> (priority, ordered per chat, takes a chat token)
+# Deleting the previous keyboard does not have to wait for, or hold up, the
+# next message of the chat.
+_METHODS = {
+    "answer_callback_query": (PRIORITY_CALLBACK, False, False),
+    "delete_message": (PRIORITY_MESSAGE, False, False),
+    "send_message": (PRIORITY_MESSAGE, True, True),
+    "edit_message_text": (PRIORITY_MESSAGE, True, True),
+    "edit_message_reply_markup": (PRIORITY_MESSAGE, True, True),
+}
+
+
+class TokenBucket:
+    """rate tokens per second, at most burst of them saved up."""
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated = now
+        self._paused_until = 0.0
+
+    def delay(self, now: float, tokens: float = 1) -> float:
+        """Seconds until `tokens` can be taken; 0 means right away."""
+        self._refill(now)
+        missing = max(tokens - self._tokens, 0) / self._rate
+        return max(missing, self._paused_until - now, 0.0)
+
+    def take(self, now: float, tokens: float = 1) -> None:
+        self._refill(now)
+        self._tokens -= tokens
+
+    def pause(self, until: float) -> None:
+        self._paused_until = max(self._paused_until, until)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self._burst and self._paused_until <= now
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - self._updated, 0.0)
+        self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+        self._updated = now
+
+
+class _Job:
+    __slots__ = (
+        "attempts",
+        "call",
+        "chat_id",
+        "enqueued_at",
+        "future",
+        "limited",
+        "priority",
+        "seq",
+    )
+
+    def __init__(self, priority, seq, chat_id, limited, call, enqueued_at) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        # Only limited jobs spend a chat token; the rest just keep chat order.
+        self.limited = limited
+        self.call = call
+        self.future: Future = Future()
+        self.enqueued_at = enqueued_at
+        self.attempts = 0
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Chat:
+    __slots__ = ("bucket", "busy", "queue", "scheduled")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.queue: deque[_Job] = deque()
+        self.bucket = bucket
+        # A request of this chat is on the wire; keeps delete/send in order.
+        self.busy = False
+        # The head job sits in the ready or waiting heap.
+        self.scheduled = False
+
+
+class RateLimitedMessenger(Messenger):
+    """Schedules outgoing calls under Telegram's global and per-chat limits.
+
+    Calls still block the caller until Telegram answers, but they are queued
+    and released by one scheduler thread: every call takes a token from the
+    global bucket, send_message also takes one from its chat's bucket.
+    Callback answers have priority over messages, calls of one chat keep
+    their order, and a 429 pauses the global bucket, and the chat's, for
+    retry_after seconds and puts the call back at the head of the queue.
+    """
+
+    def __init__(
+        self,
+        messenger: Messenger,
+        global_rate: float = 28.0,
+        global_burst: float = 5.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        senders: int = 8,
+        max_retries: int = 3,
+        clock=time.monotonic,
+    ) -> None:
+        self._messenger = messenger
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._clock = clock
+        self._global = TokenBucket(global_rate, global_burst, clock())
+        self._chats: dict[int, _Chat] = {}
+        # (priority, seq) heap of jobs that may be sent as soon as the
+        # global bucket allows, and (ready_at, seq, chat_id) heap of chats
+        # waiting for their bucket.
+        self._ready: list[_Job] = []
+        self._waiting: list[tuple[float, int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._queued = 0
+        self._in_flight = 0
+        self._last_prune = clock()
+
+        self._max_queued = 0
+        self._sent = 0
+        self._throttled = 0
+        self._failed = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        self._senders = ThreadPoolExecutor(
+            max_workers=senders, thread_name_prefix="telegram-sender"
+        )
+        self._scheduler = threading.Thread(
+            target=self._run, name="telegram-scheduler", daemon=True
+        )
+        self._scheduler.start()
+
+    def __getattr__(self, name: str):
+        return getattr(self._messenger, name)
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+        return self.submit("send_message", chat_id, text, **kwargs).result()
+
+    def get_updates(self, **kwargs) -> dict:
+        # Polling is not a send and must never wait behind the send queue.
+        return self._messenger.get_updates(**kwargs)
+
+    def answer_callback_query(self, callback_query_id: str, **kwargs) -> dict:
+        return self.submit(
+            "answer_callback_query", callback_query_id, **kwargs
+        ).result()
+
+    def delete_message(self, chat_id: int, message_id: int) -> dict:
+        return self.submit("delete_message", chat_id, message_id).result()
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict:
+        return self.submit(
+            "edit_message_text", chat_id, message_id, text, **kwargs
+        ).result()
+
+    def edit_message_reply_markup(
+        self, chat_id: int, message_id: int, **kwargs
+    ) -> dict:
+        return self.submit(
+            "edit_message_reply_markup", chat_id, message_id, **kwargs
+        ).result()
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """Queue a Messenger call without waiting for it."""
+        priority, per_chat, limited = _METHODS[method]
+        chat_id = kwargs.get("chat_id", args[0] if args else None) if per_chat else None
+        # Sender threads run the call in the caller's context, so tracing spans
+        # opened there still nest under the caller's update.
+        call = functools.partial(
+            contextvars.copy_context().run,
+            getattr(self._messenger, method),
+            *args,
+            **kwargs,
+        )
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("messenger is closed")
+            now = self._clock()
+            job = _Job(priority, next(self._seq), chat_id, limited, call, now)
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+            self._enqueue(job, now)
+            self._cond.notify_all()
+        return job.future
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": self._queued,
+                "in_flight": self._in_flight,
+                "max_queued": self._max_queued,
+                "sent": self._sent,
+                "throttled": self._throttled,
+                "failed": self._failed,
+                "avg_wait": self._wait_total / self._waits if self._waits else 0.0,
+                "max_wait": self._wait_max,
+            }
+
+    def close(self) -> None:
+        """Send what is queued, then stop the scheduler and sender threads."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._scheduler.join()
+        self._senders.shutdown(wait=True)
+
+    def _enqueue(self, job: _Job, now: float, first: bool = False) -> None:
+        if job.chat_id is None:
+            heapq.heappush(self._ready, job)
+            return
+        chat = self._chats.get(job.chat_id)
+        if chat is None:
+            chat = self._chats[job.chat_id] = _Chat(
+                TokenBucket(self._chat_rate, self._chat_burst, now)
+            )
+        if first:
+            chat.queue.appendleft(job)
+        else:
+            chat.queue.append(job)
+        self._schedule_chat(job.chat_id, chat, now)
+
+    def _schedule_chat(self, chat_id: int, chat: _Chat, now: float) -> None:
+        if chat.busy or chat.scheduled or not chat.queue:
+            return
+        head = chat.queue[0]
+        delay = chat.bucket.delay(now, 1 if head.limited else 0)
+        if delay <= 0:
+            heapq.heappush(self._ready, head)
+        else:
+            heapq.heappush(self._waiting, (now + delay, head.seq, chat_id))
+        chat.scheduled = True
+
+    def _run(self) -> None:
+        with self._cond:
+            while True:
+                now = self._clock()
+                while self._waiting and self._waiting[0][0] <= now:
+                    _, _, chat_id = heapq.heappop(self._waiting)
+                    chat = self._chats[chat_id]
+                    chat.scheduled = False
+                    self._schedule_chat(chat_id, chat, now)
+
+                if self._closed and not self._queued and not self._in_flight:
+                    return
+
+                delay = self._global.delay(now)
+                if self._ready and delay <= 0:
+                    self._start(heapq.heappop(self._ready), now)
+                    continue
+
+                if now - self._last_prune > 60:
+                    self._prune(now)
+
+                timeout = None
+                if self._ready:
+                    timeout = delay
+                if self._waiting:
+                    waiting = self._waiting[0][0] - now
+                    timeout = waiting if timeout is None else min(timeout, waiting)
+                self._cond.wait(timeout)
+
+    def _start(self, job: _Job, now: float) -> None:
+        self._global.take(now)
+        if job.chat_id is not None:
+            chat = self._chats[job.chat_id]
+            chat.queue.popleft()
+            chat.scheduled = False
+            chat.busy = True
+            if job.limited:
+                chat.bucket.take(now)
+        self._queued -= 1
+        self._in_flight += 1
+        if job.attempts == 0:
+            waited = now - job.enqueued_at
+            self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        job.attempts += 1
+        sending = self._senders.submit(job.call)
+        sending.add_done_callback(functools.partial(self._on_sent, job))
+
+    def _on_sent(self, job: _Job, sending: Future) -> None:
+        # The sender pool's future holds whatever the call raised.
+        error = sending.exception()
+        if error is None:
+            self._finish(job, result=sending.result())
+        elif (
+            isinstance(error, MessengerError)
+            and error.retry_after is not None
+            and job.attempts <= self._max_retries
+        ):
+            self._retry(job, error.retry_after)
+        else:
+            self._finish(job, error=error)
+
+    def _retry(self, job: _Job, retry_after: float) -> None:
+        with self._cond:
+            now = self._clock()
+            self._throttled += 1
+            # Telegram's flood limit is per bot, so every chat waits it out.
+            self._global.pause(now + retry_after)
+            if job.chat_id is not None:
+                self._chats[job.chat_id].bucket.pause(now + retry_after)
+            self._in_flight -= 1
+            self._queued += 1
+            if job.chat_id is not None:
+                self._chats[job.chat_id].busy = False
+            self._enqueue(job, now, first=True)
+            self._cond.notify_all()
+
+    def _finish(self, job: _Job, result=None, error=None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if error is None:
+                self._sent += 1
+            else:
+                self._failed += 1
+            if job.chat_id is not None:
+                chat = self._chats[job.chat_id]
+                chat.busy = False
+                self._schedule_chat(job.chat_id, chat, self._clock())
+            self._cond.notify_all()
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+
+    def _prune(self, now: float) -> None:
+        self._last_prune = now
+        for chat_id in [
+            chat_id
+            for chat_id, chat in self._chats.items()
+            if not chat.queue and not chat.busy and chat.bucket.is_full(now)
+        ]:
+            del self._chats[chat_id]
@@ -0,0 +1,68 @@
+import itertools
+import threading
+from collections import Counter, deque
+
+from bot.domain.messenger import Messenger
+
+
+class MessengerRecording(Messenger):
+    """Messenger that answers locally and records what would have been sent.
+
+    Used by benchmarks and replays. Only the last max_calls calls are kept,
+    counts covers every call.
+    """
+
+    def __init__(self, max_calls: int | None = 1000) -> None:
+        self.calls: deque[tuple[str, dict]] = deque(maxlen=max_calls)
+        self.counts: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _record(self, method: str, **params) -> None:
+        with self._lock:
+            self.calls.append((method, params))
+            self.counts[method] += 1
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+        self._record("send_message", chat_id=chat_id, text=text, **kwargs)
+        return {
+            "message_id": next(self._message_ids),
+            "chat": {"id": chat_id},
+            "text": text,
+        }
+
+    def get_updates(self, **kwargs) -> dict:
+        return []
+
+    def answer_callback_query(self, callback_query_id: str, **kwargs) -> dict:
+        self._record(
+            "answer_callback_query", callback_query_id=callback_query_id, **kwargs
+        )
+        return True
+
+    def delete_message(self, chat_id: int, message_id: int) -> dict:
+        self._record("delete_message", chat_id=chat_id, message_id=message_id)
+        return True
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict:
+        self._record(
+            "edit_message_text",
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            **kwargs,
+        )
+        return {"message_id": message_id, "chat": {"id": chat_id}, "text": text}
+
+    def edit_message_reply_markup(
+        self, chat_id: int, message_id: int, **kwargs
+    ) -> dict:
+        self._record(
+            "edit_message_reply_markup",
+            chat_id=chat_id,
+            message_id=message_id,
+            **kwargs,
+        )
+        return {"message_id": message_id, "chat": {"id": chat_id}}
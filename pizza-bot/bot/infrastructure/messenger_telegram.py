@@ -1,45 +1,72 @@
 import json
 import os
-import urllib.request
 
 from dotenv import load_dotenv
 
-from bot.domain.messenger import Messenger
+from bot.domain.messenger import Messenger, MessengerError
+from bot.infrastructure.http_transport import HttpTransport
+from bot.infrastructure.json_codec import encode_request_body
 
 load_dotenv()
 
 
 class MessengerTelegram(Messenger):
+    def __init__(
+        self,
+        base_uri: str | None = None,
+        transport: HttpTransport | None = None,
+    ) -> None:
+        self._base_uri = (
+            base_uri or os.getenv("TELEGRAM_BASE_URI") or "https://api.telegram.org"
+        ).rstrip("/")
+        self._transport = transport or HttpTransport(
+            connect_timeout=float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("TELEGRAM_READ_TIMEOUT", "10")),
+        )
 
     def _get_telegram_base_uri(self) -> str:
-        return f"https://api.telegram.org/bot{os.getenv('TELEGRAM_TOKEN')}"
+        return f"{self._base_uri}/bot{os.getenv('TELEGRAM_TOKEN')}"
 
     def _get_telegram_file_uri(self) -> str:
-        return f"https://api.telegram.org/file/bot{os.getenv('TELEGRAM_TOKEN')}"
-
-    def _make_request(self, method: str, **kwargs) -> dict:
-        json_data = json.dumps(kwargs).encode("utf-8")
-
-        request = urllib.request.Request(
-            method="POST",
-            url=f"{self._get_telegram_base_uri()}/{method}",
-            data=json_data,
-            headers={
-                "Content-Type": "application/json",
-            },
+        return f"{self._base_uri}/file/bot{os.getenv('TELEGRAM_TOKEN')}"
+
+    def _make_request(
+        self,
+        method: str,
+        read_timeout: float | None = None,
+        idempotent: bool = False,
+        **kwargs,
+    ) -> dict:
+        json_data = encode_request_body(kwargs)
+
+        _, response_body = self._transport.post(
+            f"{self._get_telegram_base_uri()}/{method}",
+            json_data,
+            read_timeout=read_timeout,
+            idempotent=idempotent,
         )
 
-        with urllib.request.urlopen(request) as response:
-            response_body = response.read().decode("utf-8")
-            response_json = json.loads(response_body)
-            assert response_json["ok"]
-            return response_json["result"]
+        response_json = json.loads(response_body.decode("utf-8"))
+        if not response_json["ok"]:
+            parameters = response_json.get("parameters") or {}
+            raise MessengerError(
+                method,
+                response_json.get("error_code"),
+                response_json.get("description", ""),
+                retry_after=parameters.get("retry_after"),
+            )
+        return response_json["result"]
 
     def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
         return self._make_request("sendMessage", chat_id=chat_id, text=text, **kwargs)
 
     def get_updates(self, **kwargs) -> dict:
-        return self._make_request("getUpdates", **kwargs)
+        # Long polling keeps the request open for up to `timeout` seconds.
+        read_timeout = kwargs.get("timeout", 0) + self._transport.read_timeout
+        # Asking again with the same offset returns the same updates.
+        return self._make_request(
+            "getUpdates", read_timeout=read_timeout, idempotent=True, **kwargs
+        )
 
     def answer_callback_query(self, callback_query_id: str, **kwargs) -> dict:
         return self._make_request(
@@ -54,3 +81,24 @@ class MessengerTelegram(Messenger):
             chat_id=chat_id,
             message_id=message_id,
         )
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict:
+        return self._make_request(
+            "editMessageText",
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            **kwargs,
+        )
+
+    def edit_message_reply_markup(
+        self, chat_id: int, message_id: int, **kwargs
+    ) -> dict:
+        return self._make_request(
+            "editMessageReplyMarkup",
+            chat_id=chat_id,
+            message_id=message_id,
+            **kwargs,
+        )
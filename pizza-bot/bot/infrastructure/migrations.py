@@ -0,0 +1,305 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+# telegram_events is split by the UTC day a row was received: daily
+# partitions in Postgres, tables rolled over once a day in SQLite.
+EVENT_PARTITIONS_AHEAD = 7
+SQLITE_EVENTS_TABLE = """
+    CREATE TABLE telegram_events
+    (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payload TEXT NOT NULL,
+        received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One forward schema step; apply gets a DB-API cursor (or sqlite3 connection).
+
+    Steps must be safe to run against a database that already has the
+    change, because databases created before schema_migrations existed are
+    migrated from version 0.
+    """
+
+    version: int
+    name: str
+    apply: Callable[[object], None]
+
+
+def sql(*statements: str) -> Callable[[object], None]:
+    def apply(cursor) -> None:
+        for statement in statements:
+            cursor.execute(statement)
+
+    return apply
+
+
+def postgres_jsonb_columns(cursor) -> None:
+    for table, column in (("telegram_events", "payload"), ("users", "order_json")):
+        cursor.execute(
+            "SELECT data_type FROM information_schema.columns"
+            " WHERE table_name = %s AND column_name = %s",
+            (table, column),
+        )
+        row = cursor.fetchone()
+        if row and row[0] != "jsonb":
+            cursor.execute(
+                f"ALTER TABLE {table} ALTER COLUMN {column} "
+                f"TYPE JSONB USING {column}::jsonb"
+            )
+
+
+def sqlite_compact_json(connection) -> None:
+    # json() re-serializes in SQLite's compact form.
+    connection.execute(
+        "UPDATE telegram_events SET payload = json(payload) WHERE json_valid(payload)"
+    )
+    connection.execute(
+        "UPDATE users SET order_json = json(order_json) WHERE json_valid(order_json)"
+    )
+
+
+def event_partition_name(day: date) -> str:
+    return f"telegram_events_p{day:%Y%m%d}"
+
+
+def postgres_event_partitions(cursor, first_day: date, last_day: date) -> None:
+    day = first_day
+    while day <= last_day:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {event_partition_name(day)}"
+            " PARTITION OF telegram_events FOR VALUES"
+            f" FROM ('{day.isoformat()} 00:00:00+00')"
+            f" TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')"
+        )
+        day += timedelta(days=1)
+
+
+def postgres_split_default_events(cursor, first_day: date, last_day: date) -> None:
+    # postgres_event_partitions once telegram_events_default exists: days that
+    # reached the default partition get their own partition too, so their
+    # rows are archived and dropped like any other day's.
+    cursor.execute(
+        "SELECT DISTINCT (received_at AT TIME ZONE 'UTC')::date"
+        " FROM telegram_events_default"
+    )
+    days = {row[0] for row in cursor.fetchall()}
+    day = first_day
+    while day <= last_day:
+        days.add(day)
+        day += timedelta(days=1)
+
+    for day in sorted(days):
+        name = event_partition_name(day)
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0] is not None:
+            continue
+        start = f"{day.isoformat()} 00:00:00+00"
+        end = f"{(day + timedelta(days=1)).isoformat()} 00:00:00+00"
+        # Postgres refuses a new partition for rows the default one holds,
+        # so they are moved into it before it is attached.
+        cursor.execute(f"CREATE TABLE {name} (LIKE telegram_events INCLUDING DEFAULTS)")
+        cursor.execute(
+            "WITH moved AS (DELETE FROM telegram_events_default"
+            " WHERE received_at >= %s AND received_at < %s RETURNING *)"
+            f" INSERT INTO {name} SELECT * FROM moved",
+            (start, end),
+        )
+        cursor.execute(
+            f"ALTER TABLE telegram_events ATTACH PARTITION {name}"
+            f" FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+
+def postgres_partition_events(cursor) -> None:
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('telegram_events')"
+    )
+    if cursor.fetchone()[0] == "p":
+        return
+    cursor.execute("SELECT pg_get_serial_sequence('telegram_events', 'id')")
+    (sequence,) = cursor.fetchone()
+    cursor.execute(
+        "ALTER TABLE telegram_events RENAME TO telegram_events_unpartitioned"
+    )
+    # Keep the id sequence, so ids continue where the old table stopped.
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    cursor.execute(f"""
+        CREATE TABLE telegram_events
+        (
+            id BIGINT NOT NULL DEFAULT nextval('{sequence}'),
+            payload JSONB NOT NULL,
+            received_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, received_at)
+        ) PARTITION BY RANGE (received_at)
+        """)
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY telegram_events.id")
+    cursor.execute("SELECT (now() AT TIME ZONE 'UTC')::date")
+    (today,) = cursor.fetchone()
+    postgres_event_partitions(
+        cursor, today, today + timedelta(days=EVENT_PARTITIONS_AHEAD)
+    )
+    # Existing rows have no timestamp; they count as received today.
+    cursor.execute(
+        "INSERT INTO telegram_events (id, payload)"
+        " SELECT id, payload FROM telegram_events_unpartitioned"
+    )
+    cursor.execute("DROP TABLE telegram_events_unpartitioned")
+
+
+def sqlite_received_at(connection) -> None:
+    columns = [
+        row[1] for row in connection.execute("PRAGMA table_info(telegram_events)")
+    ]
+    if "received_at" in columns:
+        return
+    connection.execute(
+        "ALTER TABLE telegram_events RENAME TO telegram_events_unstamped"
+    )
+    connection.execute(SQLITE_EVENTS_TABLE)
+    # Existing rows have no timestamp; they count as received now.
+    connection.execute(
+        "INSERT INTO telegram_events (id, payload)"
+        " SELECT id, payload FROM telegram_events_unstamped"
+    )
+    connection.execute("DROP TABLE telegram_events_unstamped")
+
+
+# Every table the migrations create, dropped by recreate_database.
+DROPPED_TABLES = (
+    "telegram_events",
+    "users",
+    "processed_updates",
+    "update_offset",
+    "update_queue",
+    "schema_migrations",
+)
+
+POSTGRES_MIGRATIONS = (
+    Migration(
+        1,
+        "create users and telegram_events",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS telegram_events
+            (
+                id SERIAL PRIMARY KEY,
+                payload JSONB NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS users
+            (
+                id SERIAL PRIMARY KEY,
+                telegram_id BIGINT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                state TEXT DEFAULT NULL,
+                order_json JSONB DEFAULT NULL
+            )
+            """,
+        ),
+    ),
+    Migration(2, "store json columns as jsonb", postgres_jsonb_columns),
+    Migration(
+        3,
+        "create update offset and processed updates",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS processed_updates
+            (
+                update_id BIGINT PRIMARY KEY
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS update_offset
+            (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                next_offset BIGINT NOT NULL
+            )
+            """,
+        ),
+    ),
+    Migration(
+        4,
+        "create update queue",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS update_queue
+            (
+                update_id BIGINT PRIMARY KEY,
+                telegram_id BIGINT DEFAULT NULL,
+                payload JSONB NOT NULL,
+                enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                claimed_by TEXT DEFAULT NULL,
+                claimed_until TIMESTAMPTZ DEFAULT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS update_queue_telegram_id
+                ON update_queue (telegram_id, update_id)
+            """,
+        ),
+    ),
+    Migration(5, "partition telegram_events by day", postgres_partition_events),
+    Migration(
+        6,
+        "add a default partition to telegram_events",
+        # Takes rows of days without a partition of their own, so an insert
+        # never fails.
+        sql("""
+            CREATE TABLE IF NOT EXISTS telegram_events_default
+                PARTITION OF telegram_events DEFAULT
+            """),
+    ),
+)
+
+SQLITE_MIGRATIONS = (
+    Migration(
+        1,
+        "create users and telegram_events",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS telegram_events
+            (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS users
+            (
+                id INTEGER PRIMARY KEY,
+                telegram_id INTEGER NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                state TEXT DEFAULT NULL,
+                order_json TEXT DEFAULT NULL
+            )
+            """,
+        ),
+    ),
+    Migration(2, "store compact json", sqlite_compact_json),
+    Migration(
+        3,
+        "create update offset and processed updates",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS processed_updates
+            (
+                update_id INTEGER PRIMARY KEY
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS update_offset
+            (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                next_offset INTEGER NOT NULL
+            )
+            """,
+        ),
+    ),
+    Migration(4, "add received_at to telegram_events", sqlite_received_at),
+)
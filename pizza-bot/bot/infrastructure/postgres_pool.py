@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import pg8000
+
+# What a broken link raises: pg8000's own errors, or the socket's OSError.
+CONNECTION_ERRORS = (pg8000.Error, OSError)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within checkout_timeout."""
+
+
+class PostgresConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections.
+
+    Connections are health-checked on checkout when they have been idle longer
+    than ``health_check_interval`` seconds, and discarded (to be reopened on a
+    later checkout) when a failure leaves them unusable.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        checkout_timeout: float = 30.0,
+        health_check_interval: float = 30.0,
+    ) -> None:
+        if min_size < 0:
+            raise ValueError("min_size must be >= 0")
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        if min_size > max_size:
+            raise ValueError("min_size must not be greater than max_size")
+
+        self._connect = connect
+        self._min_size = min_size
+        self._max_size = max_size
+        self._checkout_timeout = checkout_timeout
+        self._health_check_interval = health_check_interval
+
+        self._idle: deque[tuple[Any, float]] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._available = threading.Condition(threading.Lock())
+
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        connection = self._acquire()
+        broken = False
+        try:
+            yield connection
+        except Exception:
+            broken = not self._reset(connection)
+            raise
+        else:
+            broken = not self._reset(connection)
+        finally:
+            self._release(connection, broken)
+
+    def close(self) -> None:
+        with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._available.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self) -> dict:
+        with self._available:
+            return {
+                "size": self._size,
+                "min_size": self._min_size,
+                "max_size": self._max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "total_wait_seconds": self._total_wait,
+                "max_wait_seconds": self._max_wait,
+                "avg_wait_seconds": (
+                    self._total_wait / self._checkouts if self._checkouts else 0.0
+                ),
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+            }
+
+    def _acquire(self) -> Any:
+        started = time.monotonic()
+        deadline = started + self._checkout_timeout
+        connection = None
+        last_used = 0.0
+        waited = False
+
+        with self._available:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("connection pool is closed")
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self._max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"no connection available after {self._checkout_timeout}s"
+                    )
+                waited = True
+                self._available.wait(remaining)
+
+            self._in_use += 1
+            wait = time.monotonic() - started
+            self._checkouts += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            if waited:
+                self._waits += 1
+
+        try:
+            if connection is None:
+                return self._connect()
+            if (
+                time.monotonic() - last_used >= self._health_check_interval
+                and not self._is_healthy(connection)
+            ):
+                self._close_quietly(connection)
+                with self._available:
+                    self._reconnects += 1
+                return self._connect()
+            return connection
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._in_use -= 1
+                self._available.notify()
+            raise
+
+    def _release(self, connection: Any, broken: bool) -> None:
+        with self._available:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._available.notify()
+        if broken or self._closed:
+            self._close_quietly(connection)
+
+    def _reset(self, connection: Any) -> bool:
+        """Roll back whatever the caller left open; False means the link is dead."""
+        try:
+            connection.rollback()
+            return True
+        except CONNECTION_ERRORS as error:
+            print(f"discarding pooled connection after failed rollback: {error!r}")
+            return False
+
+    def _is_healthy(self, connection: Any) -> bool:
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            connection.rollback()
+            return True
+        except CONNECTION_ERRORS as error:
+            print(f"discarding pooled connection after failed health check: {error!r}")
+            return False
+
+    @staticmethod
+    def _close_quietly(connection: Any) -> None:
+        try:
+            connection.close()
+        except CONNECTION_ERRORS as error:
+            # The connection is being thrown away; nothing else to do.
+            print(f"error closing discarded connection: {error!r}")
@@ -0,0 +1,32 @@
+import asyncio
+import functools
+from concurrent.futures import Executor
+
+from bot.domain.storage import Storage
+
+
+class AsyncStorage:
+    """Awaitable view of a blocking Storage.
+
+    pg8000 and sqlite3 are blocking drivers, so each Storage method is exposed
+    as a coroutine that runs the call on an executor thread.
+    """
+
+    def __init__(self, storage: Storage, executor: Executor | None = None) -> None:
+        self._storage = storage
+        self._executor = executor
+
+    @property
+    def sync(self) -> Storage:
+        return self._storage
+
+    def __getattr__(self, name: str):
+        method = getattr(self._storage, name)
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(method, *args, **kwargs)
+            )
+
+        return call
@@ -0,0 +1,233 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+
+from bot.domain.order_state import OrderState
+from bot.domain.storage import Storage
+
+
+class CachedStorage(Storage):
+    """Write-through LRU cache of users in front of any Storage.
+
+    Entries are keyed by telegram_id, expire after ttl seconds and are evicted
+    least-recently-used first once max_entries or max_bytes is exceeded.
+    Writes go to the wrapped storage first and then update the cached entry.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_entries: int = 10000,
+        ttl: float = 300.0,
+        max_bytes: int = 16 * 1024 * 1024,
+    ) -> None:
+        self._storage = storage
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[int, tuple[float, int, dict]] = OrderedDict()
+        self._bytes = 0
+        # telegram_ids being loaded -> True once a write raced with the load.
+        self._loading: dict[int, bool] = {}
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self._storage, name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def get_user(self, telegram_id: int | None) -> dict | None:
+        if telegram_id is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is not None:
+                expires_at, _, user = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(telegram_id)
+                    self._hits += 1
+                    return _copy_user(user)
+                self._remove(telegram_id)
+                self._expirations += 1
+            self._misses += 1
+            self._loading.setdefault(telegram_id, False)
+
+        try:
+            user = self._storage.get_user(telegram_id)
+        finally:
+            with self._lock:
+                invalidated = self._loading.pop(telegram_id, True)
+
+        if user is not None and not invalidated:
+            with self._lock:
+                self._store(telegram_id, _copy_user(user))
+        return user
+
+    def get_user_order(self, telegram_id: int | None) -> dict | None:
+        user = self.get_user(telegram_id)
+        if user:
+            return user["order_json"]
+        return None
+
+    def transition(
+        self,
+        telegram_id: int,
+        state: OrderState,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
+        def apply(user: dict) -> None:
+            user["state"] = _state_value(state)
+            if reset:
+                user["order_json"] = None if order_patch is None else dict(order_patch)
+            elif order_patch is not None:
+                user["order_json"] = {**(user["order_json"] or {}), **order_patch}
+
+        self._write(
+            telegram_id,
+            lambda: self._storage.transition(telegram_id, state, order_patch, reset),
+            apply,
+        )
+
+    def update_user_state(self, telegram_id: int, state: OrderState) -> None:
+        def apply(user: dict) -> None:
+            user["state"] = _state_value(state)
+
+        self._write(
+            telegram_id,
+            lambda: self._storage.update_user_state(telegram_id, state),
+            apply,
+        )
+
+    def update_user_order(self, telegram_id: int, order: dict) -> None:
+        def apply(user: dict) -> None:
+            user["order_json"] = dict(order)
+
+        self._write(
+            telegram_id,
+            lambda: self._storage.update_user_order(telegram_id, order),
+            apply,
+        )
+
+    def clear_user_state_order(self, telegram_id: int) -> None:
+        def apply(user: dict) -> None:
+            user["state"] = None
+            user["order_json"] = None
+
+        self._write(
+            telegram_id,
+            lambda: self._storage.clear_user_state_order(telegram_id),
+            apply,
+        )
+
+    def ensure_user_exists(self, telegram_id: int) -> None:
+        self._storage.ensure_user_exists(telegram_id)
+
+    def persist_updates(self, updates: list) -> None:
+        self._storage.persist_updates(updates)
+
+    def iter_events(
+        self, after_id: int = 0, batch_size: int = 500
+    ) -> Iterator[tuple[int, dict]]:
+        return self._storage.iter_events(after_id, batch_size)
+
+    def load_update_offset(self) -> int:
+        return self._storage.load_update_offset()
+
+    def save_update_offset(self, offset: int) -> None:
+        self._storage.save_update_offset(offset)
+
+    def claim_updates(self, update_ids: list[int]) -> set[int]:
+        return self._storage.claim_updates(update_ids)
+
+    def processed_updates(self, update_ids: list[int]) -> set[int]:
+        return self._storage.processed_updates(update_ids)
+
+    def migrate(self) -> list[int]:
+        return self._storage.migrate()
+
+    def recreate_database(self) -> None:
+        self._storage.recreate_database()
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for telegram_id in self._loading:
+                self._loading[telegram_id] = True
+
+    def _write(self, telegram_id: int, write, apply) -> None:
+        try:
+            write()
+        except BaseException:
+            with self._lock:
+                self._invalidate(telegram_id)
+            raise
+
+        with self._lock:
+            if telegram_id in self._loading:
+                self._loading[telegram_id] = True
+            entry = self._entries.get(telegram_id)
+            if entry is None:
+                return
+            user = _copy_user(entry[2])
+            apply(user)
+            self._store(telegram_id, user)
+
+    def _invalidate(self, telegram_id: int) -> None:
+        if telegram_id in self._loading:
+            self._loading[telegram_id] = True
+        if telegram_id in self._entries:
+            self._remove(telegram_id)
+
+    def _store(self, telegram_id: int, user: dict) -> None:
+        if telegram_id in self._entries:
+            self._remove(telegram_id)
+        size = _estimate_size(user)
+        self._entries[telegram_id] = (time.monotonic() + self._ttl, size, user)
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self._max_entries or self._bytes > self._max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, telegram_id: int) -> None:
+        _, size, _ = self._entries.pop(telegram_id)
+        self._bytes -= size
+
+
+def _state_value(state: OrderState | str | None) -> str | None:
+    return state.value if hasattr(state, "value") else state
+
+
+def _copy_user(user: dict) -> dict:
+    # Handlers mutate the order they receive, so never hand out cached dicts.
+    order = user.get("order_json")
+    return {**user, "order_json": dict(order) if isinstance(order, dict) else order}
+
+
+def _estimate_size(user: dict) -> int:
+    size = sys.getsizeof(user)
+    for key, value in user.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    order = user.get("order_json")
+    for key, value in order.items() if isinstance(order, dict) else ():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
@@ -0,0 +1,48 @@
+import time
+
+from bot.domain.storage import Storage
+from bot.metrics import Metrics
+from bot.tracing import Tracer, start_span
+
+# iter_events returns a generator, so timing the call would measure nothing.
+_TIMED_METHODS = Storage.__abstractmethods__ - {"iter_events"}
+
+
+class InstrumentedStorage:
+    """Storage proxy recording the latency of every Storage call.
+
+    Each call is observed in Metrics.storage_seconds and traced as a
+    storage.<method> span. Wrap the backend below CachedStorage so cache
+    hits are not counted as queries. Other attributes pass through untouched.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        metrics: Metrics | None = None,
+        tracer: Tracer | None = None,
+    ) -> None:
+        self._storage = storage
+        self._metrics = metrics
+        self._tracer = tracer
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._storage, name)
+        if name not in _TIMED_METHODS:
+            return attribute
+        histogram = self._metrics.storage_seconds if self._metrics else None
+        tracer = self._tracer
+        span_name = f"storage.{name}"
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with start_span(tracer, span_name):
+                    return attribute(*args, **kwargs)
+            finally:
+                if histogram is not None:
+                    histogram.observe(time.perf_counter() - started, name)
+
+        # Later lookups find the wrapper without going through __getattr__.
+        setattr(self, name, call)
+        return call
@@ -0,0 +1,144 @@
+import threading
+from collections import deque
+from collections.abc import Iterator
+from datetime import datetime
+
+from bot.domain.order_state import OrderState
+from bot.domain.storage import Storage
+
+
+class StorageMemory(Storage):
+    """Process-local Storage for benchmarks, replays and tests.
+
+    Behaves like the SQL backends: updates of a missing user are no-ops and
+    readers get copies. The event log keeps at most max_events updates.
+    """
+
+    def __init__(self, max_events: int | None = None) -> None:
+        self._lock = threading.Lock()
+        self._max_events = max_events
+        self.recreate_database()
+
+    @property
+    def events(self) -> list[dict]:
+        with self._lock:
+            return list(self._events)
+
+    @property
+    def events_persisted(self) -> int:
+        return self._events_persisted
+
+    def recreate_database(self) -> None:
+        with self._lock:
+            self._users: dict[int, dict] = {}
+            self._events: deque[dict] = deque(maxlen=self._max_events)
+            self._events_persisted = 0
+            self._next_user_id = 1
+            self._offset = 0
+            self._processed: set[int] = set()
+
+    def migrate(self) -> list[int]:
+        return []
+
+    def ensure_user_exists(self, telegram_id: int) -> None:
+        with self._lock:
+            if telegram_id in self._users:
+                return
+            self._users[telegram_id] = {
+                "id": self._next_user_id,
+                "telegram_id": telegram_id,
+                "created_at": datetime.now(),
+                "state": None,
+                "order_json": None,
+            }
+            self._next_user_id += 1
+
+    def clear_user_state_order(self, telegram_id: int) -> None:
+        with self._lock:
+            user = self._users.get(telegram_id)
+            if user is not None:
+                user["state"] = None
+                user["order_json"] = None
+
+    def update_user_state(self, telegram_id: int, state: OrderState) -> None:
+        with self._lock:
+            user = self._users.get(telegram_id)
+            if user is not None:
+                user["state"] = _state_value(state)
+
+    def transition(
+        self,
+        telegram_id: int,
+        state: OrderState,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
+        with self._lock:
+            user = self._users.get(telegram_id)
+            if user is None:
+                return
+            user["state"] = _state_value(state)
+            if reset:
+                user["order_json"] = None if order_patch is None else dict(order_patch)
+            elif order_patch is not None:
+                user["order_json"] = {**(user["order_json"] or {}), **order_patch}
+
+    def persist_updates(self, updates: list) -> None:
+        with self._lock:
+            self._events.extend(updates)
+            self._events_persisted += len(updates)
+
+    def iter_events(
+        self, after_id: int = 0, batch_size: int = 500
+    ) -> Iterator[tuple[int, dict]]:
+        with self._lock:
+            first_id = self._events_persisted - len(self._events) + 1
+            events = list(self._events)
+        for event_id, update in enumerate(events, start=first_id):
+            if event_id > after_id:
+                yield event_id, update
+
+    def get_user(self, telegram_id: int | None) -> dict | None:
+        with self._lock:
+            user = self._users.get(telegram_id)
+            if user is None:
+                return None
+            order = user["order_json"]
+            return {**user, "order_json": dict(order) if order is not None else None}
+
+    def update_user_order(self, telegram_id: int, order: dict) -> None:
+        with self._lock:
+            user = self._users.get(telegram_id)
+            if user is not None:
+                user["order_json"] = dict(order)
+
+    def get_user_order(self, telegram_id: int | None) -> dict | None:
+        user = self.get_user(telegram_id)
+        if user:
+            return user["order_json"]
+        return None
+
+    def load_update_offset(self) -> int:
+        with self._lock:
+            return self._offset
+
+    def save_update_offset(self, offset: int) -> None:
+        with self._lock:
+            self._offset = max(self._offset, offset)
+            self._processed = {
+                update_id for update_id in self._processed if update_id >= offset
+            }
+
+    def claim_updates(self, update_ids: list[int]) -> set[int]:
+        with self._lock:
+            claimed = set(update_ids) - self._processed
+            self._processed |= claimed
+            return claimed
+
+    def processed_updates(self, update_ids: list[int]) -> set[int]:
+        with self._lock:
+            return set(update_ids) & self._processed
+
+
+def _state_value(state: OrderState | str | None) -> str | None:
+    return state.value if hasattr(state, "value") else state
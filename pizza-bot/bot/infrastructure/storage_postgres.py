@@ -1,16 +1,122 @@
-import json
 import os
+import re
+import threading
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+
 import pg8000
 from dotenv import load_dotenv
 
 from bot.domain.order_state import OrderState
 from bot.domain.storage import Storage
+from bot.infrastructure.json_codec import decode_order, dumps_compact
+from bot.infrastructure.migrations import (
+    DROPPED_TABLES,
+    EVENT_PARTITIONS_AHEAD,
+    POSTGRES_MIGRATIONS,
+    postgres_jsonb_columns,
+    postgres_split_default_events,
+)
+from bot.infrastructure.postgres_pool import (
+    CONNECTION_ERRORS,
+    PostgresConnectionPool,
+)
 
 load_dotenv()
 
+# pg_advisory_xact_lock key serializing schema migrations across instances.
+MIGRATION_LOCK_ID = 7210_0001
+# pg_try_advisory_lock key held by the one instance allowed to call getUpdates.
+POLLER_LOCK_ID = 7210_0002
+# pg_try_advisory_lock key held while one instance rotates and archives events.
+MAINTENANCE_LOCK_ID = 7210_0003
+
+
+# Daily partitions of telegram_events, see migrations.event_partition_name.
+EVENT_PARTITION = re.compile(r"telegram_events_p(\d{8})")
+
+
+def _check_partition_name(name: str) -> None:
+    # Partition names end up in SQL text, so only our own names are accepted.
+    if EVENT_PARTITION.fullmatch(name) is None:
+        raise ValueError(f"not a telegram_events partition: {name!r}")
+
+
+class PostgresAdvisoryLock:
+    """Session-level advisory lock on a connection of its own.
+
+    Postgres releases the lock when that session ends, so an instance that
+    dies or loses its connection gives up the lock without cleanup.
+    """
+
+    def __init__(self, connect, lock_id: int) -> None:
+        self._connect = connect
+        self._lock_id = lock_id
+        self._connection = None
+
+    def try_acquire(self) -> bool:
+        """Попытка взять блокировку без ожидания"""
+        if self._connection is None:
+            self._connection = self._connect()
+        try:
+            cursor = self._connection.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (self._lock_id,))
+            acquired = cursor.fetchone()[0]
+            # Session locks outlive the transaction; don't sit idle in one.
+            self._connection.commit()
+        except CONNECTION_ERRORS:
+            self._drop_connection()
+            raise
+        return acquired
+
+    def is_held(self) -> bool:
+        """Блокировка взята и её сессия жива"""
+        if self._connection is None:
+            return False
+        try:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory'"
+                " AND pid = pg_backend_pid() AND granted"
+                " AND (classid::bigint << 32) + objid::bigint = %s)",
+                (self._lock_id,),
+            )
+            held = cursor.fetchone()[0]
+            self._connection.commit()
+        except CONNECTION_ERRORS as error:
+            # The lock lives and dies with this session, so it is gone too.
+            print(f"advisory lock {self._lock_id} lost with its session: {error!r}")
+            self._drop_connection()
+            return False
+        return held
+
+    def release(self) -> None:
+        """Освобождение блокировки и закрытие её соединения"""
+        if self._connection is None:
+            return
+        try:
+            cursor = self._connection.cursor()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (self._lock_id,))
+            self._connection.commit()
+        except CONNECTION_ERRORS as error:
+            # Closing the session below releases the lock anyway.
+            print(f"advisory lock {self._lock_id} not unlocked: {error!r}")
+        self._drop_connection()
+
+    def _drop_connection(self) -> None:
+        try:
+            self._connection.close()
+        except CONNECTION_ERRORS as error:
+            print(f"advisory lock {self._lock_id} connection not closed: {error!r}")
+        self._connection = None
+
 
 class StoragePostgres(Storage):
-    def _get_connection(self):
+    def __init__(self, pool: PostgresConnectionPool | None = None) -> None:
+        self._pool = pool
+        self._pool_lock = threading.Lock()
+
+    def _connect(self):
         """Create and return a PostgreSQL connection."""
         host = os.getenv("POSTGRES_HOST")
         port = os.getenv("POSTGRES_PORT")
@@ -37,15 +143,48 @@ class StoragePostgres(Storage):
             database=database,
         )
 
+    def _get_pool(self) -> PostgresConnectionPool:
+        """Ленивое создание пула соединений"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = PostgresConnectionPool(
+                        self._connect,
+                        min_size=int(os.getenv("POSTGRES_POOL_MIN_SIZE", "1")),
+                        max_size=int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+                        checkout_timeout=float(
+                            os.getenv("POSTGRES_POOL_TIMEOUT", "30")
+                        ),
+                        health_check_interval=float(
+                            os.getenv("POSTGRES_POOL_HEALTH_CHECK_INTERVAL", "30")
+                        ),
+                    )
+        return self._pool
+
+    def _get_connection(self):
+        """Взять соединение из пула (возвращается в пул при выходе из with)"""
+        return self._get_pool().connection()
+
+    def pool_stats(self) -> dict:
+        """Статистика пула соединений"""
+        return self._get_pool().stats()
+
+    def close(self) -> None:
+        """Закрытие всех соединений пула"""
+        if self._pool is not None:
+            self._pool.close()
+
     def persist_updates(self, updates: list) -> None:
-        """Сохранение нескольких обновлений"""
+        """Сохранение нескольких обновлений одним INSERT"""
+        if not updates:
+            return
+        payloads = tuple(dumps_compact(update) for update in updates)
+        values = ", ".join(["(%s)"] * len(payloads))
         with self._get_connection() as connection:
             with connection.cursor() as cursor:
-                for update in updates:
-                    payload = json.dumps(update, ensure_ascii=False, indent=2)
-                    cursor.execute(
-                        "INSERT INTO telegram_events (payload) VALUES (%s)", (payload,)
-                    )
+                cursor.execute(
+                    f"INSERT INTO telegram_events (payload) VALUES {values}", payloads
+                )
             connection.commit()
 
     def update_user_order(self, telegram_id: int, order: dict) -> None:
@@ -54,36 +193,137 @@ class StoragePostgres(Storage):
             with connection.cursor() as cursor:
                 cursor.execute(
                     "UPDATE users SET order_json = %s WHERE telegram_id = %s",
-                    (json.dumps(order, ensure_ascii=False, indent=2), telegram_id),
+                    (dumps_compact(order), telegram_id),
                 )
             connection.commit()
 
     def recreate_database(self) -> None:
+        """Удаление всех таблиц и создание схемы заново (только для админа)"""
         with self._get_connection() as connection:
             with connection.cursor() as cursor:
-                cursor.execute("DROP TABLE IF EXISTS telegram_events")
-                cursor.execute("DROP TABLE IF EXISTS users")
+                for table in DROPPED_TABLES:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.commit()
+        self.migrate()
+
+    def migrate(self) -> list[int]:
+        """Применение недостающих миграций, возвращает их версии"""
+        latest = POSTGRES_MIGRATIONS[-1].version
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                if self._schema_version(cursor) >= latest:
+                    return []
+                # Two instances starting together must not both migrate.
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
                 cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS telegram_events
-                    (
-                        id SERIAL PRIMARY KEY,
-                        payload TEXT NOT NULL
+                    "CREATE TABLE IF NOT EXISTS schema_migrations"
+                    " (version INTEGER PRIMARY KEY, name TEXT NOT NULL,"
+                    " applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+                )
+                current = self._schema_version(cursor)
+                applied = []
+                for migration in POSTGRES_MIGRATIONS:
+                    if migration.version <= current:
+                        continue
+                    migration.apply(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (migration.version, migration.name),
+                    )
+                    applied.append(migration.version)
+            connection.commit()
+        return applied
+
+    def _schema_version(self, cursor) -> int:
+        """Последняя применённая миграция, 0 для пустой базы"""
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        return cursor.fetchone()[0]
+
+    def iter_events(
+        self, after_id: int = 0, batch_size: int = 500
+    ) -> Iterator[tuple[int, dict]]:
+        """Чтение журнала событий серверным курсором, по batch_size строк"""
+        yield from self._stream(
+            "SELECT id, payload FROM telegram_events WHERE id > %s ORDER BY id",
+            (after_id,),
+            batch_size,
+        )
+
+    def _stream(self, query: str, params: tuple, batch_size: int) -> Iterator[tuple]:
+        """Строки запроса через серверный курсор, по batch_size за раз"""
+        with self._get_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    # The scan runs for long and must never write.
+                    cursor.execute("SET TRANSACTION READ ONLY")
+                    cursor.execute(
+                        f"DECLARE stream_rows NO SCROLL CURSOR FOR {query}", params
                     )
-                    """
+                    while True:
+                        # FETCH does not accept a bound parameter for the count.
+                        cursor.execute(
+                            f"FETCH FORWARD {int(batch_size)} FROM stream_rows"
+                        )
+                        rows = cursor.fetchall()
+                        if not rows:
+                            break
+                        yield from rows
+            finally:
+                # Ends the read-only transaction and closes the cursor with it.
+                connection.rollback()
+
+    def rotate_events(self, now: datetime | None = None) -> None:
+        """Создание дневных разделов telegram_events на неделю вперёд"""
+        today = (now or datetime.now(UTC)).astimezone(UTC).date()
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                # Instances running this together must not race on CREATE TABLE.
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                postgres_split_default_events(
+                    cursor, today, today + timedelta(days=EVENT_PARTITIONS_AHEAD)
                 )
+            connection.commit()
+
+    def expired_event_partitions(self, before: datetime) -> list[str]:
+        """Разделы telegram_events, целиком полученные раньше before"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
                 cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS users
-                    (
-                        id SERIAL PRIMARY KEY,
-                        telegram_id BIGINT NOT NULL UNIQUE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        state TEXT DEFAULT NULL,
-                        order_json TEXT DEFAULT NULL
-                    )
-                    """
+                    "SELECT child.relname FROM pg_inherits"
+                    " JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid"
+                    " WHERE pg_inherits.inhparent = 'telegram_events'::regclass"
+                    " ORDER BY child.relname"
                 )
+                names = [row[0] for row in cursor.fetchall()]
+            connection.rollback()
+        expired = []
+        for name in names:
+            match = EVENT_PARTITION.fullmatch(name)
+            if match is None:
+                continue
+            day = datetime.strptime(match[1], "%Y%m%d").replace(tzinfo=UTC)
+            if day + timedelta(days=1) <= before:
+                expired.append(name)
+        return expired
+
+    def iter_partition_events(
+        self, name: str, batch_size: int = 500
+    ) -> Iterator[tuple[int, datetime, dict]]:
+        """Чтение раздела telegram_events: (id, received_at, обновление)"""
+        _check_partition_name(name)
+        yield from self._stream(
+            f"SELECT id, received_at, payload FROM {name} ORDER BY id", (), batch_size
+        )
+
+    def drop_event_partition(self, name: str) -> None:
+        """Удаление раздела telegram_events"""
+        _check_partition_name(name)
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {name}")
             connection.commit()
 
     def get_user(self, telegram_id: int | None) -> dict | None:
@@ -104,7 +344,7 @@ class StoragePostgres(Storage):
                         "telegram_id": result[1],
                         "created_at": result[2],
                         "state": result[3],
-                        "order_json": result[4],
+                        "order_json": decode_order(result[4]),
                     }
                 return None
 
@@ -131,31 +371,209 @@ class StoragePostgres(Storage):
                 )
             connection.commit()
 
+    def transition(
+        self,
+        telegram_id: int,
+        state: OrderState,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
+        """Смена состояния и заказа пользователя одним UPDATE"""
+        state_value = state.value if hasattr(state, "value") else str(state)
+        if reset:
+            query = (
+                "UPDATE users SET state = %s, order_json = %s WHERE telegram_id = %s"
+            )
+            params = (
+                state_value,
+                None if order_patch is None else dumps_compact(order_patch),
+                telegram_id,
+            )
+        elif order_patch is not None:
+            query = (
+                "UPDATE users SET state = %s, "
+                "order_json = COALESCE(order_json, '{}'::jsonb) || %s::jsonb "
+                "WHERE telegram_id = %s"
+            )
+            params = (state_value, dumps_compact(order_patch), telegram_id)
+        else:
+            query = "UPDATE users SET state = %s WHERE telegram_id = %s"
+            params = (state_value, telegram_id)
+
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+            connection.commit()
+
     def get_user_order(self, telegram_id: int | None) -> dict | None:
         """Получение заказа пользователя"""
         if telegram_id is None:
             return None
 
         user = self.get_user(telegram_id)
-        if user and user.get("order_json"):
-            try:
-                return json.loads(user["order_json"])
-            except json.JSONDecodeError:
-                return None
+        if user:
+            return user["order_json"]
         return None
 
+    def migrate_json_columns(self) -> None:
+        """Перевод TEXT-колонок с JSON в JSONB (повторный запуск безопасен)"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                postgres_jsonb_columns(cursor)
+            connection.commit()
+
     def ensure_user_exists(self, telegram_id: int) -> None:
         """Создание пользователя если не существует"""
         with self._get_connection() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(
-                    "SELECT 1 FROM users WHERE telegram_id = %s",
+                    "INSERT INTO users (telegram_id) VALUES (%s)"
+                    " ON CONFLICT (telegram_id) DO NOTHING",
                     (telegram_id,),
                 )
+            connection.commit()
 
-                if cursor.fetchone() is None:
+    def load_update_offset(self) -> int:
+        """Сохранённый offset для getUpdates"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT next_offset FROM update_offset WHERE id = 1")
+                row = cursor.fetchone()
+                return row[0] if row else 0
+
+    def save_update_offset(self, offset: int) -> None:
+        """Сохранение offset и очистка подтверждённых update_id"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO update_offset (id, next_offset) VALUES (1, %s)"
+                    " ON CONFLICT (id) DO UPDATE SET next_offset ="
+                    " GREATEST(update_offset.next_offset, EXCLUDED.next_offset)",
+                    (offset,),
+                )
+                cursor.execute(
+                    "DELETE FROM processed_updates WHERE update_id < %s", (offset,)
+                )
+            connection.commit()
+
+    def claim_updates(self, update_ids: list[int]) -> set[int]:
+        """Отметка update_id как обработанных одним INSERT, возвращает новые"""
+        if not update_ids:
+            return set()
+        values = ", ".join(["(%s)"] * len(update_ids))
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO processed_updates (update_id) VALUES {values}"
+                    " ON CONFLICT (update_id) DO NOTHING RETURNING update_id",
+                    tuple(update_ids),
+                )
+                claimed = {row[0] for row in cursor.fetchall()}
+            connection.commit()
+        return claimed
+
+    def processed_updates(self, update_ids: list[int]) -> set[int]:
+        """Какие из update_id уже отмечены как обработанные"""
+        if not update_ids:
+            return set()
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT update_id FROM processed_updates"
+                    " WHERE update_id = ANY(%s)",
+                    (list(update_ids),),
+                )
+                processed = {row[0] for row in cursor.fetchall()}
+            connection.rollback()
+        return processed
+
+    def advisory_lock(self, lock_id: int = POLLER_LOCK_ID) -> PostgresAdvisoryLock:
+        """Advisory-блокировка на отдельном соединении для выбора лидера"""
+        return PostgresAdvisoryLock(self._connect, lock_id)
+
+    def enqueue_updates(self, updates: list, next_offset: int) -> int:
+        """Постановка обновлений в очередь вместе с offset, возвращает число новых"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO update_offset (id, next_offset) VALUES (1, 0)"
+                    " ON CONFLICT (id) DO NOTHING"
+                )
+                # The row lock serializes pollers, and a deposed leader's late
+                # batch is already below the saved offset.
+                cursor.execute(
+                    "SELECT next_offset FROM update_offset WHERE id = 1 FOR UPDATE"
+                )
+                saved_offset = cursor.fetchone()[0]
+                fresh = [
+                    update for update in updates if update["update_id"] >= saved_offset
+                ]
+                enqueued = 0
+                if fresh:
+                    values = ", ".join(["(%s::bigint, %s::jsonb)"] * len(fresh))
+                    params = []
+                    for update in fresh:
+                        params += [update["update_id"], dumps_compact(update)]
                     cursor.execute(
-                        "INSERT INTO users (telegram_id) VALUES (%s)",
-                        (telegram_id,),
+                        "INSERT INTO update_queue (update_id, telegram_id, payload)"
+                        " SELECT update_id, COALESCE("
+                        "(payload->'message'->'from'->>'id')::bigint,"
+                        " (payload->'callback_query'->'from'->>'id')::bigint),"
+                        f" payload FROM (VALUES {values}) AS batch (update_id, payload)"
+                        " ON CONFLICT (update_id) DO NOTHING RETURNING update_id",
+                        tuple(params),
                     )
+                    # Updates already queued by an earlier poll are not new.
+                    enqueued = len(cursor.fetchall())
+                cursor.execute(
+                    "UPDATE update_offset SET next_offset = GREATEST(next_offset, %s)"
+                    " WHERE id = 1",
+                    (next_offset,),
+                )
+            connection.commit()
+        return enqueued
+
+    def claim_queued_updates(
+        self, worker: str, limit: int = 1, lease: float = 60.0
+    ) -> list[tuple[int, dict]]:
+        """Захват обновлений из очереди, возвращает пары (попытка, обновление)"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                # Only the oldest queued update of each user is eligible, so a
+                # user's updates run one at a time and in order on any node.
+                cursor.execute(
+                    "UPDATE update_queue SET claimed_by = %s,"
+                    " claimed_until = now() + make_interval(secs => %s),"
+                    " attempts = attempts + 1"
+                    " WHERE update_id IN ("
+                    "SELECT queued.update_id FROM update_queue AS queued"
+                    " WHERE (queued.claimed_until IS NULL"
+                    " OR queued.claimed_until < now())"
+                    " AND NOT EXISTS (SELECT 1 FROM update_queue AS earlier"
+                    " WHERE earlier.telegram_id = queued.telegram_id"
+                    " AND earlier.update_id < queued.update_id)"
+                    " ORDER BY queued.update_id LIMIT %s"
+                    " FOR UPDATE SKIP LOCKED)"
+                    " RETURNING update_id, attempts, payload",
+                    (worker, float(lease), limit),
+                )
+                rows = sorted(cursor.fetchall())
+            connection.commit()
+        return [(attempts, payload) for _, attempts, payload in rows]
+
+    def complete_queued_update(self, update_id: int, worker: str) -> None:
+        """Удаление обработанного обновления из очереди"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM update_queue WHERE update_id = %s AND claimed_by = %s",
+                    (update_id, worker),
+                )
             connection.commit()
+
+    def queued_updates(self) -> int:
+        """Число обновлений в очереди"""
+        with self._get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM update_queue")
+                return cursor.fetchone()[0]
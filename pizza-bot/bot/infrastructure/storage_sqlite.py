@@ -1,57 +1,196 @@
 import json
 import os
+import re
 import sqlite3
+from collections.abc import Iterator
+from datetime import UTC, datetime
 
 from dotenv import load_dotenv
 from bot.domain.storage import Storage
+from bot.infrastructure.json_codec import decode_order, dumps_compact
+from bot.infrastructure.migrations import (
+    DROPPED_TABLES,
+    SQLITE_EVENTS_TABLE,
+    SQLITE_MIGRATIONS,
+    sqlite_compact_json,
+)
 
 load_dotenv()
 
+# telegram_events rolled over by rotate_events(), named after their first id
+# so that name order is id order.
+ROLLED_EVENTS = re.compile(r"telegram_events_r\d{12}")
+
+
+def _rolled_event_tables(connection: sqlite3.Connection) -> list[str]:
+    return [
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+            " AND name GLOB 'telegram_events_r[0-9]*' ORDER BY name"
+        )
+        if ROLLED_EVENTS.fullmatch(row[0])
+    ]
+
+
+def _check_rolled_table(name: str) -> None:
+    # Table names end up in SQL text, so only our own names are accepted.
+    if ROLLED_EVENTS.fullmatch(name) is None:
+        raise ValueError(f"not a rolled telegram_events table: {name!r}")
+
 
 class StorageSqlite(Storage):
 
-    def persist_update(self, update: dict) -> None:
-        payload = json.dumps(update, ensure_ascii=False, indent=2)
+    def persist_updates(self, updates: list) -> None:
+        payloads = [(dumps_compact(update),) for update in updates]
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
             with connection:
-                connection.execute(
-                    "INSERT INTO telegram_events (payload) VALUES (?)", (payload,)
+                connection.executemany(
+                    "INSERT INTO telegram_events (payload) VALUES (?)", payloads
+                )
+
+    def iter_events(
+        self, after_id: int = 0, batch_size: int = 500
+    ) -> Iterator[tuple[int, dict]]:
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            for table in [*_rolled_event_tables(connection), "telegram_events"]:
+                cursor = connection.execute(
+                    f"SELECT id, payload FROM {table} WHERE id > ? ORDER BY id",
+                    (after_id,),
                 )
+                while rows := cursor.fetchmany(batch_size):
+                    for event_id, payload in rows:
+                        yield event_id, json.loads(payload)
+
+    def rotate_events(self, now: datetime | None = None) -> None:
+        # Rolls telegram_events over once it holds rows from before today (UTC).
+        today = (now or datetime.now(UTC)).astimezone(UTC)
+        day_start = today.strftime("%Y-%m-%d 00:00:00")
+        connection = sqlite3.connect(
+            os.getenv("SQLITE_DATABASE_PATH"), isolation_level=None
+        )
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                first_id, oldest = connection.execute(
+                    "SELECT MIN(id), MIN(received_at) FROM telegram_events"
+                ).fetchone()
+                if first_id is not None and oldest < day_start:
+                    rolled = f"telegram_events_r{first_id:012d}"
+                    connection.execute(
+                        f"ALTER TABLE telegram_events RENAME TO {rolled}"
+                    )
+                    connection.execute(SQLITE_EVENTS_TABLE)
+                    # The AUTOINCREMENT counter was renamed with the old table.
+                    connection.execute(
+                        "INSERT INTO sqlite_sequence (name, seq)"
+                        " SELECT 'telegram_events', seq FROM sqlite_sequence"
+                        " WHERE name = ?",
+                        (rolled,),
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.close()
+
+    def expired_event_partitions(self, before: datetime) -> list[str]:
+        cutoff = before.astimezone(UTC).strftime("%Y-%m-%d %H:%M:%S")
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            return [
+                table
+                for table in _rolled_event_tables(connection)
+                if connection.execute(
+                    f"SELECT COALESCE(MAX(received_at), '') < ? FROM {table}",
+                    (cutoff,),
+                ).fetchone()[0]
+            ]
+
+    def iter_partition_events(
+        self, name: str, batch_size: int = 500
+    ) -> Iterator[tuple[int, datetime, dict]]:
+        _check_rolled_table(name)
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            cursor = connection.execute(
+                f"SELECT id, received_at, payload FROM {name} ORDER BY id"
+            )
+            while rows := cursor.fetchmany(batch_size):
+                for event_id, received_at, payload in rows:
+                    yield (
+                        event_id,
+                        datetime.fromisoformat(received_at).replace(tzinfo=UTC),
+                        json.loads(payload),
+                    )
+
+    def drop_event_partition(self, name: str) -> None:
+        _check_rolled_table(name)
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            with connection:
+                connection.execute(f"DROP TABLE IF EXISTS {name}")
 
-    def update_user_order_json(self, telegram_id: int, order_json: dict) -> None:
+    def update_user_order(self, telegram_id: int, order: dict) -> None:
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
             with connection:
                 connection.execute(
                     "UPDATE users SET order_json = ? WHERE telegram_id = ?",
-                    (json.dumps(order_json, ensure_ascii=False, indent=2), telegram_id),
+                    (dumps_compact(order), telegram_id),
                 )
 
     def recreate_database(self) -> None:
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
             with connection:
-                connection.execute("DROP TABLE IF EXISTS telegram_events")
-                connection.execute("DROP TABLE IF EXISTS users")
+                for table in [*DROPPED_TABLES, *_rolled_event_tables(connection)]:
+                    connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self.migrate()
+
+    def migrate(self) -> list[int]:
+        latest = SQLITE_MIGRATIONS[-1].version
+        connection = sqlite3.connect(
+            os.getenv("SQLITE_DATABASE_PATH"), isolation_level=None
+        )
+        try:
+            if self._schema_version(connection) >= latest:
+                return []
+            # IMMEDIATE takes the write lock up front, so a second process
+            # waits here and then sees the migrations as applied.
+            connection.execute("BEGIN IMMEDIATE")
+            try:
                 connection.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS telegram_events
-                    (
-                        id INTEGER PRIMARY KEY,
-                        payload TEXT NOT NULL
-                    )
-                    """,
+                    "CREATE TABLE IF NOT EXISTS schema_migrations"
+                    " (version INTEGER PRIMARY KEY, name TEXT NOT NULL,"
+                    " applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
                 )
-                connection.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS users
-                    (
-                        id INTEGER PRIMARY KEY,
-                        telegram_id INTEGER NOT NULL UNIQUE,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        state TEXT DEFAULT NULL,
-                        order_json TEXT DEFAULT NULL
+                current = self._schema_version(connection)
+                applied = []
+                for migration in SQLITE_MIGRATIONS:
+                    if migration.version <= current:
+                        continue
+                    migration.apply(connection)
+                    connection.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                        (migration.version, migration.name),
                     )
-                    """,
-                )
+                    applied.append(migration.version)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return applied
+        finally:
+            connection.close()
+
+    def _schema_version(self, connection: sqlite3.Connection) -> int:
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master"
+            " WHERE type = 'table' AND name = 'schema_migrations'"
+        ).fetchone()
+        if not exists:
+            return 0
+        (version,) = connection.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM schema_migrations"
+        ).fetchone()
+        return version
 
     def get_user(self, telegram_id: int) -> dict | None:
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
@@ -67,11 +206,11 @@ class StorageSqlite(Storage):
                         "telegram_id": result[1],
                         "created_at": result[2],
                         "state": result[3],
-                        "order_json": result[4],
+                        "order_json": decode_order(result[4]),
                     }
                 return None
 
-    def clear_user_order_json(self, telegram_id: int) -> None:
+    def clear_user_state_order(self, telegram_id: int) -> None:
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
             with connection:
                 connection.execute(
@@ -79,24 +218,120 @@ class StorageSqlite(Storage):
                     (telegram_id,),
                 )
 
+    def transition(
+        self,
+        telegram_id: int,
+        state: str,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
+        state_value = state.value if hasattr(state, "value") else str(state)
+        if reset:
+            query = "UPDATE users SET state = ?, order_json = ? WHERE telegram_id = ?"
+            params = (
+                state_value,
+                None if order_patch is None else dumps_compact(order_patch),
+                telegram_id,
+            )
+        elif order_patch:
+            # json_set rather than json_patch: RFC 7396 patching would delete
+            # keys set to null, where Postgres || and the other backends keep them.
+            assignments = ", ".join("?, json(?)" for _ in order_patch)
+            query = (
+                "UPDATE users SET state = ?, "
+                f"order_json = json_set(COALESCE(order_json, '{{}}'), {assignments}) "
+                "WHERE telegram_id = ?"
+            )
+            params = (state_value,)
+            for key, value in order_patch.items():
+                params += ("$." + json.dumps(key), dumps_compact(value))
+            params += (telegram_id,)
+        elif order_patch is not None:
+            query = (
+                "UPDATE users SET state = ?, order_json = COALESCE(order_json, '{}') "
+                "WHERE telegram_id = ?"
+            )
+            params = (state_value, telegram_id)
+        else:
+            query = "UPDATE users SET state = ? WHERE telegram_id = ?"
+            params = (state_value, telegram_id)
+
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            with connection:
+                connection.execute(query, params)
+
+    def get_user_order(self, telegram_id: int | None) -> dict | None:
+        user = self.get_user(telegram_id)
+        if user:
+            return user["order_json"]
+        return None
+
     def update_user_state(self, telegram_id: int, state: str) -> None:
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
             with connection:
                 connection.execute(
                     "UPDATE users SET state = ? WHERE telegram_id = ?",
-                    (state, telegram_id),
+                    (
+                        state.value if hasattr(state, "value") else str(state),
+                        telegram_id,
+                    ),
                 )
 
     def ensure_user_exists(self, telegram_id: int) -> None:
         with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
             with connection:
-                cursor = connection.execute(
-                    "SELECT 1 FROM users WHERE telegram_id = ?",
+                connection.execute(
+                    "INSERT OR IGNORE INTO users (telegram_id) VALUES (?)",
                     (telegram_id,),
                 )
 
-                if cursor.fetchone() is None:
-                    connection.execute(
-                        "INSERT INTO users (telegram_id) VALUES (?)",
-                        (telegram_id,),
+    def migrate_json_columns(self) -> None:
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            with connection:
+                sqlite_compact_json(connection)
+
+    def load_update_offset(self) -> int:
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            row = connection.execute(
+                "SELECT next_offset FROM update_offset WHERE id = 1"
+            ).fetchone()
+            return row[0] if row else 0
+
+    def save_update_offset(self, offset: int) -> None:
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            with connection:
+                connection.execute(
+                    "INSERT INTO update_offset (id, next_offset) VALUES (1, ?)"
+                    " ON CONFLICT (id) DO UPDATE SET"
+                    " next_offset = MAX(next_offset, excluded.next_offset)",
+                    (offset,),
+                )
+                connection.execute(
+                    "DELETE FROM processed_updates WHERE update_id < ?", (offset,)
+                )
+
+    def claim_updates(self, update_ids: list[int]) -> set[int]:
+        claimed = set()
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            with connection:
+                for update_id in update_ids:
+                    cursor = connection.execute(
+                        "INSERT OR IGNORE INTO processed_updates (update_id)"
+                        " VALUES (?)",
+                        (update_id,),
                     )
+                    if cursor.rowcount:
+                        claimed.add(update_id)
+        return claimed
+
+    def processed_updates(self, update_ids: list[int]) -> set[int]:
+        if not update_ids:
+            return set()
+        placeholders = ", ".join("?" * len(update_ids))
+        with sqlite3.connect(os.getenv("SQLITE_DATABASE_PATH")) as connection:
+            rows = connection.execute(
+                "SELECT update_id FROM processed_updates"
+                f" WHERE update_id IN ({placeholders})",
+                update_ids,
+            ).fetchall()
+        return {row[0] for row in rows}
@@ -1,12 +1,330 @@
+import asyncio
+import time
+import traceback
+
+from bot.async_dispatcher import AsyncDispatcher
 from bot.dispatcher import Dispatcher
-from bot.domain.messenger import Messenger
+from bot.domain.messenger import Messenger, MessengerError
+from bot.infrastructure.messenger_async import AsyncMessenger
+from bot.infrastructure.postgres_pool import CONNECTION_ERRORS
+from bot.metrics import Metrics
+from bot.process_pool import UserShardedProcessPool, WorkerFactory
+from bot.update_checkpoint import InFlightUpdates, UpdateCheckpoint
+from bot.work_queue import QueueWorkerPool
+from bot.worker_pool import UserShardedWorkerPool
+
+
+def start_long_polling(
+    dispatcher: Dispatcher,
+    messenger: Messenger,
+    checkpoint: UpdateCheckpoint | None = None,
+    metrics: Metrics | None = None,
+) -> None:
+    next_update_offset = checkpoint.load() if checkpoint else 0
+    try:
+        while True:
+            updates = messenger.get_updates(offset=next_update_offset, timeout=30)
+            if metrics:
+                _observe_batch(metrics, updates)
+            completed = []
+            try:
+                for update in checkpoint.pending(updates) if checkpoint else updates:
+                    dispatcher.dispatch(update)
+                    completed.append(update)
+                    print(".", end="", flush=True)
+            finally:
+                # If a dispatch raises, the rest of the batch comes again.
+                if checkpoint:
+                    checkpoint.complete(completed)
+            next_update_offset = _next_offset(next_update_offset, updates)
+            if checkpoint:
+                checkpoint.advance(next_update_offset)
+    finally:
+        if checkpoint:
+            checkpoint.flush()
+
+
+def _next_offset(offset: int, updates: list[dict]) -> int:
+    for update in updates:
+        offset = max(offset, update["update_id"] + 1)
+    return offset
+
+
+def _observe_batch(metrics: Metrics, updates: list[dict]) -> None:
+    metrics.batch_updates.observe(len(updates))
+    now = time.time()
+    for update in updates:
+        # Callback queries carry no date, so only messages report lag.
+        message = update.get("message") or update.get("edited_message")
+        if message and "date" in message:
+            metrics.poll_lag_seconds.observe(max(now - message["date"], 0))
+
+
+def start_long_polling_threaded(
+    dispatcher: Dispatcher,
+    messenger: Messenger,
+    workers: int = 4,
+    queue_depth: int = 100,
+    report_interval: float = 60.0,
+    checkpoint: UpdateCheckpoint | None = None,
+    metrics: Metrics | None = None,
+    max_attempts: int = 3,
+    busy_poll_interval: float = 0.25,
+) -> None:
+    """Poll while worker threads dispatch, without waiting for whole batches.
+
+    The offset stays at the oldest update still in flight, so getUpdates
+    returns those again; while it returns nothing new the loop waits for a
+    worker to finish, at most busy_poll_interval seconds, before polling.
+    """
+    pool = UserShardedWorkerPool(dispatcher, workers=workers, queue_depth=queue_depth)
+    in_flight = InFlightUpdates(
+        checkpoint.load() if checkpoint else 0, checkpoint, max_attempts
+    )
+    last_report = time.monotonic()
+    try:
+        while True:
+            updates = messenger.get_updates(offset=in_flight.offset(), timeout=30)
+            fresh = in_flight.fresh(updates)
+            if metrics:
+                _observe_batch(metrics, fresh)
+            for update in fresh:
+                pool.submit(update, in_flight.finished)
+            in_flight.save()
+            if updates and not fresh:
+                in_flight.wait(busy_poll_interval)
+            print("." * len(fresh), end="", flush=True)
+
+            if time.monotonic() - last_report >= report_interval:
+                last_report = time.monotonic()
+                _print_worker_stats(pool.stats())
+                _print_dispatch_stats(dispatcher.stats())
+    finally:
+        pool.shutdown()
+        in_flight.save()
+        if checkpoint:
+            checkpoint.flush()
+
+
+def start_long_polling_multiprocess(
+    messenger: Messenger,
+    worker_factory: WorkerFactory,
+    workers: int = 4,
+    queue_depth: int = 100,
+    report_interval: float = 60.0,
+    checkpoint: UpdateCheckpoint | None = None,
+    metrics: Metrics | None = None,
+) -> None:
+    """Poll in this process and dispatch in worker processes.
+
+    messenger is only used for getUpdates; every worker builds its own
+    Storage and Messenger through worker_factory.
+    """
+    pool = UserShardedProcessPool(
+        worker_factory, workers=workers, queue_depth=queue_depth
+    )
+    next_update_offset = checkpoint.load() if checkpoint else 0
+    last_report = time.monotonic()
+    try:
+        while True:
+            updates = messenger.get_updates(offset=next_update_offset, timeout=30)
+            if metrics:
+                _observe_batch(metrics, updates)
+            fresh = checkpoint.pending(updates) if checkpoint else updates
+            for update in fresh:
+                pool.submit(update)
+            # Only move the offset past this batch once all of it is handled.
+            pool.wait_idle()
+            if checkpoint:
+                checkpoint.complete(fresh)
+            # Also restarts workers that died while the bot was idle.
+            pool.supervise()
+            next_update_offset = _next_offset(next_update_offset, updates)
+            if checkpoint:
+                checkpoint.advance(next_update_offset)
+            print("." * len(fresh), end="", flush=True)
+
+            if time.monotonic() - last_report >= report_interval:
+                last_report = time.monotonic()
+                _print_process_stats(pool.stats(), pool.dropped)
+    finally:
+        pool.shutdown()
+        if checkpoint:
+            checkpoint.flush()
+
+
+def _print_process_stats(stats: list[dict], dropped: int) -> None:
+    print()
+    for worker in stats:
+        print(
+            f"worker {worker['worker']} (pid {worker['pid']}): "
+            f"processed {worker['processed']}, "
+            f"errors {worker['errors']}, "
+            f"restarts {worker['restarts']}, "
+            f"in flight {worker['in_flight']}"
+        )
+    if dropped:
+        print(f"dropped after worker crashes: {dropped}")
 
 
-def start_long_polling(dispatcher: Dispatcher, messenger: Messenger) -> None:
-    next_update_offset = 0
-    while True:
-        updates = messenger.get_updates(offset=next_update_offset, timeout=30)
-        for update in updates:
-            next_update_offset = max(next_update_offset, update["update_id"] + 1)
-            dispatcher.dispatch(update)
+def start_long_polling_queue(
+    dispatcher: Dispatcher,
+    messenger: Messenger,
+    storage,
+    leader_lock,
+    workers: int = 4,
+    claim_batch: int = 10,
+    lease: float = 60.0,
+    leader_retry: float = 5.0,
+    report_interval: float = 60.0,
+    metrics: Metrics | None = None,
+) -> None:
+    """Work the Postgres update_queue and poll while holding leader_lock.
+
+    Every instance runs this. The one holding the lock calls getUpdates and
+    enqueues each batch together with the next offset; the others only
+    dispatch from the queue and retry the lock every leader_retry seconds,
+    taking over when the leader's session ends.
+    """
+    pool = QueueWorkerPool(
+        dispatcher, storage, workers=workers, claim_batch=claim_batch, lease=lease
+    )
+    next_update_offset = None
+    last_report = time.monotonic()
+    try:
+        while True:
+            try:
+                if time.monotonic() - last_report >= report_interval:
+                    last_report = time.monotonic()
+                    _print_queue_stats(pool.stats(), storage.queued_updates())
+
+                if not leader_lock.is_held():
+                    if next_update_offset is not None:
+                        print("\nlost the poller lock")
+                        next_update_offset = None
+                    if not _try_acquire(leader_lock):
+                        time.sleep(leader_retry)
+                        continue
+                    print("\nholding the poller lock, polling getUpdates")
+                    next_update_offset = storage.load_update_offset()
+
+                updates = messenger.get_updates(offset=next_update_offset, timeout=30)
+                if metrics:
+                    _observe_batch(metrics, updates)
+                next_update_offset = _next_offset(next_update_offset, updates)
+                if updates:
+                    enqueued = storage.enqueue_updates(updates, next_update_offset)
+                    print("." * enqueued, end="", flush=True)
+            except (*CONNECTION_ERRORS, MessengerError) as error:
+                print(f"\npoller: {error!r}, retrying in {leader_retry}s")
+                if next_update_offset is not None:
+                    # Step down so an instance that can reach Postgres and
+                    # Telegram takes over; the saved offset stays in the queue.
+                    leader_lock.release()
+                    next_update_offset = None
+                time.sleep(leader_retry)
+    finally:
+        leader_lock.release()
+        pool.shutdown()
+
+
+def _try_acquire(leader_lock) -> bool:
+    try:
+        return leader_lock.try_acquire()
+    except CONNECTION_ERRORS as error:
+        print(f"\ncould not try the poller lock: {error!r}")
+        return False
+
+
+def _print_queue_stats(stats: list[dict], queued: int) -> None:
+    print()
+    for worker in stats:
+        print(
+            f"queue worker {worker['worker']}: "
+            f"processed {worker['processed']}, "
+            f"errors {worker['errors']}, "
+            f"dropped {worker['dropped']}"
+        )
+    print(f"update queue: {queued} pending")
+
+
+def _print_worker_stats(stats: list[dict]) -> None:
+    print()
+    for worker in stats:
+        print(
+            f"worker {worker['worker']}: "
+            f"utilization {worker['utilization']:.1%}, "
+            f"processed {worker['processed']}, "
+            f"errors {worker['errors']}, "
+            f"queued {worker['queue_size']}"
+        )
+
+
+def _print_dispatch_stats(stats: dict) -> None:
+    print(
+        f"dispatcher: dispatched {stats['dispatched']}, "
+        f"user reads {stats['user_reads']}, "
+        f"avoided {stats['user_reads_avoided']}"
+    )
+
+
+async def start_long_polling_async(
+    dispatcher: AsyncDispatcher,
+    messenger: AsyncMessenger,
+    max_in_flight: int = 256,
+    checkpoint: UpdateCheckpoint | None = None,
+    metrics: Metrics | None = None,
+    max_attempts: int = 3,
+    busy_poll_interval: float = 0.25,
+) -> None:
+    """Poll while dispatch tasks run, like start_long_polling_threaded.
+
+    The offset stays at the oldest update whose task has not finished, so
+    Telegram still holds every update a crash would interrupt.
+    """
+    # Checkpoint calls hit blocking Storage, so they run on a worker thread.
+    offset = await asyncio.to_thread(checkpoint.load) if checkpoint else 0
+    in_flight = InFlightUpdates(offset, checkpoint, max_attempts)
+    tasks: set[asyncio.Task] = set()
+    try:
+        while True:
+            updates = await messenger.get_updates(offset=in_flight.offset(), timeout=30)
+            fresh = await asyncio.to_thread(in_flight.fresh, updates)
+            if metrics:
+                _observe_batch(metrics, fresh)
+            for update in fresh:
+                while len(tasks) >= max_in_flight:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.create_task(dispatcher.dispatch(update))
+                tasks.add(task)
+                task.add_done_callback(_on_dispatch_done(tasks, in_flight, update))
+            await asyncio.to_thread(in_flight.save)
+            if updates and not fresh and tasks:
+                await asyncio.wait(
+                    tasks,
+                    timeout=busy_poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+    finally:
+        # Cancelled tasks stay in flight, so the saved offset stays below them.
+        in_flight.save()
+        if checkpoint:
+            checkpoint.flush()
+
+
+def _on_dispatch_done(
+    tasks: set[asyncio.Task], in_flight: InFlightUpdates, update: dict
+):
+    def callback(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            traceback.print_exception(error)
+        else:
             print(".", end="", flush=True)
+        # A failed update is dispatched again, not recorded as completed.
+        in_flight.finished(update, ok=error is None)
+
+    return callback
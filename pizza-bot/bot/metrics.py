@@ -0,0 +1,208 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Instruments are plain counters and fixed-bucket histograms keyed by label
+values; observing one costs a lock and a bisect, cheap enough to sit on the
+dispatch path. serve_metrics() exposes them on a local /metrics endpoint.
+"""
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+BATCH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+LAG_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 300, 900)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(
+                f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                    0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._series.items()
+            )
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            bounds = [*(_number(bound) for bound in self.buckets), "+Inf"]
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                labels = _labels((*self.labels, "le"), (*label_values, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Metrics:
+    """Every instrument the bot exports."""
+
+    def __init__(self) -> None:
+        self.updates = Counter(
+            "pizza_bot_updates_total", "Updates dispatched.", ("kind",)
+        )
+        self.dispatch_seconds = Histogram(
+            "pizza_bot_dispatch_seconds",
+            "Time to dispatch one update, background side effects excluded.",
+        )
+        self.handler_seconds = Histogram(
+            "pizza_bot_handler_seconds",
+            "Time spent in Handler.handle by handler class.",
+            ("handler",),
+        )
+        self.storage_seconds = Histogram(
+            "pizza_bot_storage_seconds",
+            "Storage call latency by method, cache hits excluded.",
+            ("method",),
+        )
+        self.telegram_seconds = Histogram(
+            "pizza_bot_telegram_request_seconds",
+            "Telegram Bot API call latency by method and status.",
+            ("method", "status"),
+        )
+        self.batch_updates = Histogram(
+            "pizza_bot_get_updates_batch_size",
+            "Updates returned by one getUpdates call.",
+            buckets=BATCH_BUCKETS,
+        )
+        self.poll_lag_seconds = Histogram(
+            "pizza_bot_poll_lag_seconds",
+            "Time from a message's date to the poll that received it.",
+            buckets=LAG_BUCKETS,
+        )
+
+    def instruments(self) -> list[Counter | Histogram]:
+        return [
+            value
+            for value in vars(self).values()
+            if isinstance(value, (Counter, Histogram))
+        ]
+
+    def render(self) -> str:
+        lines = []
+        for instrument in self.instruments():
+            lines.extend(instrument.render())
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(
+    metrics: Metrics, host: str = "127.0.0.1", port: int = 9100
+) -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread; call shutdown() to stop."""
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    return server
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
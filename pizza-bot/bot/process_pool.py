@@ -0,0 +1,226 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+import traceback
+from collections import deque
+from collections.abc import Callable
+
+from bot.dispatcher import Dispatcher, get_telegram_id
+
+# Builds a worker's Dispatcher from (index, workers) inside the worker process
+# and returns it with a cleanup callback. Must be picklable: a module-level
+# function.
+WorkerFactory = Callable[[int, int], tuple[Dispatcher, Callable[[], None]]]
+
+
+class UserShardedProcessPool:
+    """Dispatches updates in N worker processes, sharded by telegram_id.
+
+    Each worker builds its own Storage, Messenger and Dispatcher with
+    worker_factory, so handler work and JSON handling run on separate cores.
+    All updates of one user go to the same worker and stay in order. At
+    most queue_depth unacknowledged updates per worker are allowed; beyond
+    that submit() blocks, which pushes back on the polling loop.
+
+    A worker that dies is restarted and its unacknowledged updates are
+    handed to the new process. An update that was being dispatched when its
+    worker died max_attempts times is dropped, so a poison update cannot
+    crash-loop a shard. A worker is not restarted sooner than restart_delay
+    seconds after its previous start, so a worker that cannot start (the
+    database is down) does not spin.
+    """
+
+    def __init__(
+        self,
+        worker_factory: WorkerFactory,
+        workers: int = 4,
+        queue_depth: int = 100,
+        max_attempts: int = 2,
+        restart_delay: float = 1.0,
+        context: multiprocessing.context.BaseContext | None = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        # Forking would copy the poller's threads and open connections.
+        self._context = context or multiprocessing.get_context("spawn")
+        self._worker_factory = worker_factory
+        self._workers = workers
+        self._queue_depth = queue_depth
+        self._max_attempts = max_attempts
+        self._restart_delay = restart_delay
+        self._inboxes: list = [None] * workers
+        # Per-worker pipes: a worker killed mid-write can only break its own.
+        self._acks: list = [None] * workers
+        self._processes: list = [None] * workers
+        self._started_at = [0.0] * workers
+        self._in_flight: list[deque[dict]] = [deque() for _ in range(workers)]
+        self._attempts: dict[int, int] = {}
+        self._processed = [0] * workers
+        self._errors = [0] * workers
+        self._restarts = [0] * workers
+        self._dropped = 0
+        self._closed = False
+        for index in range(workers):
+            self._start(index)
+
+    def submit(self, update: dict) -> None:
+        index = self._shard(update)
+        while len(self._in_flight[index]) >= self._queue_depth:
+            self._collect(timeout=0.1)
+        self._in_flight[index].append(update)
+        self._inboxes[index].put(update)
+
+    def wait_idle(self) -> None:
+        """Block until every submitted update has been dispatched or dropped."""
+        while any(self._in_flight):
+            self._collect(timeout=0.1)
+
+    def supervise(self) -> None:
+        """Restart workers that died and resubmit their pending updates."""
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or self._closed:
+                continue
+            if time.monotonic() - self._started_at[index] < self._restart_delay:
+                continue
+            # Acknowledgements sent just before the crash are still buffered.
+            self._drain_acks()
+            pending = self._in_flight[index]
+            print(
+                f"\nworker {index} (pid {process.pid}) exited with "
+                f"{process.exitcode}, restarting with {len(pending)} pending updates"
+            )
+            if pending:
+                update_id = pending[0]["update_id"]
+                self._attempts[update_id] = self._attempts.get(update_id, 0) + 1
+                if self._attempts[update_id] >= self._max_attempts:
+                    print(f"dropping update {update_id} after repeated crashes")
+                    pending.popleft()
+                    self._attempts.pop(update_id)
+                    self._dropped += 1
+            self._restarts[index] += 1
+            self._start(index)
+            for update in pending:
+                self._inboxes[index].put(update)
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        self._closed = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for receiver in self._acks:
+            if receiver is not None:
+                receiver.close()
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "worker": index,
+                "pid": self._processes[index].pid,
+                "processed": self._processed[index],
+                "errors": self._errors[index],
+                "restarts": self._restarts[index],
+                "in_flight": len(self._in_flight[index]),
+            }
+            for index in range(self._workers)
+        ]
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def _shard(self, update: dict) -> int:
+        telegram_id = get_telegram_id(update)
+        key = update["update_id"] if telegram_id is None else telegram_id
+        return hash(key) % self._workers
+
+    def _start(self, index: int) -> None:
+        # A fresh inbox: a process killed mid-get() can leave the old one locked.
+        self._inboxes[index] = self._context.Queue()
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                self._worker_factory,
+                index,
+                self._workers,
+                self._inboxes[index],
+                sender,
+            ),
+            name=f"worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        # Only the worker holds the sending end, so its exit reads as EOF.
+        sender.close()
+        self._acks[index] = receiver
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+    def _collect(self, timeout: float) -> None:
+        self._read_acks(timeout)
+        self.supervise()
+
+    def _drain_acks(self) -> None:
+        self._read_acks(0)
+
+    def _read_acks(self, timeout: float) -> None:
+        receivers = [receiver for receiver in self._acks if receiver is not None]
+        if not receivers:
+            time.sleep(timeout)
+            return
+        for receiver in multiprocessing.connection.wait(receivers, timeout):
+            index = self._acks.index(receiver)
+            try:
+                while receiver.poll():
+                    self._acknowledge(index, *receiver.recv())
+            except (EOFError, OSError):
+                # The worker exited; supervise() restarts it.
+                receiver.close()
+                self._acks[index] = None
+
+    def _acknowledge(self, index: int, update_id: int, ok: bool) -> None:
+        pending = self._in_flight[index]
+        # Each worker reads its inbox in order, so acks arrive in order too.
+        if pending and pending[0]["update_id"] == update_id:
+            pending.popleft()
+            self._attempts.pop(update_id, None)
+        self._processed[index] += 1
+        if not ok:
+            self._errors[index] += 1
+
+
+def _worker_main(
+    worker_factory: WorkerFactory,
+    index: int,
+    workers: int,
+    inbox,
+    acks: multiprocessing.connection.Connection,
+) -> None:
+    # Ctrl+C reaches the whole process group; the poller stops workers itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    dispatcher, close = worker_factory(index, workers)
+    try:
+        while (update := inbox.get()) is not None:
+            ok = True
+            try:
+                dispatcher.dispatch(update)
+            except Exception:
+                # Handlers may raise anything, so the catch is deliberately
+                # broad: the update is acked as failed instead of the worker
+                # dying and the poller restarting it with the same update.
+                ok = False
+                print(
+                    f"worker {index} (pid {os.getpid()}): "
+                    f"update {update['update_id']} failed:"
+                )
+                traceback.print_exc()
+            acks.send((update["update_id"], ok))
+    finally:
+        close()
@@ -0,0 +1,156 @@
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class DispatchProfiler:
+    """Profiles every Nth dispatch with cProfile and tracemalloc.
+
+    Samples are aggregated over window seconds and then written to
+    output_dir as a pstats file (python -m pstats <file>) and a text report
+    of the source lines holding the most memory allocated by the sampled
+    dispatches. Only one dispatch is sampled at a time; others running
+    concurrently are skipped. While disabled, should_sample() is a single
+    attribute check.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        every: int = 100,
+        window: float = 60.0,
+        top: int = 25,
+        enabled: bool = True,
+        clock=time.monotonic,
+    ) -> None:
+        self.enabled = enabled
+        self._output_dir = output_dir
+        self._every = max(every, 1)
+        self._window = window
+        self._top = top
+        self._clock = clock
+        self._calls = itertools.count()
+        self._sampling = threading.Lock()
+        self._lock = threading.Lock()
+        self._reset_window()
+
+    def toggle(self) -> None:
+        """Flip profiling on or off; safe to call from a signal handler."""
+        self.enabled = not self.enabled
+        if self.enabled:
+            self._window_started = self._clock()
+        else:
+            # Writing files from inside a signal handler could deadlock.
+            threading.Thread(target=self.flush, name="profiler-flush").start()
+
+    def should_sample(self) -> bool:
+        return self.enabled and next(self._calls) % self._every == 0
+
+    @contextmanager
+    def sample(self) -> Iterator[None]:
+        if not self._sampling.acquire(blocking=False):
+            yield
+            return
+        profile = cProfile.Profile()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+            before = None
+        else:
+            # Someone else is tracing: only count what this dispatch added.
+            before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        try:
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                )
+            )
+            if before is None:
+                allocations = [
+                    (statistic.traceback[0], statistic.size, statistic.count)
+                    for statistic in snapshot.statistics("lineno")
+                ]
+            else:
+                allocations = [
+                    (statistic.traceback[0], statistic.size_diff, statistic.count_diff)
+                    for statistic in snapshot.compare_to(before, "lineno")
+                    if statistic.size_diff > 0
+                ]
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._sampling.release()
+        self._add(profile, allocations, peak)
+
+    def flush(self) -> list[str]:
+        """Write the current window, if it has samples; returns the paths."""
+        with self._lock:
+            stats, allocations, counts = (
+                self._stats,
+                self._allocations,
+                self._allocation_counts,
+            )
+            samples, peak = self._samples, self._peak
+            self._reset_window()
+        if not samples:
+            return []
+        os.makedirs(self._output_dir, exist_ok=True)
+        prefix = os.path.join(self._output_dir, time.strftime("dispatch-%Y%m%d-%H%M%S"))
+        stats.dump_stats(f"{prefix}.pstats")
+        with open(f"{prefix}-allocations.txt", "w") as report:
+            report.write(
+                f"{samples} sampled dispatches, "
+                f"average peak {peak // samples} bytes\n"
+                f"top {self._top} lines by bytes still allocated "
+                f"when the dispatch returned:\n"
+            )
+            report.writelines(
+                f"{size:>12} B {counts[line]:>8} blocks  {line}\n"
+                for line, size in allocations.most_common(self._top)
+            )
+        return [f"{prefix}.pstats", f"{prefix}-allocations.txt"]
+
+    def _add(
+        self,
+        profile: cProfile.Profile,
+        allocations: list[tuple[tracemalloc.Frame, int, int]],
+        peak: int,
+    ) -> None:
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            for frame, size, count in allocations:
+                line = f"{frame.filename}:{frame.lineno}"
+                self._allocations[line] += size
+                self._allocation_counts[line] += count
+            self._samples += 1
+            self._peak += peak
+            due = self._clock() - self._window_started >= self._window
+        if due:
+            self.flush()
+
+    def _reset_window(self) -> None:
+        self._stats: pstats.Stats | None = None
+        self._allocations: Counter[str] = Counter()
+        self._allocation_counts: Counter[str] = Counter()
+        self._samples = 0
+        self._peak = 0
+        self._window_started = self._clock()
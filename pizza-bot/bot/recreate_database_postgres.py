@@ -1,3 +0,0 @@
-from bot.infrastructure.storage_postgres import StoragePostgres
-
-StoragePostgres().recreate_database()
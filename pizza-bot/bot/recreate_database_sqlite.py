@@ -1,3 +0,0 @@
-from bot.infrastructure.storage_sqlite import StorageSqlite
-
-StorageSqlite().recreate_database()
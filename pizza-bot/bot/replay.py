@@ -0,0 +1,155 @@
+"""Re-dispatch the telegram_events log through the current handler chain.
+
+python -m bot.replay --speed max
+python -m bot.replay --speed 10x --after-id 120000 --limit 5000
+
+Events stream from Postgres (or SQLITE_DATABASE_PATH with --sqlite) in
+batches; handlers run against an in-memory scratch storage and a recording
+messenger, so nothing is written back and no message reaches Telegram.
+"""
+
+import argparse
+import time
+import traceback
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+
+from bot.admin import get_storage
+from bot.dispatcher import Dispatcher
+from bot.handlers import get_handlers
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_memory import StorageMemory
+
+# Tracebacks printed before errors are only counted.
+MAX_PRINTED_ERRORS = 10
+
+
+def parse_speed(value: str) -> float | None:
+    """None for "max" (no pacing), 1.0 for "realtime", else a factor like "10x"."""
+    if value == "max":
+        return None
+    if value == "realtime":
+        return 1.0
+    try:
+        speed = float(value.removesuffix("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid speed: {value!r}") from None
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+
+def update_time(update: dict) -> int | None:
+    """Unix time the user acted, when Telegram reported one.
+
+    Callback queries carry no date of their own; they are paced with the
+    time of the event before them.
+    """
+    for kind in ("message", "edited_message"):
+        if kind in update:
+            return update[kind].get("date")
+    return None
+
+
+def paced(
+    events: Iterable[tuple[int, dict]],
+    speed: float,
+    max_gap: float,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[tuple[int, dict]]:
+    """Delay events to their recorded spacing divided by speed.
+
+    Gaps longer than max_gap seconds (a quiet night) are shortened to it.
+    """
+    previous_time = None
+    due = clock()
+    for event_id, update in events:
+        event_time = update_time(update)
+        if event_time is not None:
+            if previous_time is not None:
+                gap = min(max(event_time - previous_time, 0), max_gap)
+                due += gap / speed
+            previous_time = event_time
+        delay = due - clock()
+        if delay > 0:
+            sleep(delay)
+        yield event_id, update
+
+
+def replay(events: Iterable[tuple[int, dict]], dispatcher: Dispatcher) -> dict:
+    replayed = 0
+    errors = 0
+    last_id = None
+    started = time.perf_counter()
+    for event_id, update in events:
+        try:
+            dispatcher.dispatch(update)
+        except Exception:
+            # Handlers may raise anything; one broken event must not stop a
+            # replay of the whole journal, so it is counted and reported.
+            errors += 1
+            if errors <= MAX_PRINTED_ERRORS:
+                print(f"event {event_id} failed:")
+                traceback.print_exc()
+        replayed += 1
+        last_id = event_id
+    elapsed = time.perf_counter() - started
+    return {
+        "replayed": replayed,
+        "errors": errors,
+        "last_id": last_id,
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(replayed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bot.replay")
+    parser.add_argument(
+        "--sqlite", action="store_true", help="read SQLite instead of Postgres"
+    )
+    parser.add_argument(
+        "--speed",
+        type=parse_speed,
+        default=None,
+        help='"realtime", a factor such as "10x", or "max" (default)',
+    )
+    parser.add_argument(
+        "--max-gap",
+        type=float,
+        default=60.0,
+        help="longest pause between events in recorded seconds",
+    )
+    parser.add_argument("--after-id", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    source = get_storage(args.sqlite)
+    # Scratch state only grows with distinct users; replayed events are dropped.
+    messenger = MessengerRecording(max_calls=0)
+    dispatcher = Dispatcher(StorageMemory(max_events=0), messenger)
+    dispatcher.add_handlers(*get_handlers())
+
+    stream = source.iter_events(args.after_id, args.batch_size)
+    events = islice(stream, args.limit)
+    if args.speed is not None:
+        events = paced(events, args.speed, args.max_gap)
+    try:
+        result = replay(events, dispatcher)
+    finally:
+        # Releases the database cursor when --limit stops the stream early.
+        stream.close()
+
+    print(
+        f"replayed {result['replayed']} events up to id {result['last_id']} "
+        f"in {result['seconds']}s ({result['updates_per_second']}/s), "
+        f"{result['errors']} errors"
+    )
+    print(f"telegram calls: {dict(messenger.counts)}")
+    print(f"dispatcher: {dispatcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Per-update tracing spans exported as OpenTelemetry JSON lines.
+
+Each exported line is an OTLP/JSON ExportTraceServiceRequest holding one
+span, the format the OpenTelemetry Collector's file exporter writes and its
+otlpjsonfile receiver reads. The current span lives in a contextvar; work
+handed to other threads must run in a copied context to nest under it.
+"""
+
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from typing import Any
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+# OTLP status codes.
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# Stands in for a span when tracing is off; yields None and can be reused.
+_NO_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = (
+        "attributes",
+        "end_time",
+        "name",
+        "parent_span_id",
+        "span_id",
+        "start_time",
+        "status_code",
+        "status_message",
+        "trace_id",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: str | None,
+        attributes: dict[str, Any],
+        start_time: int,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.start_time = start_time
+        self.end_time = start_time
+        self.attributes = attributes
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = message
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id is not None:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class JsonLinesSpanExporter:
+    """Appends finished spans to a file, one OTLP/JSON request per line."""
+
+    def __init__(self, path: str, service_name: str = "pizza-bot") -> None:
+        # One unbuffered append per span, so a crash loses no finished spans.
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        self._resource = {
+            "attributes": [
+                {"key": "service.name", "value": {"stringValue": service_name}}
+            ]
+        }
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": self._resource,
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "bot.tracing"},
+                                "spans": [span.to_otlp()],
+                            }
+                        ],
+                    }
+                ]
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        with self._lock:
+            os.write(self._fd, (line + "\n").encode("utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            os.close(self._fd)
+
+
+class Tracer:
+    def __init__(self, exporter, clock=time.time_ns) -> None:
+        self._exporter = exporter
+        self._clock = clock
+
+    @contextmanager
+    def span(self, name: str, attributes: dict | None = None) -> Iterator[Span]:
+        """Start a child of the current span, or a new trace's root span."""
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+            parent.span_id if parent else None,
+            {
+                key: value
+                for key, value in (attributes or {}).items()
+                if value is not None
+            },
+            self._clock(),
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.set_error(f"{type(error).__name__}: {error}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = self._clock()
+            self._exporter.export(span)
+
+
+def start_span(tracer: Tracer | None, name: str, attributes: dict | None = None):
+    """tracer.span(), or a context manager yielding None when tracer is None."""
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.span(name, attributes)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings.
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
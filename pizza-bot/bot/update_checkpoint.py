@@ -0,0 +1,156 @@
+import threading
+import time
+
+from bot.domain.storage import Storage
+
+
+class UpdateCheckpoint:
+    """Durable getUpdates offset and update_id dedupe for the polling loops.
+
+    pending() drops the updates of a batch that were dispatched before, and
+    complete() records update_ids once their dispatch has returned, in one
+    write per call. An update whose dispatch never finished is delivered
+    again after a restart, because the loops only advance() the offset past
+    completed updates. The offset is kept in memory and written at most once
+    per save_interval, since any completed update replayed after a crash is
+    filtered out by pending() anyway.
+    """
+
+    def __init__(
+        self, storage: Storage, save_interval: float = 5.0, clock=time.monotonic
+    ) -> None:
+        self._storage = storage
+        self._save_interval = save_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._saved_offset = 0
+        self._saved_at = clock()
+
+    def load(self) -> int:
+        offset = self._storage.load_update_offset()
+        with self._lock:
+            self._offset = self._saved_offset = offset
+        return offset
+
+    def pending(self, updates: list[dict]) -> list[dict]:
+        if not updates:
+            return []
+        processed = self._storage.processed_updates(
+            [update["update_id"] for update in updates]
+        )
+        return [update for update in updates if update["update_id"] not in processed]
+
+    def complete(self, updates: list[dict]) -> None:
+        if updates:
+            self._storage.claim_updates([update["update_id"] for update in updates])
+
+    def advance(self, offset: int) -> None:
+        with self._lock:
+            self._offset = max(self._offset, offset)
+            due = self._clock() - self._saved_at >= self._save_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            offset = self._offset
+            if offset == self._saved_offset:
+                return
+            self._saved_at = self._clock()
+        self._storage.save_update_offset(offset)
+        with self._lock:
+            self._saved_offset = max(self._saved_offset, offset)
+
+
+class InFlightUpdates:
+    """Updates of one poll loop that were handed to workers and not settled.
+
+    getUpdates confirms every update below the offset it is called with and
+    Telegram never delivers a confirmed update again, so the loop polls from
+    offset(), the oldest update still running or waiting for a retry. The
+    updates getUpdates returns again are dropped by fresh(), except failed
+    ones, which are handed back until max_attempts and then dropped. save()
+    records the completed updates and advances the checkpoint to offset().
+    """
+
+    def __init__(
+        self,
+        offset: int,
+        checkpoint: UpdateCheckpoint | None = None,
+        max_attempts: int = 3,
+    ) -> None:
+        self._checkpoint = checkpoint
+        self._max_attempts = max_attempts
+        self._changed = threading.Condition()
+        self._next_offset = offset
+        self._running: set[int] = set()
+        self._failed: set[int] = set()
+        self._attempts: dict[int, int] = {}
+        # Completed or dropped, kept until offset() moves past them.
+        self._settled: set[int] = set()
+        self._completed: list[dict] = []
+
+    def offset(self) -> int:
+        with self._changed:
+            return self._offset()
+
+    def fresh(self, updates: list[dict]) -> list[dict]:
+        """The updates to dispatch now, in update_id order."""
+        with self._changed:
+            for update in updates:
+                self._next_offset = max(self._next_offset, update["update_id"] + 1)
+            retries = [u for u in updates if u["update_id"] in self._failed]
+            unknown = [
+                u
+                for u in updates
+                if u["update_id"] not in self._running
+                and u["update_id"] not in self._failed
+                and u["update_id"] not in self._settled
+            ]
+        # Only after a restart can an unknown update have been handled already.
+        new = self._checkpoint.pending(unknown) if self._checkpoint else unknown
+        new_ids = {update["update_id"] for update in new}
+        with self._changed:
+            self._settled.update(
+                u["update_id"] for u in unknown if u["update_id"] not in new_ids
+            )
+            for update in retries + new:
+                self._failed.discard(update["update_id"])
+                self._running.add(update["update_id"])
+        return sorted(retries + new, key=lambda update: update["update_id"])
+
+    def finished(self, update: dict, ok: bool) -> None:
+        update_id = update["update_id"]
+        with self._changed:
+            self._running.discard(update_id)
+            if not ok:
+                attempts = self._attempts.get(update_id, 0) + 1
+                self._attempts[update_id] = attempts
+                if attempts < self._max_attempts:
+                    self._failed.add(update_id)
+                    self._changed.notify_all()
+                    return
+                print(f"\ndropping update {update_id} after {attempts} tries")
+            self._attempts.pop(update_id, None)
+            self._settled.add(update_id)
+            self._completed.append(update)
+            self._changed.notify_all()
+
+    def wait(self, timeout: float) -> None:
+        """Block until an update finishes, at most timeout seconds."""
+        with self._changed:
+            if self._running:
+                self._changed.wait(timeout)
+
+    def save(self) -> None:
+        with self._changed:
+            completed, self._completed = self._completed, []
+            offset = self._offset()
+            self._settled = {i for i in self._settled if i >= offset}
+        if self._checkpoint:
+            self._checkpoint.complete(completed)
+            self._checkpoint.advance(offset)
+
+    def _offset(self) -> int:
+        return min(self._running | self._failed, default=self._next_offset)
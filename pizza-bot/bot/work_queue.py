@@ -0,0 +1,109 @@
+import os
+import socket
+import threading
+import traceback
+
+from bot.dispatcher import Dispatcher
+from bot.infrastructure.postgres_pool import CONNECTION_ERRORS
+
+
+class QueueWorkerPool:
+    """Worker threads that dispatch updates claimed from the shared update_queue.
+
+    Every bot instance runs one of these against the same Postgres queue, so
+    updates are handled on whichever instance has a free worker. The queue
+    only hands out the oldest pending update of each user, which keeps one
+    user's updates in order across instances. A claim is a lease: if the
+    instance dies mid-dispatch, the update is claimed again once lease
+    seconds have passed, and dropped after max_attempts claims.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        storage,
+        workers: int = 4,
+        claim_batch: int = 10,
+        lease: float = 60.0,
+        max_attempts: int = 3,
+        idle_sleep: float = 0.2,
+        node_id: str | None = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self._dispatcher = dispatcher
+        self._storage = storage
+        self._claim_batch = claim_batch
+        self._lease = lease
+        self._max_attempts = max_attempts
+        self._idle_sleep = idle_sleep
+        self._node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._processed = [0] * workers
+        self._errors = [0] * workers
+        self._dropped = [0] * workers
+        self._stopped = threading.Event()
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(index,), name=f"queue-worker-{index}"
+            )
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def work_once(self, index: int) -> int:
+        """Claim, dispatch and complete one batch; returns how many were claimed."""
+        worker = f"{self._node_id}/{index}"
+        claimed = self._storage.claim_queued_updates(
+            worker, limit=self._claim_batch, lease=self._lease
+        )
+        for attempt, update in claimed:
+            if attempt > self._max_attempts:
+                print(
+                    f"\ndropping update {update['update_id']} after {attempt - 1} tries"
+                )
+                self._dropped[index] += 1
+            else:
+                try:
+                    self._dispatcher.dispatch(update)
+                except CONNECTION_ERRORS:
+                    # Left claimed: the lease expires and the update is retried.
+                    raise
+                except Exception:
+                    # Handlers may raise anything. A handler bug fails this
+                    # update only; it is completed below so it does not block
+                    # the user's later updates.
+                    self._errors[index] += 1
+                    print(f"\n{worker}: update {update['update_id']} failed:")
+                    traceback.print_exc()
+                self._processed[index] += 1
+            self._storage.complete_queued_update(update["update_id"], worker)
+        return len(claimed)
+
+    def shutdown(self) -> None:
+        """Stop claiming and wait for the batches in progress to finish."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "worker": index,
+                "processed": self._processed[index],
+                "errors": self._errors[index],
+                "dropped": self._dropped[index],
+            }
+            for index in range(len(self._threads))
+        ]
+
+    def _run(self, index: int) -> None:
+        while not self._stopped.is_set():
+            try:
+                claimed = self.work_once(index)
+            except CONNECTION_ERRORS as error:
+                # Postgres is unreachable; the leases expire and get retried.
+                print(f"\nqueue worker {index}: {error!r}")
+                claimed = 0
+            if not claimed:
+                self._stopped.wait(self._idle_sleep)
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+import traceback
+from collections.abc import Callable
+
+from bot.dispatcher import Dispatcher, get_telegram_id
+
+_STOP = object()
+
+
+class UserShardedWorkerPool:
+    """Dispatches updates on N worker threads, sharded by telegram_id.
+
+    All updates of one user land on the same worker queue, so they are handled
+    in order; different users are spread over the workers and run in parallel.
+    A full queue blocks submit(), which pushes back on the polling loop.
+    on_done, when given to submit(), is called from the worker with the
+    update and whether its dispatch returned without raising.
+    """
+
+    def __init__(
+        self, dispatcher: Dispatcher, workers: int = 4, queue_depth: int = 100
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self._dispatcher = dispatcher
+        self._queues: list[queue.Queue] = [
+            queue.Queue(maxsize=queue_depth) for _ in range(workers)
+        ]
+        self._busy_seconds = [0.0] * workers
+        self._processed = [0] * workers
+        self._errors = [0] * workers
+        self._started_at = time.monotonic()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(index,), name=f"worker-{index}", daemon=True
+            )
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self, update: dict, on_done: Callable[[dict, bool], None] | None = None
+    ) -> None:
+        with self._idle:
+            self._pending += 1
+        self._queues[self._shard(update)].put((update, on_done))
+
+    def wait_idle(self) -> None:
+        """Block until every submitted update has been dispatched."""
+        with self._idle:
+            while self._pending:
+                self._idle.wait()
+
+    def shutdown(self) -> None:
+        for worker_queue in self._queues:
+            worker_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> list[dict]:
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        return [
+            {
+                "worker": index,
+                "processed": self._processed[index],
+                "errors": self._errors[index],
+                "queue_size": self._queues[index].qsize(),
+                "busy_seconds": self._busy_seconds[index],
+                "utilization": self._busy_seconds[index] / elapsed,
+            }
+            for index in range(len(self._queues))
+        ]
+
+    def _shard(self, update: dict) -> int:
+        telegram_id = get_telegram_id(update)
+        key = update["update_id"] if telegram_id is None else telegram_id
+        return hash(key) % len(self._queues)
+
+    def _run(self, index: int) -> None:
+        worker_queue = self._queues[index]
+        while True:
+            item = worker_queue.get()
+            if item is _STOP:
+                return
+            update, on_done = item
+            started = time.monotonic()
+            ok = False
+            try:
+                self._dispatcher.dispatch(update)
+                ok = True
+            except Exception:
+                # Handlers may raise anything. Catching it all fails only this
+                # update; the worker lives on for the rest of its shard.
+                self._errors[index] += 1
+                print(f"\nworker {index}: update {update['update_id']} failed:")
+                traceback.print_exc()
+            finally:
+                self._busy_seconds[index] += time.monotonic() - started
+                self._processed[index] += 1
+                if on_done is not None:
+                    on_done(update, ok)
+                with self._idle:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._idle.notify_all()
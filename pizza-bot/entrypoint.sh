@@ -1,5 +1,5 @@
 #!/bin/sh
 set -e
 
-python -m bot.recreate_database_postgres
-exec python -m bot
\ No newline at end of file
+# The bot applies pending schema migrations itself on start.
+exec python -m bot
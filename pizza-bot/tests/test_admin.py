@@ -0,0 +1,27 @@
+import sqlite3
+
+import pytest
+
+import bot.admin
+
+
+@pytest.fixture
+def database_path(tmp_path, monkeypatch):
+    path = tmp_path / "pizza.db"
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(path))
+    return path
+
+
+def test_recreate_database_requires_confirmation(database_path):
+    bot.admin.main(["--sqlite", "migrate"])
+    with sqlite3.connect(database_path) as connection:
+        connection.execute("INSERT INTO users (telegram_id) VALUES (1)")
+
+    with pytest.raises(SystemExit):
+        bot.admin.main(["--sqlite", "recreate-database"])
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM users").fetchone() == (1,)
+
+    bot.admin.main(["--sqlite", "recreate-database", "--yes"])
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM users").fetchone() == (0,)
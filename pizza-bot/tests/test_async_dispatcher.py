@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+from bot.async_dispatcher import AsyncDispatcher
+from bot.dispatcher import Dispatcher
+from bot.handlers.handler import Handler, HandlerStatus
+from bot.infrastructure.storage_async import AsyncStorage
+from tests.mocks import Mock
+
+
+class SlowRecordingHandler(Handler):
+    def __init__(self) -> None:
+        self.calls: list[tuple[int, int]] = []
+        self.max_concurrent = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def can_handle(self, update, state, order_json, storage, messenger) -> bool:
+        return True
+
+    def handle(self, update, state, order_json, storage, messenger) -> HandlerStatus:
+        with self._lock:
+            self._running += 1
+            self.max_concurrent = max(self.max_concurrent, self._running)
+        time.sleep(0.05)
+        with self._lock:
+            self._running -= 1
+            self.calls.append(
+                (update["message"]["from"]["id"], update["message"]["text"])
+            )
+        return HandlerStatus.STOP
+
+
+def make_update(update_id: int, telegram_id: int, text: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {"from": {"id": telegram_id}, "chat": {"id": 1}, "text": text},
+    }
+
+
+def test_async_dispatcher_orders_per_user_and_runs_users_concurrently():
+    handler = SlowRecordingHandler()
+    dispatcher = Dispatcher(Mock({"get_user": lambda tid: None}), Mock({}))
+    dispatcher.add_handlers(handler)
+    async_dispatcher = AsyncDispatcher(dispatcher, max_workers=4)
+
+    updates = [
+        make_update(update_id, telegram_id, step)
+        for step in range(3)
+        for update_id, telegram_id in enumerate([1, 2, 3, 4], start=step * 4)
+    ]
+
+    async def run() -> None:
+        await asyncio.gather(*(async_dispatcher.dispatch(u) for u in updates))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    async_dispatcher.shutdown()
+
+    for telegram_id in [1, 2, 3, 4]:
+        steps = [step for tid, step in handler.calls if tid == telegram_id]
+        assert steps == [0, 1, 2]
+    assert handler.max_concurrent > 1
+    # 12 updates of 50ms each: serial would take 0.6s, 4 users in parallel ~0.15s.
+    assert elapsed < 0.45
+
+
+def test_async_storage_awaits_blocking_storage():
+    storage = Mock({"get_user": lambda tid: {"telegram_id": tid, "state": None}})
+
+    async def run() -> dict | None:
+        return await AsyncStorage(storage).get_user(12345)
+
+    assert asyncio.run(run()) == {"telegram_id": 12345, "state": None}
@@ -0,0 +1,228 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.dispatcher import Dispatcher
+from bot.domain.messenger import MessengerError
+from bot.domain.order_state import OrderState
+from bot.handlers.handler import Handler, HandlerStatus, Route
+from tests.mocks import Mock
+
+
+class RecordingHandler(Handler):
+    def __init__(
+        self, name: str, calls: list, routes=(), status=HandlerStatus.CONTINUE
+    ):
+        self.name = name
+        self.calls = calls
+        self.routes = tuple(routes)
+        self.status = status
+
+    def can_handle(self, update, state, order_json, storage, messenger) -> bool:
+        self.calls.append(("can_handle", self.name))
+        return True
+
+    def handle(self, update, state, order_json, storage, messenger) -> HandlerStatus:
+        self.calls.append(("handle", self.name))
+        return self.status
+
+
+def make_dispatcher(state: str | None, *handlers: Handler) -> Dispatcher:
+    storage = Mock({"get_user": lambda telegram_id: {"state": state, "order_json": {}}})
+    messenger = Mock({"answer_callback_query": lambda callback_query_id: None})
+    dispatcher = Dispatcher(storage, messenger)
+    dispatcher.add_handlers(*handlers)
+    return dispatcher
+
+
+def callback_update(data: str) -> dict:
+    return {
+        "update_id": 1,
+        "callback_query": {"id": "cb", "from": {"id": 42}, "data": data},
+    }
+
+
+def message_update(text: str) -> dict:
+    return {"update_id": 1, "message": {"from": {"id": 42}, "text": text}}
+
+
+def test_dispatcher_only_asks_matching_routes_in_registration_order():
+    calls = []
+    dispatcher = make_dispatcher(
+        OrderState.WAIT_FOR_PIZZA_SIZE.value,
+        RecordingHandler("logger", calls),
+        RecordingHandler("start", calls, [Route(kind="message", command="/start")]),
+        RecordingHandler(
+            "pizza",
+            calls,
+            [Route("callback_query", OrderState.WAIT_FOR_PIZZA_NAME, "pizza_")],
+        ),
+        RecordingHandler(
+            "size",
+            calls,
+            [Route("callback_query", OrderState.WAIT_FOR_PIZZA_SIZE, "size_")],
+            HandlerStatus.STOP,
+        ),
+        RecordingHandler("any_callback", calls, [Route(kind="callback_query")]),
+    )
+
+    dispatcher.dispatch(callback_update("size_small"))
+
+    assert calls == [
+        ("can_handle", "logger"),
+        ("handle", "logger"),
+        ("can_handle", "size"),
+        ("handle", "size"),
+    ]
+
+
+def test_dispatcher_routes_commands_and_skips_other_states():
+    calls = []
+    dispatcher = make_dispatcher(
+        None,
+        RecordingHandler("start", calls, [Route(kind="message", command="/start")]),
+        RecordingHandler(
+            "size",
+            calls,
+            [Route("callback_query", OrderState.WAIT_FOR_PIZZA_SIZE, "size_")],
+        ),
+    )
+
+    dispatcher.dispatch(message_update("/start"))
+    dispatcher.dispatch(message_update("/started"))
+    dispatcher.dispatch(callback_update("size_small"))
+
+    assert calls == [("can_handle", "start"), ("handle", "start")]
+
+
+def test_dispatcher_reads_user_only_when_a_handler_needs_it():
+    reads = []
+
+    def get_user(telegram_id):
+        reads.append(telegram_id)
+        return {"state": OrderState.WAIT_FOR_PIZZA_SIZE.value, "order_json": "{}"}
+
+    class StartHandler(RecordingHandler):
+        needs_user = False
+
+    calls = []
+    dispatcher = Dispatcher(
+        Mock({"get_user": get_user}),
+        Mock({"answer_callback_query": lambda callback_query_id: None}),
+    )
+    dispatcher.add_handlers(
+        StartHandler(
+            "start",
+            calls,
+            [Route(kind="message", command="/start")],
+            HandlerStatus.STOP,
+        ),
+        RecordingHandler(
+            "size",
+            calls,
+            [Route("callback_query", OrderState.WAIT_FOR_PIZZA_SIZE, "size_")],
+        ),
+    )
+
+    dispatcher.dispatch(message_update("/start"))
+    dispatcher.dispatch({"update_id": 2, "edited_message": {"from": {"id": 42}}})
+    assert reads == []
+
+    dispatcher.dispatch(callback_update("size_small"))
+    assert reads == [42]
+    assert dispatcher.stats() == {
+        "dispatched": 3,
+        "user_reads": 1,
+        "user_reads_avoided": 1,
+        "side_effect_errors": 0,
+    }
+
+
+def test_dispatcher_answers_callback_before_handlers_run():
+    calls = []
+
+    def answer_callback_query(callback_query_id: str) -> None:
+        calls.append(("answer_callback_query", callback_query_id))
+
+    dispatcher = Dispatcher(
+        Mock({"get_user": lambda telegram_id: None}),
+        Mock({"answer_callback_query": answer_callback_query}),
+    )
+    dispatcher.add_handlers(RecordingHandler("any_callback", calls))
+
+    update = callback_update("size_small")
+    update["callback_query"]["id"] = "cb-1"
+    dispatcher.dispatch(update)
+
+    assert calls == [
+        ("answer_callback_query", "cb-1"),
+        ("can_handle", "any_callback"),
+        ("handle", "any_callback"),
+    ]
+
+
+def test_dispatcher_reports_background_side_effect_errors():
+    class DeletingHandler(RecordingHandler):
+        def handle(self, update, state, order_json, storage, messenger):
+            messenger.delete_message(chat_id=42, message_id=10)
+            messenger.send_message(chat_id=42, text="next step")
+            return HandlerStatus.STOP
+
+    sent = []
+
+    def delete_message(chat_id: int, message_id: int) -> None:
+        raise RuntimeError("message to delete not found")
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    dispatcher = Dispatcher(
+        Mock({"get_user": lambda telegram_id: None}),
+        Mock(
+            {
+                "answer_callback_query": lambda callback_query_id: None,
+                "delete_message": delete_message,
+                "send_message": lambda chat_id, text: sent.append(text),
+            }
+        ),
+        side_effects=executor,
+    )
+    dispatcher.add_handlers(DeletingHandler("deleting", []))
+
+    dispatcher.dispatch(callback_update("size_small"))
+    executor.shutdown()
+
+    assert sent == ["next step"]
+    assert dispatcher.stats()["side_effect_errors"] == 1
+
+
+def test_dispatcher_passes_over_refused_background_side_effects(capsys):
+    class DeletingHandler(RecordingHandler):
+        def handle(self, update, state, order_json, storage, messenger):
+            assert messenger.delete_message(chat_id=42, message_id=10) == {}
+            messenger.send_message(chat_id=42, text="next step")
+            return HandlerStatus.STOP
+
+    sent = []
+
+    def delete_message(chat_id: int, message_id: int) -> dict:
+        raise MessengerError(
+            "deleteMessage", 400, "Bad Request: message to delete not found"
+        )
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    dispatcher = Dispatcher(
+        Mock({"get_user": lambda telegram_id: None}),
+        Mock(
+            {
+                "answer_callback_query": lambda callback_query_id: True,
+                "delete_message": delete_message,
+                "send_message": lambda chat_id, text: sent.append(text),
+            }
+        ),
+        side_effects=executor,
+    )
+    dispatcher.add_handlers(DeletingHandler("deleting", []))
+
+    dispatcher.dispatch(callback_update("size_small"))
+    executor.shutdown()
+
+    assert sent == ["next step"]
+    assert dispatcher.stats()["side_effect_errors"] == 0
+    assert "Traceback" not in capsys.readouterr().err
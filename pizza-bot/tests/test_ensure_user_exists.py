@@ -44,3 +44,35 @@ def test_ensure_user_exists_handler():
     dispatcher.dispatch(test_update)
 
     assert ensure_user_exists_called
+
+
+def test_ensure_user_exists_skips_known_users():
+    def make_update(telegram_id: int) -> dict:
+        return {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "from": {"id": telegram_id},
+                "chat": {"id": telegram_id, "type": "private"},
+                "text": "Hello",
+            },
+        }
+
+    ensured = []
+
+    mock_storage = Mock(
+        {
+            "ensure_user_exists": ensured.append,
+            "get_user": lambda telegram_id: None,
+        }
+    )
+
+    dispatcher = Dispatcher(mock_storage, Mock({}))
+    dispatcher.add_handlers(EnsureUserExists(known_users_capacity=2))
+
+    for telegram_id in [1, 1, 2, 1, 3, 2, 1]:
+        dispatcher.dispatch(make_update(telegram_id))
+
+    # Only two ids are remembered: 3 pushes out 2 (1 was seen more recently),
+    # then 2 pushes out 1.
+    assert ensured == [1, 2, 3, 2, 1]
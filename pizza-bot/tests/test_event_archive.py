@@ -0,0 +1,178 @@
+import gzip
+import json
+import os
+import sqlite3
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from bot.event_archive import EventMaintenance, archive_expired_events
+from bot.infrastructure.storage_postgres import StoragePostgres
+from bot.infrastructure.storage_sqlite import StorageSqlite
+from tests.mocks import Mock
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+def database_path(tmp_path, monkeypatch):
+    path = tmp_path / "pizza.db"
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def storage(database_path):
+    storage = StorageSqlite()
+    storage.recreate_database()
+    return storage
+
+
+def persist_received(storage, database_path, update_ids, received_at: str) -> None:
+    storage.persist_updates([{"update_id": update_id} for update_id in update_ids])
+    with sqlite3.connect(database_path) as connection:
+        connection.executemany(
+            "UPDATE telegram_events SET received_at = ?"
+            " WHERE json_extract(payload, '$.update_id') = ?",
+            [(received_at, update_id) for update_id in update_ids],
+        )
+
+
+def test_sqlite_rolls_events_over_once_a_day(storage, database_path):
+    persist_received(storage, database_path, [1, 2], "2026-10-16 09:00:00")
+    storage.rotate_events(NOW)
+    persist_received(storage, database_path, [3], "2026-10-17 09:00:00")
+    storage.rotate_events(NOW)
+    persist_received(storage, database_path, [4], "2026-10-18 09:00:00")
+    storage.rotate_events(NOW)
+    storage.persist_updates([{"update_id": 5}])
+
+    with sqlite3.connect(database_path) as connection:
+        tables = [
+            row[0]
+            for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE name GLOB 'telegram_events*'"
+                " ORDER BY name"
+            )
+        ]
+    assert tables == [
+        "telegram_events",
+        "telegram_events_r000000000001",
+        "telegram_events_r000000000003",
+    ]
+    assert [(i, update["update_id"]) for i, update in storage.iter_events(1)] == [
+        (2, 2),
+        (3, 3),
+        (4, 4),
+        (5, 5),
+    ]
+
+
+def test_expired_tables_are_archived_then_dropped(storage, database_path, tmp_path):
+    persist_received(storage, database_path, [1, 2], "2026-10-10 09:00:00")
+    storage.rotate_events(NOW - timedelta(days=7))
+    persist_received(storage, database_path, [3], "2026-10-17 09:00:00")
+    storage.rotate_events(NOW)
+
+    archived = archive_expired_events(
+        storage, str(tmp_path / "archive"), timedelta(days=3), now=NOW
+    )
+
+    path = str(tmp_path / "archive" / "telegram_events_r000000000001.ndjson.gz")
+    assert archived == [(path, 2)]
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        lines = [json.loads(line) for line in archive]
+    assert lines == [
+        {
+            "id": 1,
+            "received_at": "2026-10-10T09:00:00+00:00",
+            "update": {"update_id": 1},
+        },
+        {
+            "id": 2,
+            "received_at": "2026-10-10T09:00:00+00:00",
+            "update": {"update_id": 2},
+        },
+    ]
+    assert not os.path.exists(f"{path}.partial")
+    assert [update["update_id"] for _, update in storage.iter_events()] == [3]
+    assert storage.expired_event_partitions(NOW) == ["telegram_events_r000000000003"]
+
+
+def test_only_rolled_tables_can_be_dropped(storage):
+    with pytest.raises(ValueError):
+        storage.drop_event_partition("users")
+
+
+@pytest.mark.skipif(
+    not os.getenv("POSTGRES_TEST_DATABASE"),
+    reason="set POSTGRES_TEST_DATABASE to run against a local Postgres",
+)
+def test_postgres_day_partitions_are_archived_then_dropped(monkeypatch, tmp_path):
+    monkeypatch.setenv("POSTGRES_DATABASE", os.environ["POSTGRES_TEST_DATABASE"])
+    storage = StoragePostgres()
+    try:
+        storage.recreate_database()
+        storage.persist_updates([{"update_id": 1}, {"update_id": 2}])
+        today = datetime.now(UTC)
+        partition = f"telegram_events_p{today:%Y%m%d}"
+
+        assert storage.expired_event_partitions(today) == []
+        archived = archive_expired_events(
+            storage, str(tmp_path), timedelta(days=1), now=today + timedelta(days=2)
+        )
+
+        assert archived == [(str(tmp_path / f"{partition}.ndjson.gz"), 2)]
+        assert list(storage.iter_events()) == []
+        tomorrow = f"telegram_events_p{today + timedelta(days=1):%Y%m%d}"
+        assert storage.expired_event_partitions(today + timedelta(days=2)) == [tomorrow]
+    finally:
+        storage.close()
+
+
+@pytest.mark.skipif(
+    not os.getenv("POSTGRES_TEST_DATABASE"),
+    reason="set POSTGRES_TEST_DATABASE to run against a local Postgres",
+)
+def test_postgres_rows_without_a_day_partition_get_one_on_rotation(monkeypatch):
+    monkeypatch.setenv("POSTGRES_DATABASE", os.environ["POSTGRES_TEST_DATABASE"])
+    storage = StoragePostgres()
+    try:
+        storage.recreate_database()
+        old = datetime.now(UTC) - timedelta(days=30)
+        with storage._get_connection() as connection:
+            with connection.cursor() as cursor:
+                # No partition covers that day, so the row lands in the default.
+                cursor.execute(
+                    "INSERT INTO telegram_events (payload, received_at)"
+                    " VALUES (%s, %s)",
+                    ('{"update_id":1}', old),
+                )
+            connection.commit()
+
+        storage.rotate_events()
+
+        partition = f"telegram_events_p{old:%Y%m%d}"
+        assert storage.expired_event_partitions(old + timedelta(days=1)) == [partition]
+        assert [event for _, _, event in storage.iter_partition_events(partition)] == [
+            {"update_id": 1}
+        ]
+    finally:
+        storage.close()
+
+
+def test_maintenance_round_runs_only_while_holding_the_lock():
+    rotations = []
+    storage = Mock({"rotate_events": lambda: rotations.append(True)})
+    held = [False, True]
+    released = []
+    lock = Mock(
+        {"try_acquire": lambda: held.pop(0), "release": lambda: released.append(True)}
+    )
+
+    maintenance = EventMaintenance(storage, "archive", interval=3600, lock=lock)
+    maintenance.close()
+    assert rotations == [] and released == []
+
+    assert maintenance.run_once() == []
+    assert rotations == [True] and released == [True]
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from bot.event_buffer import EventBuffer
+from tests.mocks import Mock
+
+
+def test_event_buffer_flushes_on_batch_size():
+    batches = []
+    flushed = threading.Event()
+
+    def persist_updates(updates: list) -> None:
+        batches.append(updates)
+        flushed.set()
+
+    buffer = EventBuffer(
+        Mock({"persist_updates": persist_updates}), batch_size=3, flush_interval=60
+    )
+    for update_id in range(3):
+        buffer.append({"update_id": update_id})
+
+    assert flushed.wait(5)
+    buffer.close()
+
+    assert batches == [[{"update_id": 0}, {"update_id": 1}, {"update_id": 2}]]
+
+
+def test_event_buffer_flushes_on_interval_and_close():
+    batches = []
+    buffer = EventBuffer(
+        Mock({"persist_updates": batches.append}), batch_size=100, flush_interval=0.05
+    )
+
+    buffer.append({"update_id": 1})
+    time.sleep(0.3)
+    buffer.append({"update_id": 2})
+    buffer.close()
+
+    assert batches == [[{"update_id": 1}], [{"update_id": 2}]]
+    assert buffer.stats()["flushed"] == 2
+
+
+def test_event_buffer_append_does_not_wait_for_storage():
+    entered = threading.Event()
+    release = threading.Event()
+    batches = []
+
+    def persist_updates(updates: list) -> None:
+        entered.set()
+        release.wait(5)
+        batches.append(updates)
+
+    buffer = EventBuffer(
+        Mock({"persist_updates": persist_updates}),
+        capacity=2,
+        batch_size=1,
+        flush_interval=60,
+    )
+    buffer.append({"update_id": 1})
+    assert entered.wait(5)
+
+    started = time.perf_counter()
+    for update_id in range(2, 6):
+        buffer.append({"update_id": update_id})
+    assert time.perf_counter() - started < 0.1
+
+    release.set()
+    buffer.close()
+
+    assert buffer.stats()["dropped"] == 2
+    assert [batch[0]["update_id"] for batch in batches] == [1, 4, 5]
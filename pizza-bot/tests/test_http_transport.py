@@ -0,0 +1,116 @@
+import http.client
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bot.infrastructure.http_transport import HttpTransport
+from bot.infrastructure.messenger_telegram import MessengerTelegram
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self) -> None:
+        length = int(self.headers["Content-Length"])
+        request = json.loads(self.rfile.read(length))
+        self.server.requests += 1
+        if self.server.drop_next_reply:
+            # The request was handled, but the reply is lost on the way back.
+            self.server.drop_next_reply = False
+            self.close_connection = True
+            return
+        body = json.dumps(
+            {"ok": True, "result": {"path": self.path, "request": request}}
+        ).encode("utf-8")
+        close = self.server.close_after_response
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if close:
+            self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegramHandler)
+    httpd.connections = 0
+    httpd.close_after_response = False
+    httpd.drop_next_reply = False
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_transport_reuses_connection(server):
+    transport = HttpTransport()
+    url = f"http://127.0.0.1:{server.server_port}/bot123/sendMessage"
+
+    for i in range(5):
+        status, body = transport.post(url, json.dumps({"i": i}).encode("utf-8"))
+        assert status == 200
+        assert json.loads(body)["result"]["request"] == {"i": i}
+
+    assert transport.connections_opened == 1
+    assert server.connections == 1
+    transport.close()
+
+
+def test_transport_reconnects_on_stale_socket(server):
+    transport = HttpTransport()
+    url = f"http://127.0.0.1:{server.server_port}/bot123/sendMessage"
+
+    server.close_after_response = True
+    transport.post(url, b"{}")
+    server.close_after_response = False
+    # The server closed the socket but did not say so in the response headers,
+    # so the transport still holds it and finds out on the next request.
+    status, _ = transport.post(url, b"{}", idempotent=True)
+
+    assert status == 200
+    assert transport.connections_opened == 2
+    transport.close()
+
+
+def test_transport_resends_after_lost_reply_only_when_idempotent(server):
+    transport = HttpTransport()
+    url = f"http://127.0.0.1:{server.server_port}/bot123/getUpdates"
+    transport.post(url, b"{}")
+
+    server.drop_next_reply = True
+    status, _ = transport.post(url, b"{}", idempotent=True)
+    assert status == 200
+    assert server.requests == 3
+
+    server.drop_next_reply = True
+    with pytest.raises(http.client.RemoteDisconnected):
+        transport.post(url, b"{}")
+    # A sendMessage whose reply was lost may have been delivered already.
+    assert server.requests == 4
+    transport.close()
+
+
+def test_messenger_telegram_uses_transport(server, monkeypatch):
+    monkeypatch.setenv("TELEGRAM_TOKEN", "123")
+    messenger = MessengerTelegram(base_uri=f"http://127.0.0.1:{server.server_port}")
+
+    result = messenger.send_message(chat_id=1, text="hi")
+    messenger.delete_message(chat_id=1, message_id=2)
+
+    assert result["path"] == "/bot123/sendMessage"
+    assert result["request"] == {"chat_id": 1, "text": "hi"}
+    assert server.connections == 1
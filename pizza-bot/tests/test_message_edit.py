@@ -0,0 +1,55 @@
+from bot.domain.messenger import MessengerError
+from bot.handlers.message_edit import replace_message
+from tests.mocks import Mock
+
+
+def test_replace_message_edits_in_place():
+    calls = []
+    messenger = Mock(
+        {
+            "edit_message_text": lambda **kwargs: calls.append(("edit", kwargs)),
+        }
+    )
+
+    replace_message(messenger, chat_id=1, message_id=10, text="next", parse_mode="HTML")
+
+    assert calls == [
+        (
+            "edit",
+            {"chat_id": 1, "message_id": 10, "text": "next", "parse_mode": "HTML"},
+        )
+    ]
+
+
+def test_replace_message_falls_back_to_delete_and_send():
+    calls = []
+
+    def edit_message_text(**kwargs) -> dict:
+        raise MessengerError(
+            "editMessageText", 400, "Bad Request: message can't be edited"
+        )
+
+    def delete_message(chat_id: int, message_id: int) -> dict:
+        calls.append(("delete", chat_id, message_id))
+        raise MessengerError(
+            "deleteMessage", 400, "Bad Request: message can't be deleted"
+        )
+
+    def send_message(chat_id: int, text: str, **kwargs) -> dict:
+        calls.append(("send", chat_id, text, kwargs))
+        return {}
+
+    messenger = Mock(
+        {
+            "edit_message_text": edit_message_text,
+            "delete_message": delete_message,
+            "send_message": send_message,
+        }
+    )
+
+    replace_message(messenger, chat_id=1, message_id=10, text="next", reply_markup={})
+
+    assert calls == [
+        ("delete", 1, 10),
+        ("send", 1, "next", {"reply_markup": {}}),
+    ]
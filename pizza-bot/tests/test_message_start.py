@@ -26,21 +26,21 @@ def test_message_start_handler():
         },
     }
 
-    clear_user_data_called = False
-    update_user_state_called = False
-
-    def clear_user_state_order(telegram_id: int) -> None:
-        assert telegram_id == 12345
-
-        nonlocal clear_user_data_called
-        clear_user_data_called = True
-
-    def update_user_state(telegram_id: int, state: str) -> None:
+    transition_called = False
+
+    def transition(
+        telegram_id: int,
+        state: str,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
         assert telegram_id == 12345
         assert state == "WAIT_FOR_PIZZA_NAME"
+        assert order_patch is None
+        assert reset
 
-        nonlocal update_user_state_called
-        update_user_state_called = True
+        nonlocal transition_called
+        transition_called = True
 
     def get_user(telegram_id: int) -> dict | None:
         assert telegram_id == 12345
@@ -55,8 +55,7 @@ def test_message_start_handler():
 
     mock_storage = Mock(
         {
-            "clear_user_state_order": clear_user_state_order,
-            "update_user_state": update_user_state,
+            "transition": transition,
             "get_user": get_user,
         }
     )
@@ -67,8 +66,7 @@ def test_message_start_handler():
 
     dispatcher.dispatch(test_update)
 
-    assert clear_user_data_called
-    assert update_user_state_called
+    assert transition_called
 
     assert len(send_message_calls) == 2
     assert send_message_calls[0]["text"] == "🍕 Welcome to Pizza shop!😋"
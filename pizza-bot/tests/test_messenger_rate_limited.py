@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import defaultdict, deque
+
+import pytest
+
+from bot.domain.messenger import Messenger, MessengerError
+from bot.infrastructure.messenger_rate_limited import RateLimitedMessenger
+
+
+class FakeTelegram(Messenger):
+    """Answers 429 like Telegram once a sliding one-second window is full."""
+
+    def __init__(self, global_limit: int, chat_limit: int) -> None:
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.calls: list[tuple] = []
+        self.rejected = 0
+        self._global: deque[float] = deque()
+        self._chats: dict[int, deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _accept(self, method: str, chat_id: int | None, *args) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            windows = [self._global]
+            if method == "sendMessage":
+                windows.append(self._chats[chat_id])
+            for window in windows:
+                while window and window[0] <= now - 1.0:
+                    window.popleft()
+            limits = [self.global_limit, self.chat_limit]
+            for window, limit in zip(windows, limits, strict=False):
+                if len(window) >= limit:
+                    self.rejected += 1
+                    retry_after = window[0] + 1.0 - now
+                    raise MessengerError(method, 429, "Too Many Requests", retry_after)
+            for window in windows:
+                window.append(now)
+            self.calls.append((method, chat_id, *args))
+        return {"ok": True}
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+        return self._accept("sendMessage", chat_id, text)
+
+    def get_updates(self, **kwargs) -> dict:
+        return []
+
+    def answer_callback_query(self, callback_query_id: str, **kwargs) -> dict:
+        return self._accept("answerCallbackQuery", None, callback_query_id)
+
+    def delete_message(self, chat_id: int, message_id: int) -> dict:
+        return self._accept("deleteMessage", chat_id, message_id)
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, **kwargs
+    ) -> dict:
+        return self._accept("editMessageText", chat_id, message_id, text)
+
+    def edit_message_reply_markup(
+        self, chat_id: int, message_id: int, **kwargs
+    ) -> dict:
+        return self._accept("editMessageReplyMarkup", chat_id, message_id)
+
+
+def test_rate_limiter_stays_under_limits_with_10k_queued_messages():
+    # Telegram's 30/s and 1/s scaled up so the test runs in about two seconds.
+    telegram = FakeTelegram(global_limit=5500, chat_limit=220)
+    messenger = RateLimitedMessenger(
+        telegram,
+        global_rate=5000,
+        global_burst=100,
+        chat_rate=200,
+        chat_burst=10,
+        senders=8,
+    )
+
+    futures = [
+        messenger.submit("send_message", chat_id, f"message {index}")
+        for index in range(200)
+        for chat_id in range(50)
+    ]
+    for future in futures:
+        future.result(timeout=30)
+    stats = messenger.stats()
+    messenger.close()
+
+    assert telegram.rejected == 0
+    assert stats["sent"] == 10000
+    assert stats["throttled"] == 0
+    assert stats["max_queued"] >= 1000
+    assert stats["max_wait"] >= 1.5
+    for chat_id in (0, 49):
+        texts = [call[2] for call in telegram.calls if call[1] == chat_id]
+        assert texts == [f"message {index}" for index in range(200)]
+
+
+def test_rate_limiter_answers_callbacks_before_queued_messages():
+    telegram = FakeTelegram(global_limit=1000, chat_limit=1000)
+    messenger = RateLimitedMessenger(
+        telegram, global_rate=5, global_burst=1, chat_rate=100, senders=1
+    )
+
+    # m0 spends the only global token; the rest wait 200 ms for the next one.
+    messenger.send_message(1, "m0")
+    futures = [messenger.submit("send_message", 1, f"m{i}") for i in range(1, 4)]
+    futures.append(messenger.submit("answer_callback_query", "callback"))
+    for future in futures:
+        future.result(timeout=5)
+    messenger.close()
+
+    assert [call[0] for call in telegram.calls] == [
+        "sendMessage",
+        "answerCallbackQuery",
+        "sendMessage",
+        "sendMessage",
+        "sendMessage",
+    ]
+
+
+def test_rate_limiter_retries_after_429_and_keeps_chat_order():
+    telegram = FakeTelegram(global_limit=1000, chat_limit=2)
+    messenger = RateLimitedMessenger(telegram, chat_rate=100, chat_burst=5)
+
+    messenger.delete_message(7, 1)
+    futures = [messenger.submit("send_message", 7, f"m{i}") for i in range(3)]
+    assert [future.result(timeout=5) for future in futures] == [{"ok": True}] * 3
+    stats = messenger.stats()
+    messenger.close()
+
+    assert telegram.rejected == 1
+    assert stats["throttled"] == 1
+    assert telegram.calls == [
+        ("deleteMessage", 7, 1),
+        ("sendMessage", 7, "m0"),
+        ("sendMessage", 7, "m1"),
+        ("sendMessage", 7, "m2"),
+    ]
+
+
+def test_rate_limiter_pauses_every_chat_after_a_429():
+    class Flooded(FakeTelegram):
+        throttled_at = None
+
+        def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+            if self.throttled_at is None:
+                self.throttled_at = time.monotonic()
+                raise MessengerError("sendMessage", 429, "Too Many Requests", 0.3)
+            self.calls.append((chat_id, time.monotonic()))
+            return {"ok": True}
+
+    telegram = Flooded(global_limit=1000, chat_limit=1000)
+    messenger = RateLimitedMessenger(telegram, chat_rate=100, chat_burst=5)
+
+    first = messenger.submit("send_message", 7, "m0")
+    time.sleep(0.05)
+    other_chat = messenger.submit("send_message", 8, "m1")
+    first.result(timeout=5)
+    other_chat.result(timeout=5)
+    messenger.close()
+
+    sent_at = dict(telegram.calls)
+    assert sent_at[8] - telegram.throttled_at >= 0.3
+
+
+def test_rate_limiter_reports_errors_to_the_caller():
+    class Broken(FakeTelegram):
+        def send_message(self, chat_id: int, text: str, **kwargs) -> dict:
+            raise MessengerError("sendMessage", 400, "Bad Request: chat not found")
+
+    messenger = RateLimitedMessenger(Broken(global_limit=10, chat_limit=10))
+    with pytest.raises(MessengerError) as error:
+        messenger.send_message(1, "hello")
+    stats = messenger.stats()
+    messenger.close()
+
+    assert error.value.error_code == 400
+    assert stats["failed"] == 1
@@ -0,0 +1,117 @@
+import urllib.request
+
+import pytest
+
+from bot.dispatcher import Dispatcher
+from bot.domain.messenger import MessengerError
+from bot.handlers import get_handlers
+from bot.infrastructure.messenger_instrumented import InstrumentedMessenger
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_instrumented import InstrumentedStorage
+from bot.infrastructure.storage_memory import StorageMemory
+from bot.long_polling import _observe_batch
+from bot.metrics import Counter, Histogram, Metrics, serve_metrics
+from tests.mocks import Mock
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("method",), (0.1, 1.0))
+    histogram.observe(0.05, "get_user")
+    histogram.observe(0.5, "get_user")
+    histogram.observe(3.0, "get_user")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{method="get_user",le="0.1"} 1',
+        'latency_seconds_bucket{method="get_user",le="1"} 2',
+        'latency_seconds_bucket{method="get_user",le="+Inf"} 3',
+        'latency_seconds_sum{method="get_user"} 3.55',
+        'latency_seconds_count{method="get_user"} 3',
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("events_total", "Events.", ("kind",))
+    counter.inc('say "hi"')
+    counter.inc('say "hi"', amount=2)
+
+    assert counter.render()[-1] == 'events_total{kind="say \\"hi\\""} 3'
+
+
+def test_dispatch_records_handler_storage_and_telegram_metrics():
+    metrics = Metrics()
+    storage = InstrumentedStorage(StorageMemory(), metrics)
+    messenger = InstrumentedMessenger(MessengerRecording(), metrics)
+    dispatcher = Dispatcher(storage, messenger, metrics=metrics)
+    dispatcher.add_handlers(*get_handlers())
+
+    dispatcher.dispatch(
+        {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "from": {"id": 7},
+                "chat": {"id": 7},
+                "date": 0,
+                "text": "/start",
+            },
+        }
+    )
+
+    assert metrics.updates.value("message") == 1
+    assert metrics.dispatch_seconds.count() == 1
+    assert metrics.handler_seconds.count("MessageStart") == 1
+    assert metrics.handler_seconds.count("EnsureUserExists") == 1
+    assert metrics.storage_seconds.count("ensure_user_exists") == 1
+    assert metrics.storage_seconds.count("transition") == 1
+    assert metrics.telegram_seconds.count("send_message", "ok") == 2
+
+
+def test_instrumented_messenger_labels_failures_with_error_code():
+    def edit_message_text(chat_id, message_id, text, **kwargs):
+        raise MessengerError("editMessageText", 400, "message is not modified")
+
+    metrics = Metrics()
+    messenger = InstrumentedMessenger(
+        Mock({"edit_message_text": edit_message_text}), metrics
+    )
+
+    with pytest.raises(MessengerError):
+        messenger.edit_message_text(1, 2, "text")
+
+    assert metrics.telegram_seconds.count("edit_message_text", "400") == 1
+
+
+def test_poll_batches_record_size_and_lag_of_dated_messages():
+    metrics = Metrics()
+
+    _observe_batch(
+        metrics,
+        [
+            {"update_id": 1, "message": {"date": 0}},
+            {"update_id": 2, "callback_query": {"id": "1"}},
+        ],
+    )
+    _observe_batch(metrics, [])
+
+    assert metrics.batch_updates.count() == 2
+    assert metrics.poll_lag_seconds.count() == 1
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    metrics = Metrics()
+    metrics.updates.inc("message")
+    server = serve_metrics(metrics, port=0)
+    try:
+        host, port = server.server_address[:2]
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'pizza_bot_updates_total{kind="message"} 1' in body
+    assert "# TYPE pizza_bot_handler_seconds histogram" in body
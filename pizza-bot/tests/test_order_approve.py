@@ -18,37 +18,40 @@ def test_order_approve_handler():
         },
     }
 
-    update_user_state_called = False
-    send_message_calls = []
-
-    def update_user_state(telegram_id: int, state: str) -> None:
+    transition_called = False
+    edit_message_calls = []
+
+    def transition(
+        telegram_id: int,
+        state: str,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
         assert telegram_id == 12345
         assert state == "ORDER_FINISHED"
-        nonlocal update_user_state_called
-        update_user_state_called = True
+        assert order_patch is None
+        assert not reset
+        nonlocal transition_called
+        transition_called = True
 
-    def send_message(chat_id: int, text: str, **kwargs) -> dict:
+    def edit_message_text(chat_id: int, message_id: int, text: str, **kwargs) -> dict:
         assert chat_id == 12345
+        assert message_id == 10
         assert "Order Confirmed!" in text
         assert "Pepperoni" in text
         assert "Medium" in text
         assert "Coca-Cola" in text
         assert "Thank you for your order" in text
         assert "Send /start to place another order" in text
-        send_message_calls.append({"text": text, "kwargs": kwargs})
+        edit_message_calls.append({"text": text, "kwargs": kwargs})
         return {"ok": True}
 
     def answer_callback_query(callback_query_id: str) -> None:
         assert callback_query_id == "123"
 
-    def delete_message(chat_id: int, message_id: int) -> None:
-        assert chat_id == 12345
-        assert message_id == 10
-
     mock_storage = Mock(
         {
-            "update_user_state": update_user_state,
-            "clear_user_order_json": lambda tid: None,  # Not called in approve flow
+            "transition": transition,
             "get_user": lambda tid: {
                 "state": "WAIT_FOR_ORDER_APPROVE",
                 "order_json": '{"pizza_name": "Pepperoni", "pizza_size": "Medium", "drink": "Coca-Cola"}',
@@ -57,9 +60,8 @@ def test_order_approve_handler():
     )
     mock_messenger = Mock(
         {
-            "send_message": send_message,
+            "edit_message_text": edit_message_text,
             "answer_callback_query": answer_callback_query,
-            "delete_message": delete_message,
         }
     )
 
@@ -68,10 +70,10 @@ def test_order_approve_handler():
 
     dispatcher.dispatch(test_update)
 
-    assert update_user_state_called
-    assert len(send_message_calls) == 1
-    assert "parse_mode" in send_message_calls[0]["kwargs"]
-    assert send_message_calls[0]["kwargs"]["parse_mode"] == "Markdown"
+    assert transition_called
+    assert len(edit_message_calls) == 1
+    assert "parse_mode" in edit_message_calls[0]["kwargs"]
+    assert edit_message_calls[0]["kwargs"]["parse_mode"] == "Markdown"
 
 
 def test_order_approve_handler_restart():
@@ -89,39 +91,36 @@ def test_order_approve_handler_restart():
         },
     }
 
-    update_user_state_called = False
-    clear_user_order_json_called = False
-    send_message_calls = []
+    transition_called = False
+    edit_message_calls = []
 
-    def update_user_state(telegram_id: int, state: str) -> None:
+    def transition(
+        telegram_id: int,
+        state: str,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
         assert telegram_id == 12345
         assert state == "WAIT_FOR_PIZZA_NAME"
-        nonlocal update_user_state_called
-        update_user_state_called = True
+        assert order_patch is None
+        assert reset
+        nonlocal transition_called
+        transition_called = True
 
-    def clear_user_state_order(telegram_id: int) -> None:
-        assert telegram_id == 12345
-        nonlocal clear_user_order_json_called
-        clear_user_order_json_called = True
-
-    def send_message(chat_id: int, text: str, **kwargs) -> dict:
+    def edit_message_text(chat_id: int, message_id: int, text: str, **kwargs) -> dict:
         assert chat_id == 12345
+        assert message_id == 10
         assert "Please choose pizza type" in text
         assert "reply_markup" in kwargs
-        send_message_calls.append({"text": text, "kwargs": kwargs})
+        edit_message_calls.append({"text": text, "kwargs": kwargs})
         return {"ok": True}
 
     def answer_callback_query(callback_query_id: str) -> None:
         assert callback_query_id == "123"
 
-    def delete_message(chat_id: int, message_id: int) -> None:
-        assert chat_id == 12345
-        assert message_id == 10
-
     mock_storage = Mock(
         {
-            "update_user_state": update_user_state,
-            "clear_user_state_order": clear_user_state_order,
+            "transition": transition,
             "get_user": lambda tid: {
                 "state": "WAIT_FOR_ORDER_APPROVE",
                 "order_json": '{"pizza_name": "Pepperoni", "pizza_size": "Medium", "drink": "Coca-Cola"}',
@@ -130,9 +129,8 @@ def test_order_approve_handler_restart():
     )
     mock_messenger = Mock(
         {
-            "send_message": send_message,
+            "edit_message_text": edit_message_text,
             "answer_callback_query": answer_callback_query,
-            "delete_message": delete_message,
         }
     )
 
@@ -141,7 +139,6 @@ def test_order_approve_handler_restart():
 
     dispatcher.dispatch(test_update)
 
-    assert update_user_state_called
-    assert clear_user_order_json_called
-    assert len(send_message_calls) == 1
-    assert "reply_markup" in send_message_calls[0]["kwargs"]
+    assert transition_called
+    assert len(edit_message_calls) == 1
+    assert "reply_markup" in edit_message_calls[0]["kwargs"]
@@ -0,0 +1,29 @@
+import json
+
+from bot.domain.messenger import PreEncodedJson
+from bot.infrastructure.json_codec import encode_request_body
+from bot.keyboards.order_keyboards import drinks_keyboard
+
+
+def test_keyboards_are_encoded_once():
+    keyboard = drinks_keyboard()
+
+    assert drinks_keyboard() is keyboard
+    assert keyboard == PreEncodedJson(keyboard.value)
+
+
+def test_request_body_splices_pre_encoded_keyboard():
+    body = encode_request_body(
+        {
+            "chat_id": 12345,
+            "text": "Выберите напиток",
+            "reply_markup": drinks_keyboard(),
+        }
+    )
+
+    assert drinks_keyboard().encoded in body
+    assert json.loads(body) == {
+        "chat_id": 12345,
+        "text": "Выберите напиток",
+        "reply_markup": drinks_keyboard().value,
+    }
@@ -17,46 +17,41 @@ def test_pizza_selection_handler():
         },
     }
 
-    update_user_order_json_called = False
-    update_user_state_called = False
-    send_message_calls = []
+    transition_called = False
+    edit_message_calls = []
 
-    def update_user_order(telegram_id: int, data: dict) -> None:
-        assert telegram_id == 12345
-        assert data == {"pizza_name": "Pepperoni"}
-        nonlocal update_user_order_json_called
-        update_user_order_json_called = True
-
-    def update_user_state(telegram_id: int, state: str) -> None:
+    def transition(
+        telegram_id: int,
+        state: str,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
         assert telegram_id == 12345
         assert state == "WAIT_FOR_PIZZA_SIZE"
-        nonlocal update_user_state_called
-        update_user_state_called = True
+        assert order_patch == {"pizza_name": "Pepperoni"}
+        assert reset
+        nonlocal transition_called
+        transition_called = True
 
-    def send_message(chat_id: int, text: str, **kwargs) -> dict:
+    def edit_message_text(chat_id: int, message_id: int, text: str, **kwargs) -> dict:
         assert chat_id == 12345
+        assert message_id == 10
         assert "select pizza size" in text
-        send_message_calls.append({"text": text, "kwargs": kwargs})
+        edit_message_calls.append({"text": text, "kwargs": kwargs})
         return {"ok": True}
 
     def answer_callback_query(callback_query_id: str) -> None:
         assert callback_query_id == "123"
 
-    def delete_message(chat_id: int, message_id: int) -> None:
-        assert chat_id == 12345
-        assert message_id == 10
-
     mock_storage = Mock(
         {
-            "update_user_order": update_user_order,
-            "update_user_state": update_user_state,
+            "transition": transition,
         }
     )
     mock_messenger = Mock(
         {
-            "send_message": send_message,
+            "edit_message_text": edit_message_text,
             "answer_callback_query": answer_callback_query,
-            "delete_message": delete_message,
         }
     )
 
@@ -70,6 +65,5 @@ def test_pizza_selection_handler():
 
     dispatcher.dispatch(test_update)
 
-    assert update_user_order_json_called
-    assert update_user_state_called
-    assert len(send_message_calls) == 1
+    assert transition_called
+    assert len(edit_message_calls) == 1
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from bot.infrastructure.postgres_pool import PoolTimeoutError, PostgresConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection") -> None:
+        self._connection = connection
+
+    def execute(self, sql: str, params: tuple = ()) -> None:
+        if self._connection.dead:
+            raise ConnectionError("server closed the connection")
+
+    def fetchone(self) -> tuple:
+        return (1,)
+
+
+class FakeConnection:
+    def __init__(self) -> None:
+        self.dead = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def rollback(self) -> None:
+        if self.dead:
+            raise ConnectionError("server closed the connection")
+        self.rollbacks += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def make_pool(**kwargs) -> tuple[PostgresConnectionPool, list[FakeConnection]]:
+    created = []
+
+    def connect() -> FakeConnection:
+        connection = FakeConnection()
+        created.append(connection)
+        return connection
+
+    return PostgresConnectionPool(connect, **kwargs), created
+
+
+def test_pool_reuses_connections():
+    pool, created = make_pool(min_size=1, max_size=2)
+
+    for _ in range(5):
+        with pool.connection():
+            pass
+
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["checkouts"] == 5
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+
+def test_pool_is_bounded_and_times_out():
+    pool, created = make_pool(min_size=0, max_size=1, checkout_timeout=0.05)
+
+    with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+
+    assert len(created) == 1
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_pool_waiter_gets_released_connection():
+    pool, created = make_pool(min_size=0, max_size=1, checkout_timeout=5)
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def holder() -> None:
+        with pool.connection():
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    acquired.wait()
+    threading.Timer(0.05, release.set).start()
+
+    with pool.connection() as connection:
+        assert connection is created[0]
+
+    thread.join()
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["max_wait_seconds"] > 0
+
+
+def test_pool_replaces_dead_connection_on_checkout():
+    pool, created = make_pool(min_size=1, max_size=1, health_check_interval=0)
+    created[0].dead = True
+
+    with pool.connection() as connection:
+        assert connection is not created[0]
+
+    assert created[0].closed
+    assert len(created) == 2
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_pool_discards_connection_broken_during_use():
+    pool, created = make_pool(min_size=0, max_size=1)
+
+    with pytest.raises(ConnectionError):
+        with pool.connection() as connection:
+            connection.dead = True
+            raise ConnectionError("server closed the connection")
+
+    with pool.connection() as connection:
+        assert connection is not created[0]
+
+    assert pool.stats()["size"] == 1
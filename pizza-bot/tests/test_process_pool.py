@@ -0,0 +1,115 @@
+import os
+from functools import partial
+
+from benchmarks.bench_end_to_end import FIRST_TELEGRAM_ID, flow_updates
+from bot.dispatcher import Dispatcher
+from bot.domain.order_state import OrderState
+from bot.handlers import get_handlers
+from bot.handlers.handler import Handler, HandlerStatus
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_sqlite import StorageSqlite
+from bot.process_pool import UserShardedProcessPool
+
+
+class CrashingHandler(Handler):
+    """Kills the worker on updates marked "crash", once per marker file."""
+
+    def __init__(self, marker: str | None) -> None:
+        self.marker = marker
+
+    def can_handle(self, update, state, order_json, storage, messenger) -> bool:
+        return "crash" in update
+
+    def handle(self, update, state, order_json, storage, messenger) -> HandlerStatus:
+        if self.marker is None or not os.path.exists(self.marker):
+            if self.marker is not None:
+                open(self.marker, "w").close()
+            os._exit(1)
+        return HandlerStatus.STOP
+
+
+def build_worker(index: int, workers: int, marker: str | None = None):
+    dispatcher = Dispatcher(StorageSqlite(), MessengerRecording())
+    dispatcher.add_handlers(CrashingHandler(marker), *get_handlers())
+    return dispatcher, lambda: None
+
+
+def crash_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "crash": True,
+        "message": {"from": {"id": FIRST_TELEGRAM_ID}, "chat": {"id": 1}},
+    }
+
+
+def make_storage(tmp_path, monkeypatch) -> StorageSqlite:
+    # Spawned workers inherit the environment, so they open the same file.
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "bot.sqlite3"))
+    storage = StorageSqlite()
+    storage.migrate()
+    return storage
+
+
+def assert_orders_finished(storage: StorageSqlite, users: int) -> None:
+    for user in range(users):
+        assert storage.get_user(FIRST_TELEGRAM_ID + user)["state"] == (
+            OrderState.ORDER_FINISHED
+        )
+
+
+def test_workers_finish_every_users_order(tmp_path, monkeypatch):
+    storage = make_storage(tmp_path, monkeypatch)
+    pool = UserShardedProcessPool(build_worker, workers=2, queue_depth=3)
+    try:
+        for update in flow_updates(4):
+            pool.submit(update)
+        pool.wait_idle()
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+
+    assert_orders_finished(storage, 4)
+    assert sum(worker["processed"] for worker in stats) == 20
+    assert sum(worker["errors"] for worker in stats) == 0
+    assert len({worker["pid"] for worker in stats}) == 2
+
+
+def test_crashed_worker_is_restarted_with_its_pending_updates(tmp_path, monkeypatch):
+    storage = make_storage(tmp_path, monkeypatch)
+    factory = partial(build_worker, marker=str(tmp_path / "crashed"))
+    pool = UserShardedProcessPool(factory, workers=1, restart_delay=0)
+    try:
+        updates = list(flow_updates(1))
+        pool.submit(updates[0])
+        pool.submit(crash_update(100))
+        for update in updates[1:]:
+            pool.submit(update)
+        pool.wait_idle()
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+
+    assert_orders_finished(storage, 1)
+    assert stats[0]["restarts"] == 1
+    assert pool.dropped == 0
+
+
+def test_update_that_keeps_crashing_workers_is_dropped(tmp_path, monkeypatch):
+    storage = make_storage(tmp_path, monkeypatch)
+    pool = UserShardedProcessPool(
+        build_worker, workers=1, max_attempts=2, restart_delay=0
+    )
+    try:
+        updates = list(flow_updates(1))
+        pool.submit(updates[0])
+        pool.submit(crash_update(100))
+        for update in updates[1:]:
+            pool.submit(update)
+        pool.wait_idle()
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+
+    assert_orders_finished(storage, 1)
+    assert stats[0]["restarts"] == 2
+    assert pool.dropped == 1
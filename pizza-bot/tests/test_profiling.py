@@ -0,0 +1,57 @@
+import pstats
+import threading
+
+from benchmarks.bench_end_to_end import flow_updates
+from bot.dispatcher import Dispatcher
+from bot.handlers import get_handlers
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_memory import StorageMemory
+from bot.profiling import DispatchProfiler
+
+
+def make_dispatcher(profiler: DispatchProfiler) -> Dispatcher:
+    dispatcher = Dispatcher(StorageMemory(), MessengerRecording(), profiler=profiler)
+    dispatcher.add_handlers(*get_handlers())
+    return dispatcher
+
+
+def test_profiler_samples_every_nth_dispatch_and_writes_window(tmp_path):
+    profiler = DispatchProfiler(str(tmp_path), every=2, window=3600)
+    dispatcher = make_dispatcher(profiler)
+
+    for update in flow_updates(2):
+        dispatcher.dispatch(update)
+    paths = profiler.flush()
+
+    assert [path.rsplit(".", 1)[1] for path in paths] == ["pstats", "txt"]
+    stats = pstats.Stats(paths[0])
+    handled = [function for (_, _, function) in stats.stats if function == "handle"]
+    assert handled
+    with open(paths[1]) as report:
+        assert report.readline().startswith("5 sampled dispatches")
+    assert profiler.flush() == []
+
+
+def test_disabled_profiler_never_samples(tmp_path):
+    profiler = DispatchProfiler(str(tmp_path), every=1, enabled=False)
+    dispatcher = make_dispatcher(profiler)
+
+    for update in flow_updates(1):
+        dispatcher.dispatch(update)
+
+    assert profiler.flush() == []
+    assert not any(tmp_path.iterdir())
+
+
+def test_toggle_off_writes_pending_samples(tmp_path):
+    profiler = DispatchProfiler(str(tmp_path), every=1, window=3600)
+    dispatcher = make_dispatcher(profiler)
+    dispatcher.dispatch(next(flow_updates(1)))
+
+    profiler.toggle()
+    for thread in threading.enumerate():
+        if thread.name == "profiler-flush":
+            thread.join()
+
+    assert not profiler.enabled
+    assert len(list(tmp_path.iterdir())) == 2
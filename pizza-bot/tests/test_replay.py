@@ -0,0 +1,71 @@
+import argparse
+
+import pytest
+
+import bot.replay
+from benchmarks.bench_end_to_end import flow_updates
+from bot.infrastructure.storage_sqlite import StorageSqlite
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "pizza.db"))
+    storage = StorageSqlite()
+    storage.migrate()
+    return storage
+
+
+def test_sqlite_iter_events_streams_in_batches_after_id(storage):
+    storage.persist_updates([{"update_id": update_id} for update_id in range(7)])
+
+    events = list(storage.iter_events(after_id=2, batch_size=2))
+
+    assert events == [
+        (event_id, {"update_id": event_id - 1}) for event_id in range(3, 8)
+    ]
+
+
+def test_replay_redispatches_logged_flow_without_touching_source(storage, capsys):
+    storage.persist_updates(list(flow_updates(2)))
+
+    bot.replay.main(["--sqlite", "--speed", "max", "--batch-size", "3"])
+
+    output = capsys.readouterr().out
+    assert "replayed 10 events up to id 10" in output
+    assert "0 errors" in output
+    assert "'edit_message_text': 8" in output
+    assert storage.get_user(9_000_000_000) is None
+    assert len(list(storage.iter_events())) == 10
+
+
+def test_paced_keeps_recorded_spacing_scaled_and_capped():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    events = [
+        (1, {"message": {"date": 1000}}),
+        (2, {"callback_query": {"data": "pizza_diavola"}}),
+        (3, {"message": {"date": 1010}}),
+        (4, {"message": {"date": 5000}}),
+    ]
+
+    replayed = list(
+        bot.replay.paced(
+            events, speed=2.0, max_gap=60, clock=lambda: now[0], sleep=sleep
+        )
+    )
+
+    assert [event_id for event_id, _ in replayed] == [1, 2, 3, 4]
+    assert sleeps == [5.0, 30.0]
+
+
+def test_parse_speed():
+    assert bot.replay.parse_speed("max") is None
+    assert bot.replay.parse_speed("realtime") == 1.0
+    assert bot.replay.parse_speed("10x") == 10.0
+    with pytest.raises(argparse.ArgumentTypeError):
+        bot.replay.parse_speed("0")
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from bot.domain.order_state import OrderState
+from bot.infrastructure.storage_cached import CachedStorage
+from bot.infrastructure.storage_memory import StorageMemory
+from bot.infrastructure.storage_postgres import StoragePostgres
+from bot.infrastructure.storage_sqlite import StorageSqlite
+
+
+def make_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "pizza.db"))
+    storage = StorageSqlite()
+    storage.recreate_database()
+    return storage
+
+
+def make_postgres(tmp_path, monkeypatch):
+    monkeypatch.setenv("POSTGRES_DATABASE", os.environ["POSTGRES_TEST_DATABASE"])
+    storage = StoragePostgres()
+    storage.recreate_database()
+    return storage
+
+
+@pytest.fixture(
+    params=[
+        "memory",
+        "sqlite",
+        "cached",
+        pytest.param(
+            "postgres",
+            marks=pytest.mark.skipif(
+                not os.getenv("POSTGRES_TEST_DATABASE"),
+                reason="set POSTGRES_TEST_DATABASE to run against a local Postgres",
+            ),
+        ),
+    ]
+)
+def storage(request, tmp_path, monkeypatch):
+    if request.param == "memory":
+        yield StorageMemory()
+    elif request.param == "sqlite":
+        yield make_sqlite(tmp_path, monkeypatch)
+    elif request.param == "cached":
+        yield CachedStorage(make_sqlite(tmp_path, monkeypatch))
+    else:
+        storage = make_postgres(tmp_path, monkeypatch)
+        yield storage
+        storage.close()
+
+
+def test_transition_keeps_keys_patched_to_null(storage):
+    storage.ensure_user_exists(1)
+    storage.transition(
+        1, OrderState.WAIT_FOR_DRINKS, {"pizza_name": "Diavola", "drink": "Water"}
+    )
+    storage.transition(1, OrderState.WAIT_FOR_ORDER_APPROVE, {"drink": None})
+    storage.transition(1, OrderState.WAIT_FOR_ORDER_APPROVE, {})
+
+    assert storage.get_user_order(1) == {"pizza_name": "Diavola", "drink": None}
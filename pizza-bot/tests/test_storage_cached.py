@@ -0,0 +1,123 @@
+import threading
+import time
+
+from bot.domain.order_state import OrderState
+from bot.infrastructure.storage_cached import CachedStorage
+from tests.mocks import Mock
+
+
+def make_backend(users: dict) -> tuple[Mock, list]:
+    calls = []
+
+    def get_user(telegram_id: int) -> dict | None:
+        calls.append(("get_user", telegram_id))
+        user = users.get(telegram_id)
+        return dict(user) if user else None
+
+    def transition(
+        telegram_id: int,
+        state: OrderState,
+        order_patch: dict | None = None,
+        reset: bool = False,
+    ) -> None:
+        calls.append(("transition", telegram_id))
+        user = users[telegram_id]
+        user["state"] = state.value
+        if reset:
+            user["order_json"] = order_patch
+        elif order_patch:
+            user["order_json"] = {**(user["order_json"] or {}), **order_patch}
+
+    return Mock({"get_user": get_user, "transition": transition}), calls
+
+
+def test_cached_storage_serves_repeat_reads_from_memory():
+    backend, calls = make_backend({1: {"state": None, "order_json": None}})
+    storage = CachedStorage(backend)
+
+    storage.get_user(1)
+    storage.get_user(1)
+    storage.get_user(1)
+
+    assert calls == [("get_user", 1)]
+    assert storage.stats()["hits"] == 2
+    assert storage.stats()["misses"] == 1
+
+
+def test_cached_storage_writes_through():
+    backend, calls = make_backend({1: {"state": None, "order_json": None}})
+    storage = CachedStorage(backend)
+    storage.get_user(1)
+
+    storage.transition(
+        1, OrderState.WAIT_FOR_PIZZA_SIZE, {"pizza_name": "Diavola"}, reset=True
+    )
+    storage.transition(1, OrderState.WAIT_FOR_DRINKS, {"pizza_size": "Small"})
+    user = storage.get_user(1)
+
+    assert user["state"] == "WAIT_FOR_DRINKS"
+    assert user["order_json"] == {"pizza_name": "Diavola", "pizza_size": "Small"}
+    assert [name for name, _ in calls] == ["get_user", "transition", "transition"]
+
+
+def test_cached_storage_hands_out_copies():
+    backend, _ = make_backend({1: {"state": None, "order_json": {"drink": "Water"}}})
+    storage = CachedStorage(backend)
+
+    storage.get_user(1)["order_json"]["drink"] = "Pepsi"
+
+    assert storage.get_user(1)["order_json"] == {"drink": "Water"}
+
+
+def test_cached_storage_expires_and_evicts():
+    backend, calls = make_backend(
+        {tid: {"state": None, "order_json": None} for tid in range(3)}
+    )
+    storage = CachedStorage(backend, max_entries=2, ttl=0.05)
+
+    storage.get_user(0)
+    storage.get_user(1)
+    storage.get_user(2)
+    assert storage.stats()["evictions"] == 1
+    assert storage.stats()["entries"] == 2
+
+    time.sleep(0.1)
+    storage.get_user(2)
+    assert storage.stats()["expirations"] == 1
+    assert calls.count(("get_user", 2)) == 2
+
+
+def test_cached_storage_respects_memory_cap():
+    backend, _ = make_backend(
+        {tid: {"state": None, "order_json": {"pizza_name": "x"}} for tid in range(50)}
+    )
+    storage = CachedStorage(backend, max_bytes=4096)
+
+    for telegram_id in range(50):
+        storage.get_user(telegram_id)
+
+    stats = storage.stats()
+    assert stats["bytes"] <= 4096
+    assert stats["evictions"] > 0
+
+
+def test_cached_storage_is_thread_safe():
+    backend, _ = make_backend(
+        {tid: {"state": None, "order_json": None} for tid in range(20)}
+    )
+    storage = CachedStorage(backend, max_entries=10)
+
+    def worker(telegram_id: int) -> None:
+        for _ in range(200):
+            storage.get_user(telegram_id)
+            storage.transition(telegram_id, OrderState.WAIT_FOR_DRINKS, {"n": 1})
+
+    threads = [threading.Thread(target=worker, args=(tid,)) for tid in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for telegram_id in range(20):
+        assert storage.get_user(telegram_id)["order_json"] == {"n": 1}
+    assert storage.stats()["entries"] <= 10
@@ -0,0 +1,57 @@
+from benchmarks.bench_end_to_end import FIRST_TELEGRAM_ID, flow_updates
+from bot.dispatcher import Dispatcher
+from bot.domain.order_state import OrderState
+from bot.handlers import get_handlers
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_memory import StorageMemory
+
+
+def test_memory_storage_applies_transitions_like_sql_backends():
+    storage = StorageMemory()
+    storage.transition(1, OrderState.WAIT_FOR_PIZZA_NAME)
+    assert storage.get_user(1) is None
+
+    storage.ensure_user_exists(1)
+    storage.transition(1, OrderState.WAIT_FOR_PIZZA_SIZE, {"pizza_name": "Diavola"})
+    storage.transition(1, OrderState.WAIT_FOR_DRINKS, {"pizza_size": "Large"})
+    user = storage.get_user(1)
+    user["order_json"]["drink"] = "Water"
+
+    assert storage.get_user(1)["state"] == "WAIT_FOR_DRINKS"
+    assert storage.get_user_order(1) == {"pizza_name": "Diavola", "pizza_size": "Large"}
+
+    storage.transition(1, OrderState.WAIT_FOR_PIZZA_NAME, reset=True)
+    assert storage.get_user_order(1) is None
+
+
+def test_memory_storage_claims_each_update_once():
+    storage = StorageMemory()
+
+    assert storage.claim_updates([1, 2]) == {1, 2}
+    assert storage.claim_updates([2, 3]) == {3}
+    storage.save_update_offset(3)
+    assert storage.load_update_offset() == 3
+    assert storage.claim_updates([3]) == set()
+
+
+def test_full_flow_finishes_every_virtual_users_order():
+    storage = StorageMemory()
+    messenger = MessengerRecording()
+    dispatcher = Dispatcher(storage, messenger)
+    dispatcher.add_handlers(*get_handlers())
+
+    for update in flow_updates(3):
+        dispatcher.dispatch(update)
+
+    for user in range(3):
+        assert storage.get_user(FIRST_TELEGRAM_ID + user)["state"] == (
+            OrderState.ORDER_FINISHED
+        )
+        assert storage.get_user_order(FIRST_TELEGRAM_ID + user) == {
+            "pizza_name": "Margherita",
+            "pizza_size": "Medium (30cm)",
+            "drink": "Water",
+        }
+    assert storage.events_persisted == 15
+    assert messenger.counts["answer_callback_query"] == 12
+    assert messenger.calls[-1][1]["text"].startswith("✅ **Order Confirmed!**")
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import pytest
+
+from bot.infrastructure.storage_postgres import StoragePostgres
+from tests.test_worker_pool import make_update
+
+# recreate_database() drops every table, so only a database named for tests
+# is ever used.
+pytestmark = pytest.mark.skipif(
+    not os.getenv("POSTGRES_TEST_DATABASE"),
+    reason="set POSTGRES_TEST_DATABASE to run against a local Postgres",
+)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setenv("POSTGRES_DATABASE", os.environ["POSTGRES_TEST_DATABASE"])
+    storage = StoragePostgres()
+    storage.recreate_database()
+    yield storage
+    storage.close()
+
+
+def claimed_ids(claimed: list) -> list[int]:
+    return [update["update_id"] for _, update in claimed]
+
+
+def test_only_each_users_oldest_update_is_claimed(storage):
+    storage.enqueue_updates(
+        [make_update(1, telegram_id=7), make_update(2, telegram_id=7)]
+        + [make_update(3, telegram_id=8)],
+        4,
+    )
+
+    assert claimed_ids(storage.claim_queued_updates("a", limit=10)) == [1, 3]
+    assert storage.claim_queued_updates("b", limit=10) == []
+    storage.complete_queued_update(1, "a")
+    assert claimed_ids(storage.claim_queued_updates("b", limit=10)) == [2]
+
+
+def test_concurrent_claims_never_share_an_update(storage):
+    storage.enqueue_updates([make_update(i, telegram_id=i) for i in range(40)], 40)
+    claimed: dict[str, list[int]] = {"a": [], "b": []}
+
+    def work(worker: str) -> None:
+        other = StoragePostgres()
+        try:
+            while batch := other.claim_queued_updates(worker, limit=3):
+                claimed[worker] += claimed_ids(batch)
+        finally:
+            other.close()
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed["a"] + claimed["b"]) == list(range(40))
+
+
+def test_expired_claim_is_handed_to_another_worker(storage):
+    storage.enqueue_updates([make_update(1, telegram_id=7)], 2)
+    storage.claim_queued_updates("a", lease=0.1)
+    time.sleep(0.2)
+
+    assert storage.claim_queued_updates("b") == [(2, make_update(1, telegram_id=7))]
+    storage.complete_queued_update(1, "a")
+    assert storage.queued_updates() == 1
+    storage.complete_queued_update(1, "b")
+    assert storage.queued_updates() == 0
+
+
+def test_batch_below_the_saved_offset_is_not_enqueued_again(storage):
+    assert storage.enqueue_updates([make_update(1, 7), make_update(2, 7)], 3) == 2
+    assert storage.enqueue_updates([make_update(2, 7), make_update(3, 7)], 4) == 1
+    assert storage.load_update_offset() == 4
+    assert storage.queued_updates() == 3
+
+
+def test_poller_lock_moves_to_standby_when_leader_session_ends(storage):
+    leader = storage.advisory_lock()
+    standby = StoragePostgres().advisory_lock()
+    try:
+        assert leader.try_acquire()
+        assert not standby.try_acquire()
+        assert leader.is_held() and not standby.is_held()
+
+        leader.release()
+        assert standby.try_acquire()
+        assert standby.is_held()
+    finally:
+        leader.release()
+        standby.release()
@@ -0,0 +1,137 @@
+import json
+import sqlite3
+
+import pytest
+
+from bot.domain.order_state import OrderState
+from bot.infrastructure.storage_sqlite import StorageSqlite
+
+
+@pytest.fixture
+def database_path(tmp_path, monkeypatch):
+    path = tmp_path / "pizza.db"
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def storage(database_path):
+    storage = StorageSqlite()
+    storage.recreate_database()
+    return storage
+
+
+def test_sqlite_storage_returns_decoded_order(storage, database_path):
+    storage.ensure_user_exists(12345)
+    storage.update_user_order(12345, {"pizza_name": "Diavola"})
+    storage.update_user_state(12345, OrderState.WAIT_FOR_PIZZA_SIZE)
+
+    user = storage.get_user(12345)
+
+    assert user["state"] == "WAIT_FOR_PIZZA_SIZE"
+    assert user["order_json"] == {"pizza_name": "Diavola"}
+    with sqlite3.connect(database_path) as connection:
+        (stored,) = connection.execute("SELECT order_json FROM users").fetchone()
+    assert stored == '{"pizza_name":"Diavola"}'
+
+
+def test_sqlite_storage_persists_compact_events(storage, database_path):
+    storage.persist_updates([{"update_id": 1}, {"update_id": 2, "text": "пицца"}])
+
+    with sqlite3.connect(database_path) as connection:
+        payloads = [
+            row[0] for row in connection.execute("SELECT payload FROM telegram_events")
+        ]
+    assert payloads == ['{"update_id":1}', '{"update_id":2,"text":"пицца"}']
+
+
+def test_sqlite_migrate_json_columns_compacts_existing_rows(storage, database_path):
+    legacy = json.dumps({"pizza_name": "Diavola"}, indent=2)
+    with sqlite3.connect(database_path) as connection:
+        connection.execute(
+            "INSERT INTO users (telegram_id, order_json) VALUES (?, ?)", (1, legacy)
+        )
+        connection.execute(
+            "INSERT INTO telegram_events (payload) VALUES (?)",
+            (json.dumps({"update_id": 1}, indent=2),),
+        )
+
+    storage.migrate_json_columns()
+
+    with sqlite3.connect(database_path) as connection:
+        (order_json,) = connection.execute("SELECT order_json FROM users").fetchone()
+        (payload,) = connection.execute(
+            "SELECT payload FROM telegram_events"
+        ).fetchone()
+    assert order_json == '{"pizza_name":"Diavola"}'
+    assert payload == '{"update_id":1}'
+
+
+def test_sqlite_transition_merges_and_resets_order(storage):
+    storage.ensure_user_exists(12345)
+
+    storage.transition(
+        12345, OrderState.WAIT_FOR_PIZZA_SIZE, {"pizza_name": "Diavola"}, reset=True
+    )
+    storage.transition(12345, OrderState.WAIT_FOR_DRINKS, {"pizza_size": "Small"})
+    user = storage.get_user(12345)
+    assert user["state"] == "WAIT_FOR_DRINKS"
+    assert user["order_json"] == {"pizza_name": "Diavola", "pizza_size": "Small"}
+
+    storage.transition(12345, OrderState.ORDER_FINISHED)
+    user = storage.get_user(12345)
+    assert user["state"] == "ORDER_FINISHED"
+    assert user["order_json"] == {"pizza_name": "Diavola", "pizza_size": "Small"}
+
+    storage.transition(12345, OrderState.WAIT_FOR_PIZZA_NAME, reset=True)
+    user = storage.get_user(12345)
+    assert user["state"] == "WAIT_FOR_PIZZA_NAME"
+    assert user["order_json"] is None
+
+
+def test_sqlite_ensure_user_exists_is_idempotent(storage, database_path):
+    storage.ensure_user_exists(12345)
+    storage.transition(12345, OrderState.WAIT_FOR_PIZZA_NAME)
+    storage.ensure_user_exists(12345)
+
+    with sqlite3.connect(database_path) as connection:
+        rows = connection.execute("SELECT telegram_id, state FROM users").fetchall()
+    assert rows == [(12345, "WAIT_FOR_PIZZA_NAME")]
+
+
+def test_sqlite_migrate_is_idempotent_and_records_versions(storage, database_path):
+    storage.ensure_user_exists(12345)
+
+    assert storage.migrate() == []
+
+    with sqlite3.connect(database_path) as connection:
+        versions = [
+            row[0]
+            for row in connection.execute("SELECT version FROM schema_migrations")
+        ]
+        (users,) = connection.execute("SELECT COUNT(*) FROM users").fetchone()
+    assert versions == [1, 2, 3, 4]
+    assert users == 1
+
+
+def test_sqlite_migrate_upgrades_database_without_migrations_table(database_path):
+    legacy = json.dumps({"pizza_name": "Diavola"}, indent=2)
+    with sqlite3.connect(database_path) as connection:
+        connection.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY,"
+            " telegram_id INTEGER NOT NULL UNIQUE,"
+            " created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+            " state TEXT DEFAULT NULL, order_json TEXT DEFAULT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE telegram_events (id INTEGER PRIMARY KEY, payload TEXT NOT NULL)"
+        )
+        connection.execute(
+            "INSERT INTO users (telegram_id, order_json) VALUES (?, ?)", (1, legacy)
+        )
+
+    storage = StorageSqlite()
+    assert storage.migrate() == [1, 2, 3, 4]
+
+    assert storage.get_user(1)["order_json"] == {"pizza_name": "Diavola"}
+    assert storage.claim_updates([5]) == {5}
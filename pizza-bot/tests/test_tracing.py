@@ -0,0 +1,99 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.bench_end_to_end import flow_updates
+from bot.dispatcher import Dispatcher
+from bot.handlers import get_handlers
+from bot.infrastructure.messenger_instrumented import InstrumentedMessenger
+from bot.infrastructure.messenger_rate_limited import RateLimitedMessenger
+from bot.infrastructure.messenger_recording import MessengerRecording
+from bot.infrastructure.storage_instrumented import InstrumentedStorage
+from bot.infrastructure.storage_memory import StorageMemory
+from bot.tracing import JsonLinesSpanExporter, Tracer
+
+
+def read_spans(path) -> list[dict]:
+    spans = []
+    with open(path) as lines:
+        for line in lines:
+            request = json.loads(line)
+            (resource_spans,) = request["resourceSpans"]
+            (scope_spans,) = resource_spans["scopeSpans"]
+            for span in scope_spans["spans"]:
+                span["attributes"] = {
+                    attribute["key"]: next(iter(attribute["value"].values()))
+                    for attribute in span["attributes"]
+                }
+                spans.append(span)
+    return spans
+
+
+def test_trace_links_dispatch_handlers_storage_and_background_telegram(tmp_path):
+    exporter = JsonLinesSpanExporter(str(tmp_path / "spans.jsonl"))
+    tracer = Tracer(exporter)
+    messenger = RateLimitedMessenger(
+        InstrumentedMessenger(MessengerRecording(), tracer=tracer),
+        global_rate=1000,
+        global_burst=1000,
+        chat_rate=1000,
+        chat_burst=1000,
+    )
+    side_effects = ThreadPoolExecutor(max_workers=2)
+    dispatcher = Dispatcher(
+        InstrumentedStorage(StorageMemory(), tracer=tracer),
+        messenger,
+        side_effects=side_effects,
+        tracer=tracer,
+    )
+    dispatcher.add_handlers(*get_handlers())
+    try:
+        for update in flow_updates(1):
+            dispatcher.dispatch(update)
+    finally:
+        side_effects.shutdown()
+        messenger.close()
+        exporter.close()
+
+    spans = read_spans(tmp_path / "spans.jsonl")
+    roots = [span for span in spans if span["name"] == "dispatch"]
+    assert len(roots) == 5
+    assert all("parentSpanId" not in root for root in roots)
+    (approve,) = [
+        root
+        for root in roots
+        if root["attributes"].get("bot.callback_data") == "order_approve"
+    ]
+    assert approve["attributes"]["bot.telegram_id"] == "9000000000"
+    assert approve["attributes"]["bot.state"] == "WAIT_FOR_ORDER_APPROVE"
+
+    trace = {
+        span["spanId"]: span for span in spans if span["traceId"] == approve["traceId"]
+    }
+    by_name = {span["name"]: span for span in trace.values()}
+    handle = by_name["OrderApprovalHandler.handle"]
+    assert handle["parentSpanId"] == approve["spanId"]
+    assert by_name["storage.transition"]["parentSpanId"] == handle["spanId"]
+    assert by_name["telegram.edit_message_text"]["parentSpanId"] == handle["spanId"]
+    # Answered on a sender thread, still part of the click's trace.
+    answer = by_name["telegram.answer_callback_query"]
+    assert answer["parentSpanId"] == approve["spanId"]
+    assert answer["attributes"]["telegram.status"] == "ok"
+    assert int(approve["endTimeUnixNano"]) >= int(answer["endTimeUnixNano"])
+
+
+def test_failing_handler_marks_span_as_error(tmp_path):
+    exporter = JsonLinesSpanExporter(str(tmp_path / "spans.jsonl"))
+    tracer = Tracer(exporter)
+
+    with pytest.raises(KeyError):
+        with tracer.span("dispatch"):
+            with tracer.span("handle"):
+                raise KeyError("order_json")
+    exporter.close()
+
+    handle, dispatch = read_spans(tmp_path / "spans.jsonl")
+    assert handle["status"] == {"code": 2, "message": "KeyError: 'order_json'"}
+    assert handle["parentSpanId"] == dispatch["spanId"]
+    assert dispatch["status"]["code"] == 2
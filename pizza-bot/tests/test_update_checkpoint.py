@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+
+import bot.long_polling
+from bot.dispatcher import Dispatcher
+from bot.handlers.handler import Handler, HandlerStatus
+from bot.infrastructure.storage_sqlite import StorageSqlite
+from bot.update_checkpoint import UpdateCheckpoint
+from tests.mocks import Mock
+
+
+class StopPolling(Exception):
+    pass
+
+
+class RecordingHandler(Handler):
+    def __init__(self, fail_on: set[int] | None = None) -> None:
+        self.update_ids: list[int] = []
+        # update_ids whose first dispatch raises.
+        self.fail_on = set(fail_on or ())
+
+    def can_handle(self, update, state, order_json, storage, messenger) -> bool:
+        return True
+
+    def handle(self, update, state, order_json, storage, messenger) -> HandlerStatus:
+        if update["update_id"] in self.fail_on:
+            self.fail_on.discard(update["update_id"])
+            raise RuntimeError("handler failed")
+        self.update_ids.append(update["update_id"])
+        return HandlerStatus.STOP
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "pizza.db"))
+    storage = StorageSqlite()
+    storage.recreate_database()
+    return storage
+
+
+def poll_once(
+    storage,
+    handler: RecordingHandler,
+    batch: list[dict],
+    killed: bool = False,
+    raises: type[Exception] = StopPolling,
+) -> list[int]:
+    """Run the sync poller for one batch and return the offsets it asked for.
+
+    killed simulates a process that dies before it writes its checkpoint.
+    """
+    offsets = []
+
+    def get_updates(offset: int, timeout: int) -> list:
+        offsets.append(offset)
+        if len(offsets) == 1:
+            return batch
+        raise StopPolling()
+
+    checkpoint = UpdateCheckpoint(storage, save_interval=3600)
+    if killed:
+        checkpoint.flush = lambda: None
+    dispatcher = Dispatcher(storage, Mock({}))
+    dispatcher.add_handlers(handler)
+    with pytest.raises(raises):
+        bot.long_polling.start_long_polling(
+            dispatcher, Mock({"get_updates": get_updates}), checkpoint=checkpoint
+        )
+    return offsets
+
+
+def test_poller_resumes_from_checkpoint_and_skips_replayed_updates(storage):
+    handler = RecordingHandler()
+
+    assert poll_once(storage, handler, [{"update_id": 10}], killed=True) == [0, 11]
+    assert storage.load_update_offset() == 0
+
+    # The offset was never saved, so Telegram delivers 10 again.
+    replayed = [{"update_id": 10}, {"update_id": 11}]
+    assert poll_once(storage, handler, replayed) == [0, 12]
+    assert storage.load_update_offset() == 12
+
+    assert poll_once(storage, handler, [{"update_id": 12}]) == [12, 13]
+    assert handler.update_ids == [10, 11, 12]
+
+
+def test_updates_after_a_failed_dispatch_are_delivered_again(storage):
+    handler = RecordingHandler(fail_on={11})
+    batch = [{"update_id": 10}, {"update_id": 11}, {"update_id": 12}]
+
+    assert poll_once(storage, handler, batch, raises=RuntimeError) == [0]
+    assert storage.load_update_offset() == 0
+
+    # After a restart 10 is skipped, 11 and 12 are dispatched.
+    assert poll_once(storage, handler, batch) == [0, 13]
+    assert handler.update_ids == [10, 11, 12]
+
+
+class Telegram:
+    """Async getUpdates over a fixed list, like Telegram honouring offsets."""
+
+    def __init__(self, updates: list[dict], stop) -> None:
+        self.updates = updates
+        self.stop = stop
+        self.offsets: list[int] = []
+
+    async def get_updates(self, offset: int, timeout: int) -> list:
+        self.offsets.append(offset)
+        if await self.stop(offset):
+            raise StopPolling()
+        return [u for u in self.updates if u["update_id"] >= offset]
+
+
+def poll_async(dispatcher, telegram: Telegram, checkpoint: UpdateCheckpoint) -> None:
+    with pytest.raises(StopPolling):
+        asyncio.run(
+            bot.long_polling.start_long_polling_async(
+                dispatcher, telegram, checkpoint=checkpoint, busy_poll_interval=0.01
+            )
+        )
+
+
+def test_async_poller_keeps_offset_below_updates_in_flight(storage):
+    class SlowDispatcher:
+        def __init__(self) -> None:
+            self.done: list[int] = []
+
+        async def dispatch(self, update: dict) -> None:
+            if update["update_id"] == 10:
+                await asyncio.Event().wait()
+            self.done.append(update["update_id"])
+
+    dispatcher = SlowDispatcher()
+
+    async def stop(offset: int) -> bool:
+        return len(telegram.offsets) > 3
+
+    telegram = Telegram([{"update_id": 10}, {"update_id": 11}], stop)
+    checkpoint = UpdateCheckpoint(storage, save_interval=0)
+    poll_async(dispatcher, telegram, checkpoint)
+
+    assert dispatcher.done == [11]
+    # Polling from 12 would have confirmed update 10 to Telegram.
+    assert telegram.offsets == [0, 10, 10, 10]
+    assert storage.load_update_offset() == 10
+    replayed = [{"update_id": 10}, {"update_id": 11}]
+    assert checkpoint.pending(replayed) == [{"update_id": 10}]
+
+
+def test_async_poller_dispatches_a_failed_update_again(storage):
+    class FlakyDispatcher:
+        def __init__(self) -> None:
+            self.attempts: list[int] = []
+
+        async def dispatch(self, update: dict) -> None:
+            self.attempts.append(update["update_id"])
+            if len(self.attempts) == 1:
+                raise RuntimeError("handler failed")
+
+    dispatcher = FlakyDispatcher()
+
+    async def stop(offset: int) -> bool:
+        if offset == 6:
+            return True
+        await asyncio.sleep(0.01)
+        return False
+
+    checkpoint = UpdateCheckpoint(storage, save_interval=0)
+    poll_async(dispatcher, Telegram([{"update_id": 5}], stop), checkpoint)
+
+    assert dispatcher.attempts == [5, 5]
+    assert storage.load_update_offset() == 6
+
+
+def test_checkpoint_batches_offset_writes():
+    now = [0.0]
+    saved = []
+    storage = Mock(
+        {
+            "load_update_offset": lambda: 5,
+            "save_update_offset": saved.append,
+        }
+    )
+    checkpoint = UpdateCheckpoint(storage, save_interval=1.0, clock=lambda: now[0])
+
+    assert checkpoint.load() == 5
+    checkpoint.advance(6)
+    checkpoint.advance(7)
+    now[0] = 1.5
+    checkpoint.advance(8)
+    checkpoint.advance(9)
+    checkpoint.flush()
+    checkpoint.flush()
+
+    assert saved == [8, 9]
+
+
+def test_sqlite_save_update_offset_prunes_processed_updates(storage):
+    assert storage.claim_updates([1, 2, 3]) == {1, 2, 3}
+    assert storage.claim_updates([3, 4]) == {4}
+
+    storage.save_update_offset(4)
+    storage.save_update_offset(2)
+
+    assert storage.load_update_offset() == 4
+    assert storage.claim_updates([3, 4]) == {3}
@@ -28,10 +28,10 @@ def test_update_database_logger_execution():
 
     persist_updates_called = False
 
-    def persist_updates(update: dict) -> None:
+    def persist_updates(updates: list) -> None:
         nonlocal persist_updates_called
         persist_updates_called = True
-        assert update == test_update
+        assert updates == [test_update]
 
     def get_user(telegram_id: int) -> dict | None:
         assert telegram_id == 12345
@@ -51,3 +51,34 @@ def test_update_database_logger_execution():
     dispatcher.dispatch(test_update)
 
     assert persist_updates_called
+
+
+def test_update_database_logger_buffers_updates():
+    test_update = {
+        "update_id": 123456789,
+        "message": {
+            "message_id": 1,
+            "from": {"id": 12345},
+            "chat": {"id": 12345, "type": "private"},
+            "text": "Hello",
+        },
+    }
+
+    buffered = []
+
+    def persist_updates(updates: list) -> None:
+        raise AssertionError("storage must not be called on the dispatch path")
+
+    mock_storage = Mock(
+        {
+            "persist_updates": persist_updates,
+            "get_user": lambda tid: None,
+        }
+    )
+    mock_event_buffer = Mock({"append": buffered.append})
+
+    dispatcher = Dispatcher(mock_storage, Mock({}))
+    dispatcher.add_handlers(UpdateDatabaseLogger(mock_event_buffer))
+    dispatcher.dispatch(test_update)
+
+    assert buffered == [test_update]
@@ -0,0 +1,211 @@
+import threading
+import time
+
+import pytest
+
+import bot.long_polling
+from bot.work_queue import QueueWorkerPool
+from tests.mocks import Mock
+from tests.test_worker_pool import RecordingHandler, make_dispatcher, make_update
+
+
+class QueueStorage:
+    """update_queue semantics of StoragePostgres, without leases expiring."""
+
+    def __init__(self, offset: int = 0) -> None:
+        self.offset = offset
+        self.queue: dict[int, dict] = {}
+        self.claims: dict[int, str] = {}
+        self.attempts: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def load_update_offset(self) -> int:
+        return self.offset
+
+    def enqueue_updates(self, updates: list, next_offset: int) -> int:
+        with self._lock:
+            fresh = [
+                u
+                for u in updates
+                if u["update_id"] >= self.offset and u["update_id"] not in self.queue
+            ]
+            for update in fresh:
+                self.queue[update["update_id"]] = update
+            self.offset = max(self.offset, next_offset)
+        return len(fresh)
+
+    def claim_queued_updates(self, worker: str, limit: int, lease: float) -> list:
+        with self._lock:
+            heads = {}
+            for update_id in sorted(self.queue):
+                user = self.queue[update_id]["callback_query"]["from"]["id"]
+                heads.setdefault(user, update_id)
+            claimed = [
+                update_id
+                for update_id in sorted(heads.values())
+                if update_id not in self.claims
+            ][:limit]
+            for update_id in claimed:
+                self.claims[update_id] = worker
+                self.attempts[update_id] = self.attempts.get(update_id, 0) + 1
+            return [(self.attempts[i], self.queue[i]) for i in claimed]
+
+    def complete_queued_update(self, update_id: int, worker: str) -> None:
+        with self._lock:
+            if self.claims.get(update_id) == worker:
+                del self.queue[update_id]
+                del self.claims[update_id]
+
+    def queued_updates(self) -> int:
+        return len(self.queue)
+
+
+class AdvisoryLock:
+    def __init__(self, free_after: int = 0) -> None:
+        self.attempts = 0
+        self.free_after = free_after
+        self.held = False
+        self.released = False
+
+    def try_acquire(self) -> bool:
+        self.attempts += 1
+        self.held = self.attempts > self.free_after
+        return self.held
+
+    def is_held(self) -> bool:
+        return self.held
+
+    def release(self) -> None:
+        self.released = True
+        self.held = False
+
+
+def wait_until_empty(storage: QueueStorage) -> None:
+    deadline = time.monotonic() + 5
+    while storage.queued_updates() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_queue_workers_keep_per_user_order():
+    handler = RecordingHandler(delay=0.005)
+    storage = QueueStorage()
+    storage.enqueue_updates([make_update(i, telegram_id=i % 5) for i in range(40)], 40)
+
+    pool = QueueWorkerPool(
+        make_dispatcher(handler), storage, workers=4, claim_batch=2, idle_sleep=0.01
+    )
+    wait_until_empty(storage)
+    pool.shutdown()
+
+    for telegram_id in range(5):
+        handled = [
+            u["update_id"]
+            for u in handler.calls
+            if u["callback_query"]["from"]["id"] == telegram_id
+        ]
+        assert handled == list(range(telegram_id, 40, 5))
+    assert len(handler.threads) > 1
+    assert sum(worker["processed"] for worker in pool.stats()) == 40
+
+
+def test_update_claimed_too_often_is_dropped():
+    handler = RecordingHandler()
+    storage = QueueStorage()
+    storage.enqueue_updates([make_update(1, telegram_id=1)], 2)
+    storage.attempts[1] = 3
+
+    pool = QueueWorkerPool(
+        make_dispatcher(handler), storage, workers=1, max_attempts=3, idle_sleep=0.01
+    )
+    wait_until_empty(storage)
+    pool.shutdown()
+
+    assert handler.calls == []
+    assert pool.stats()[0]["dropped"] == 1
+
+
+def test_standby_polls_once_it_holds_the_lock():
+    class StopPolling(Exception):
+        pass
+
+    handler = RecordingHandler()
+    storage = QueueStorage(offset=10)
+    lock = AdvisoryLock(free_after=2)
+    offsets = []
+
+    def get_updates(offset: int, timeout: int) -> list:
+        offsets.append(offset)
+        if len(offsets) == 1:
+            # A late batch from a deposed leader overlaps the saved offset.
+            return [make_update(i, telegram_id=i) for i in range(8, 13)]
+        wait_until_empty(storage)
+        raise StopPolling()
+
+    with pytest.raises(StopPolling):
+        bot.long_polling.start_long_polling_queue(
+            make_dispatcher(handler),
+            Mock({"get_updates": get_updates}),
+            storage,
+            lock,
+            workers=2,
+            leader_retry=0,
+        )
+
+    assert lock.attempts == 3
+    assert lock.released
+    assert offsets == [10, 13]
+    assert storage.offset == 13
+    assert sorted(u["update_id"] for u in handler.calls) == [10, 11, 12]
+
+
+def test_update_is_left_claimed_when_postgres_drops_mid_dispatch():
+    def dispatch(update: dict) -> None:
+        raise ConnectionResetError("server closed the connection")
+
+    storage = QueueStorage()
+    storage.enqueue_updates([make_update(1, telegram_id=1)], 2)
+
+    pool = QueueWorkerPool(
+        Mock({"dispatch": dispatch}), storage, workers=1, idle_sleep=0.01
+    )
+    deadline = time.monotonic() + 5
+    while not storage.attempts and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pool.shutdown()
+
+    assert storage.queued_updates() == 1
+    assert 1 in storage.claims
+    assert pool.stats()[0]["processed"] == 0
+
+
+def test_leader_steps_down_when_telegram_is_unreachable():
+    class StopPolling(Exception):
+        pass
+
+    handler = RecordingHandler()
+    storage = QueueStorage(offset=10)
+    lock = AdvisoryLock()
+    offsets = []
+
+    def get_updates(offset: int, timeout: int) -> list:
+        offsets.append(offset)
+        if len(offsets) == 1:
+            raise ConnectionRefusedError("api.telegram.org")
+        if len(offsets) == 2:
+            return [make_update(10, telegram_id=1)]
+        wait_until_empty(storage)
+        raise StopPolling()
+
+    with pytest.raises(StopPolling):
+        bot.long_polling.start_long_polling_queue(
+            make_dispatcher(handler),
+            Mock({"get_updates": get_updates}),
+            storage,
+            lock,
+            workers=1,
+            leader_retry=0,
+        )
+
+    assert lock.attempts == 2
+    assert offsets == [10, 10, 11]
+    assert [u["update_id"] for u in handler.calls] == [10]
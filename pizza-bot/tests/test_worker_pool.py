@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+import bot.long_polling
+from bot.dispatcher import Dispatcher
+from bot.handlers.handler import Handler, HandlerStatus
+from bot.worker_pool import UserShardedWorkerPool
+from tests.mocks import Mock
+
+
+class RecordingHandler(Handler):
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls: list[dict] = []
+        self.threads: set[str] = set()
+        self._lock = threading.Lock()
+
+    def can_handle(self, update, state, order_json, storage, messenger) -> bool:
+        return True
+
+    def handle(self, update, state, order_json, storage, messenger) -> HandlerStatus:
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(update)
+            self.threads.add(threading.current_thread().name)
+        return HandlerStatus.STOP
+
+
+def make_update(update_id: int, telegram_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {"id": str(update_id), "from": {"id": telegram_id}},
+    }
+
+
+def make_dispatcher(handler: Handler) -> Dispatcher:
+    dispatcher = Dispatcher(
+        Mock({"get_user": lambda tid: None}),
+        Mock({"answer_callback_query": lambda callback_query_id: None}),
+    )
+    dispatcher.add_handlers(handler)
+    return dispatcher
+
+
+def test_worker_pool_keeps_per_user_order():
+    handler = RecordingHandler(delay=0.01)
+    pool = UserShardedWorkerPool(make_dispatcher(handler), workers=4, queue_depth=2)
+
+    updates = [make_update(i, telegram_id=i % 5) for i in range(40)]
+    for update in updates:
+        pool.submit(update)
+    pool.wait_idle()
+    stats = pool.stats()
+    pool.shutdown()
+
+    for telegram_id in range(5):
+        handled = [
+            u["update_id"]
+            for u in handler.calls
+            if u["callback_query"]["from"]["id"] == telegram_id
+        ]
+        assert handled == sorted(handled)
+    assert len(handler.calls) == 40
+    assert len(handler.threads) > 1
+    assert sum(worker["processed"] for worker in stats) == 40
+    assert all(0 <= worker["utilization"] <= 1 for worker in stats)
+
+
+class StopPolling(Exception):
+    pass
+
+
+def telegram_from(updates: list[dict], polls: list[int], stop) -> Mock:
+    """getUpdates over a fixed list: returns what the offset has not confirmed."""
+
+    def get_updates(offset: int, timeout: int) -> list:
+        polls.append(offset)
+        if stop(offset):
+            raise StopPolling()
+        return [update for update in updates if update["update_id"] >= offset]
+
+    return Mock({"get_updates": get_updates})
+
+
+def test_threaded_polling_moves_offset_past_dispatched_updates():
+    handler = RecordingHandler(delay=0.01)
+    polls = []
+
+    with pytest.raises(StopPolling):
+        bot.long_polling.start_long_polling_threaded(
+            make_dispatcher(handler),
+            telegram_from(
+                [make_update(i, telegram_id=i) for i in range(10, 20)],
+                polls,
+                stop=lambda offset: offset == 20,
+            ),
+            workers=3,
+        )
+
+    assert sorted(u["update_id"] for u in handler.calls) == list(range(10, 20))
+    assert polls[0] == 0 and polls[-1] == 20
+    assert polls == sorted(polls)
+
+
+def test_threaded_polling_does_not_wait_for_a_slow_chat():
+    release = threading.Event()
+
+    class SlowChatHandler(RecordingHandler):
+        def handle(self, update, state, order_json, storage, messenger):
+            if update["update_id"] == 1:
+                release.wait(5)
+            return super().handle(update, state, order_json, storage, messenger)
+
+    handler = SlowChatHandler()
+    updates = [make_update(1, telegram_id=1)]
+    polls = []
+
+    def stop(offset: int) -> bool:
+        if len(polls) == 2:
+            # Another chat writes while the first one is still being handled.
+            updates.append(make_update(2, telegram_id=2))
+        if any(u["update_id"] == 2 for u in handler.calls):
+            release.set()
+        return offset == 3
+
+    with pytest.raises(StopPolling):
+        bot.long_polling.start_long_polling_threaded(
+            make_dispatcher(handler),
+            telegram_from(updates, polls, stop),
+            workers=2,
+            busy_poll_interval=0.01,
+        )
+
+    assert [u["update_id"] for u in handler.calls] == [2, 1]
+    # The offset stayed on update 1 until it was done.
+    assert polls[0] == 0 and set(polls[1:-1]) == {1} and polls[-1] == 3
+
+
+def test_threaded_polling_retries_a_failed_update_then_drops_it():
+    class FailingHandler(RecordingHandler):
+        def handle(self, update, state, order_json, storage, messenger):
+            super().handle(update, state, order_json, storage, messenger)
+            raise RuntimeError("handler bug")
+
+    handler = FailingHandler()
+
+    with pytest.raises(StopPolling):
+        bot.long_polling.start_long_polling_threaded(
+            make_dispatcher(handler),
+            telegram_from([make_update(5, telegram_id=1)], [], lambda o: o == 6),
+            workers=1,
+            max_attempts=2,
+            busy_poll_interval=0.01,
+        )
+
+    assert [u["update_id"] for u in handler.calls] == [5, 5]